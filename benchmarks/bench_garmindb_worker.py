@@ -0,0 +1,73 @@
+"""
+Benchmark: per-fetch latency of spawn-per-call vs. the persistent garmindb worker.
+
+Usage:
+    python benchmarks/bench_garmindb_worker.py [--script garmindb_cli.py] [--iterations 20]
+
+Without ``--script`` a stand-in CLI is generated that imports pandas, which
+approximates the import cost of garmindb.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src.garmindb_worker import GarmindbWorker
+
+STAND_IN_CLI = "import json, sys\nimport pandas\nprint(json.dumps([{'id': 1, 'args': sys.argv[1:]}]))\n"
+
+
+def _summarize(label: str, samples: list) -> None:
+    ms = [s * 1000 for s in samples]
+    print(f"{label:<16} mean={statistics.mean(ms):8.2f} ms  median={statistics.median(ms):8.2f} ms  max={max(ms):8.2f} ms")
+
+
+def bench_spawn(script: str, args: list, iterations: int) -> list:
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script] + args, capture_output=True, text=True, check=False)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_worker(script: str, args: list, iterations: int) -> list:
+    samples = []
+    with GarmindbWorker(["python", script]) as worker:
+        worker.run(args)  # warm-up: the first call pays the import
+        for _ in range(iterations):
+            start = time.perf_counter()
+            worker.run(args)
+            samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--script", help="Path to garmindb_cli.py (defaults to a generated stand-in)")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("args", nargs="*", default=["fetch", "activities"])
+    opts = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        script = opts.script
+        if script is None:
+            script = os.path.join(tmp, "garmindb_cli.py")
+            with open(script, "w") as f:
+                f.write(STAND_IN_CLI)
+
+        spawn = bench_spawn(script, opts.args, opts.iterations)
+        worker = bench_worker(script, opts.args, opts.iterations)
+
+    _summarize("spawn-per-call", spawn)
+    _summarize("worker", worker)
+    print(f"speedup (mean): {statistics.mean(spawn) / statistics.mean(worker):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
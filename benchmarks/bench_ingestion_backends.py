@@ -0,0 +1,96 @@
+"""
+Benchmark: CLI (subprocess -> JSON -> pandas -> DuckDB) vs. the garmindb SQLite backend.
+
+Usage:
+    python benchmarks/bench_ingestion_backends.py [--rows 200000]
+
+A synthetic garmindb-style ``garmin_activities.db`` is generated and both
+paths write the same data to raw_activities through ``storage.write_df``: the
+CLI path via a stand-in script that dumps the table as JSON, the SQLite path
+via ``garmindb_sqlite.read_source`` record batches.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import duckdb
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import garmindb_sqlite, storage
+from src.settings import GarminSettings
+
+DUMP_CLI = """import json, sqlite3, sys
+conn = sqlite3.connect(sys.argv[1])
+conn.row_factory = sqlite3.Row
+print(json.dumps([dict(r) for r in conn.execute("SELECT * FROM activities")]))
+"""
+
+
+def make_activities_db(path: str, rows: int) -> None:
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE activities (activity_id VARCHAR, name VARCHAR, sport VARCHAR, start_time DATETIME,"
+        " elapsed_time TIME, distance FLOAT, avg_hr INTEGER, training_load FLOAT)"
+    )
+    conn.executemany(
+        "INSERT INTO activities VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (str(i), f"Run {i}", "running", f"2020-01-01 07:00:{i % 60:02d}", "01:00:00.000000", 10.0 + i % 7, 140 + i % 20, 60.0 + i % 40)
+            for i in range(rows)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+
+def bench_cli(tmp: str, db_path: str) -> float:
+    script = os.path.join(tmp, "dump_cli.py")
+    with open(script, "w") as f:
+        f.write(DUMP_CLI)
+    storage.DATABASE_PATH = os.path.join(tmp, "cli.duckdb")
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, script, db_path], capture_output=True, text=True, check=True)
+    storage.write_df(pd.DataFrame(json.loads(result.stdout)), "raw_activities")
+    elapsed = time.perf_counter() - start
+    storage.close_all()
+    return elapsed
+
+
+def bench_sqlite(tmp: str, db_path: str, use_scanner) -> float:
+    storage.DATABASE_PATH = os.path.join(tmp, f"sqlite_{use_scanner}.duckdb")
+    columns = GarminSettings().sqlite_sources["activities"].columns
+    start = time.perf_counter()
+    storage.write_df(garmindb_sqlite.read_source(db_path, "activities", columns, use_scanner=use_scanner), "raw_activities")
+    elapsed = time.perf_counter() - start
+    storage.close_all()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=200_000)
+    opts = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "garmin_activities.db")
+        make_activities_db(db_path, opts.rows)
+
+        results = {"cli": bench_cli(tmp, db_path), "sqlite (json fallback)": bench_sqlite(tmp, db_path, False)}
+        probe = duckdb.connect()
+        if garmindb_sqlite._load_sqlite_extension(probe):
+            results["sqlite (scanner)"] = bench_sqlite(tmp, db_path, True)
+        probe.close()
+
+    for label, elapsed in results.items():
+        print(f"{label:<24} {elapsed:8.3f} s  {opts.rows / elapsed:12,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: per-call DuckDB connect vs. the long-lived connection manager.
+
+Usage:
+    python benchmarks/bench_storage_connections.py [--calls 2000] [--rows 100000] [--threads 4]
+
+Each call runs a small point query against a ``raw_activities`` table, either
+through a fresh ``duckdb.connect`` (the old ``get_db_connection`` behaviour)
+or through ``storage.get_db_connection`` (per-thread cursor on one instance).
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import duckdb
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import storage
+
+QUERY = "SELECT count(*), sum(tss) FROM raw_activities WHERE activity_id = ?"
+
+
+def make_db(path: str, rows: int) -> None:
+    conn = duckdb.connect(path)
+    conn.execute(
+        "CREATE TABLE raw_activities AS SELECT i::VARCHAR AS activity_id,"
+        " TIMESTAMP '2020-01-01' + i * INTERVAL 1 HOUR AS timestamp, (i % 150)::DOUBLE AS tss"
+        f" FROM range({rows}) t(i)"
+    )
+    conn.close()
+
+
+def per_call_connect(path: str, n: int) -> None:
+    conn = duckdb.connect(database=path, read_only=True)
+    try:
+        conn.execute(QUERY, [str(n)]).fetchall()
+    finally:
+        conn.close()
+
+
+def managed(n: int) -> None:
+    with storage.get_db_connection(read_only=True) as conn:
+        conn.execute(QUERY, [str(n)]).fetchall()
+
+
+def run(label: str, func, calls: int, threads: int) -> None:
+    start = time.perf_counter()
+    if threads == 1:
+        for n in range(calls):
+            func(n)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(func, range(calls)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed:8.3f} s  {elapsed / calls * 1e6:10.1f} us/call  {calls / elapsed:10,.0f} calls/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--threads", type=int, default=4)
+    opts = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.duckdb")
+        make_db(path, opts.rows)
+        storage.DATABASE_PATH = path
+
+        # DuckDB rejects a second instance of an open file, so the per-call runs go first.
+        run("connect per call", lambda n: per_call_connect(path, n), opts.calls, 1)
+        run("manager", managed, opts.calls, 1)
+        storage.close_all()
+        if opts.threads > 1:
+            # Read-only connects from several threads can share the file; a writer could not.
+            run(f"connect per call x{opts.threads}", lambda n: per_call_connect(path, n), opts.calls, opts.threads)
+            run(f"manager x{opts.threads}", managed, opts.calls, opts.threads)
+        storage.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: ingestion throughput and retry behaviour against the synthetic garmindb stand-in.
+
+Usage:
+    python benchmarks/bench_synthetic_ingestion.py [--fetches 20] [--days 1825]
+        [--failure-rate 0.1] [--malformed-rate 0.02] [--latency 0.05] [--worker]
+
+Each fetch goes through ``garmin_client.get_activities`` (retry engine
+included); CLI invocations, decoded records and failures are counted.
+"""
+
+import argparse
+import os
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import garmin_client, retry
+
+STAND_IN = os.path.join(os.path.dirname(__file__), "..", "src", "synthetic_garmindb_cli.py")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fetches", type=int, default=20)
+    parser.add_argument("--days", type=int, default=1825)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--malformed-rate", type=float, default=0.02)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--worker", action="store_true", help="Use the persistent garmindb worker")
+    opts = parser.parse_args()
+
+    garmin_client.CLI_COMMAND = [
+        "python", STAND_IN,
+        "--days", str(opts.days),
+        "--end-date", "2024-12-31",
+        "--latency", str(opts.latency),
+        "--failure-rate", str(opts.failure_rate),
+        "--malformed-rate", str(opts.malformed_rate),
+    ]
+    if opts.worker:
+        garmin_client.start_worker(garmin_client.CLI_COMMAND)
+
+    invocations = 0
+    run_cli = garmin_client._run_garmindb_cli
+
+    def counting_run(command_args):
+        nonlocal invocations
+        invocations += 1
+        return run_cli(command_args)
+
+    records = failures = 0
+    start = time.perf_counter()
+    # Short back-offs keep the benchmark about throughput, not sleeping.
+    with patch("src.garmin_client._run_garmindb_cli", counting_run), patch("src.retry.backoff_delay", return_value=0.01):
+        for _ in range(opts.fetches):
+            retry.reset_breakers()
+            activities = garmin_client.get_activities()
+            if activities is None:
+                failures += 1
+            else:
+                records += len(activities)
+    elapsed = time.perf_counter() - start
+    garmin_client.stop_worker()
+
+    print(f"fetches={opts.fetches} cli_invocations={invocations} failed_fetches={failures}")
+    print(f"records={records} elapsed={elapsed:.2f}s throughput={records / elapsed:,.0f} records/s")
+    print(f"retries per fetch={(invocations - opts.fetches) / opts.fetches:.2f}")
+
+
+if __name__ == "__main__":
+    main()
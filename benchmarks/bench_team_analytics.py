@@ -0,0 +1,91 @@
+"""
+Benchmark: SQL pushdown vs. batched athletes x days analytics vs. one DataFrame per athlete.
+
+Usage:
+    python benchmarks/bench_team_analytics.py [--athletes 10000] [--years 5] [--density 0.7] [--sample 200]
+
+Fills a ``daily_load`` table with random training days (``density`` of days
+trained) and times:
+
+* sql:         sql_analytics.training_load - computed in DuckDB, one row per athlete leaves it
+* matrix:      read_daily_load, then analytics.team_metrics - one athletes x days matrix, vectorized CTL/ATL/TSB, ramp and flags
+* per-athlete: analytics.compute_training_load per athlete, timed on ``--sample`` athletes and extrapolated
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+import duckdb
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import analytics, sql_analytics, storage
+
+THRESHOLDS = SimpleNamespace(ctl_atl_ratio_max=1.3, ramp_percentage_max=0.10)
+
+
+def make_db(path: str, athletes: int, days: int, density: float) -> None:
+    conn = duckdb.connect(path)
+    conn.execute("SELECT setseed(0.42)")
+    conn.execute(
+        f"CREATE TABLE {storage.DAILY_LOAD_TABLE} AS SELECT 'athlete_' || a AS athlete_id,"
+        " DATE '2020-01-01' + d::INTEGER AS date, (20 + random() * 180)::DOUBLE AS total_tss"
+        f" FROM range({athletes}) t(a), range({days}) s(d) WHERE random() < {density}"
+    )
+    conn.close()
+
+
+def timed(label: str, func, cells: int):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<26} {elapsed:8.3f} s  {cells / elapsed:14,.0f} athlete-days/s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--athletes", type=int, default=10_000)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--density", type=float, default=0.7)
+    parser.add_argument("--sample", type=int, default=200)
+    opts = parser.parse_args()
+    days = opts.years * 365
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DATABASE_PATH = os.path.join(tmp, "bench.duckdb")
+        make_db(storage.DATABASE_PATH, opts.athletes, days, opts.density)
+        cells = opts.athletes * days
+
+        timed("sql (sql_analytics)", lambda: sql_analytics.training_load(THRESHOLDS), cells)
+        daily_load = timed(
+            "read daily_load",
+            lambda: storage.read_daily_load(columns=["athlete_id", "date", "total_tss"]),
+            cells,
+        )
+        storage.close_all()
+        print(f"{'':<26} {len(daily_load):,} rows")
+        metrics = timed("matrix (team_metrics)", lambda: analytics.team_metrics(daily_load, THRESHOLDS), cells)
+        flagged = int(metrics[["high_atl_ctl_ratio", "high_ramp", "low_tsb"]].any(axis=1).sum())
+        print(f"{'':<26} {len(metrics):,} athletes, {flagged:,} flagged")
+
+        sample = daily_load[daily_load["athlete_id"].isin(metrics["athlete_id"].iloc[:opts.sample])]
+        groups = [g.rename(columns={"date": "timestamp", "total_tss": "tss"}) for _, g in sample.groupby("athlete_id")]
+        start = time.perf_counter()
+        for group in groups:
+            analytics.compute_training_load(group)
+        per_athlete = (time.perf_counter() - start) / max(1, len(groups))
+        print(
+            f"{'per-athlete (extrapolated)':<26} {per_athlete * opts.athletes:8.3f} s"
+            f"  {days / per_athlete:14,.0f} athlete-days/s  ({len(groups)} athletes timed)"
+        )
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"peak RSS {peak_kb / 1024:,.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
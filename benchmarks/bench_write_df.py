@@ -0,0 +1,96 @@
+"""
+Benchmark: storage.write_df (records -> Arrow -> DuckDB) vs. the pandas path.
+
+Usage:
+    python benchmarks/bench_write_df.py [--rows 500000] [--batch-size 50000]
+
+Each path runs in a fresh subprocess so peak RSS (ru_maxrss) is its own:
+
+* pandas:       records -> pd.DataFrame.from_records -> INSERT ... SELECT * FROM df
+* arrow:        records -> write_df (Arrow table, no pandas frame)
+* arrow-stream: generator of record batches -> write_df, one chunk in memory at a time
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def records(start: int, stop: int):
+    return [
+        {
+            "activity_id": str(i),
+            "timestamp": f"2020-01-01T{i % 24:02d}:00:00",
+            "sport": "running",
+            "duration_s": 3600 + i % 600,
+            "distance_m": 10000.0 + i % 5000,
+            "avg_hr": 140 + i % 20,
+            "tss": 60.0 + i % 40,
+        }
+        for i in range(start, stop)
+    ]
+
+
+def run_path(path: str, rows: int, batch_size: int, db_path: str) -> None:
+    import duckdb
+    import pandas as pd
+
+    from src import storage
+
+    storage.DATABASE_PATH = db_path
+    if path == "arrow-stream":
+        data = (records(i, min(i + batch_size, rows)) for i in range(0, rows, batch_size))
+    else:
+        data = records(0, rows)
+
+    start = time.perf_counter()
+    if path == "pandas":
+        df = pd.DataFrame.from_records(data)
+        conn = duckdb.connect(db_path)
+        conn.register("records_df", df)
+        conn.execute("CREATE TABLE bench_activities AS SELECT * FROM records_df")
+        conn.close()
+    else:
+        # Plain append, as on the pandas path (raw_activities would upsert on its key).
+        storage.write_df(data, "bench_activities")
+        storage.close_all()
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"seconds": elapsed, "peak_rss_mb": peak_kb / 1024}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--path", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    opts = parser.parse_args()
+
+    if opts.path:
+        run_path(opts.path, opts.rows, opts.batch_size, opts.db)
+        return
+
+    for path in ("pandas", "arrow", "arrow-stream"):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = subprocess.run(
+                [sys.executable, __file__, "--path", path, "--rows", str(opts.rows),
+                 "--batch-size", str(opts.batch_size), "--db", os.path.join(tmp, "bench.duckdb")],
+                capture_output=True, text=True, check=True,
+            )
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+        print(
+            f"{path:<14} {result['seconds']:8.3f} s  {opts.rows / result['seconds']:12,.0f} rows/s"
+            f"  peak RSS {result['peak_rss_mb']:8.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
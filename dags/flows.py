@@ -2,32 +2,102 @@
 Prefect 3 Flows for the Automated Garmin Training Pipeline.
 """
 
+import datetime
+
 from prefect import flow, task
 from src.settings import load_settings
-from src import garmin_client, storage, analytics, llm, planner_interface, monitoring
+from src import garmin_client, garmindb_sqlite, storage, analytics, llm, planner_interface, monitoring, retry, scheduler, write_queue, maintenance, training_load, baselines, sql_analytics
 
 settings = load_settings()
+retry.configure(settings.retry)
+storage.configure(settings.storage)
+write_queue.configure(settings.storage)
+monitoring.configure_payload_logging(
+    settings.logging.payload_max_bytes,
+    settings.logging.spill_path,
+    settings.logging.spill_max_bytes,
+    settings.logging.spill_backup_count,
+)
+
+def _since(cursors):
+    """Maps each data type's ingest cursor to the ``since`` timestamp passed to the client (see ``storage.fetch_since``)."""
+    return {
+        data_type: storage.fetch_since(cursor).isoformat()
+        for data_type, cursor in cursors.items()
+        if cursor["last_timestamp"] is not None
+    }
 
 @flow(name="sync_daily", schedule=settings.sync_daily_cron)
+@retry.retry_budget()
 def sync_daily():
     """
     Daily flow to ingest recent Garmin data and update the bronze layer.
     """
     print("Running sync_daily flow.")
-    activities = task(garmin_client.get_activities)()
-    task(storage.write_df)(activities, "raw_activities")
+    if settings.garmin.backend == "sqlite":
+        # Bulk-copy garmindb's SQLite databases straight into DuckDB; failed sources count as None.
+        results = task(garmindb_sqlite.ingest)(settings)
+    else:
+        # Only ask for data newer than what we already have.
+        cursors = task(storage.get_cursors)(settings.athlete_id)
+        # Fetch every data type concurrently so one retrying stream does not stall the rest.
+        with garmin_client.GarminClient(settings) as client:
+            results = task(client.fetch_all)(since=_since(cursors))
+        for data_type, data in results.items():
+            if data is not None:
+                task(write_queue.write_df)(data, f"raw_{data_type}", cursor=(settings.athlete_id, data_type))
+    failed = [data_type for data_type, result in results.items() if result is None]
+    for data_type in failed:
+        task(monitoring.log_event)("sync_daily_fetch_failed", {"data_type": data_type})
+    if results and len(failed) == len(results):
+        task(monitoring.log_event)("sync_daily_failed", {"data_types": failed})
+        raise RuntimeError(f"sync_daily: every data type failed ({', '.join(failed)})")
     task(monitoring.log_event)("sync_daily_ok")
 
 @flow(name="sync_catchup", schedule=settings.sync_catchup_cron)
+@retry.retry_budget()
 def sync_catchup():
     """
     Catch-up flow to ingest any missed Garmin data.
     """
     print("Running sync_catchup flow.")
-    activities = task(garmin_client.get_activities)(delta_only=True)
-    task(storage.write_df)(activities, "raw_activities")
+    cursors = task(storage.get_cursors)(settings.athlete_id)
+    with garmin_client.GarminClient(settings) as client:
+        activities = task(client.get_activities)(delta_only=True, since=_since(cursors).get("activities"))
+    if activities is None:
+        task(monitoring.log_event)("sync_catchup_fetch_failed", {"data_type": "activities"})
+        return
+    task(write_queue.write_df)(activities, "raw_activities", cursor=(settings.athlete_id, "activities"))
+
+@flow(name="sync_all_athletes", schedule=settings.sync_daily_cron)
+@retry.retry_budget()
+def sync_all_athletes():
+    """
+    Daily flow to ingest every configured athlete account in parallel,
+    rate limited per account and globally, furthest-behind accounts first.
+    """
+    print("Running sync_all_athletes flow.")
+    report = task(scheduler.run)(settings)
+    task(monitoring.log_event)("sync_all_athletes_ok", {"accounts": len(report)})
+
+@flow(name="backfill")
+@retry.retry_budget()
+def backfill(batch_size: int = garmin_client.STREAM_BATCH_SIZE):
+    """
+    Manual flow to ingest the full Garmin history in bounded batches.
+    Memory use depends on batch_size, not on the length of the history.
+    """
+    print("Running backfill flow.")
+    total = 0
+    with garmin_client.GarminClient(settings) as client:
+        for batch in client.stream_activities(batch_size=batch_size):
+            # Same cursor as the syncs, so the rows are tagged with the athlete and keyed alike.
+            task(write_queue.write_df)(batch, "raw_activities", cursor=(settings.athlete_id, "activities"))
+            total += len(batch)
+    task(monitoring.log_event)("backfill_ok", {"records": total})
 
 @flow(name="adapt_weekly", schedule=settings.adapt_weekly_cron)
+@retry.retry_budget()
 def adapt_weekly():
     """
     Weekly flow to analyze training load, potentially revise the plan with LLM,
@@ -62,11 +132,20 @@ schedulePlan:
     - rest              # if no "rest" workout found on garmin connect, skip this day
 """
 
-    df = task(storage.read_df)("SELECT * FROM raw_activities")
-    ctl_atl_metrics = task(analytics.compute_ctl_atl)(df)
-    hrv_zscore = task(analytics.compute_hrv_zscore)(df)
-    # Combine metrics - assuming evaluate_flags can handle a combined dictionary or similar structure
-    metrics = {**ctl_atl_metrics, "hrv_zscore": hrv_zscore}
+    # Both backends report the loads as of today, decayed over the rest days since the last activity.
+    today = datetime.date.today()
+    if settings.analytics_backend == "duckdb":
+        # Aggregation, EWMA and rolling statistics run in SQL; only this athlete's metrics leave DuckDB.
+        metrics = task(sql_analytics.athlete_metrics)(settings, settings.athlete_id, end=today)
+    else:
+        # Folds the days since the stored CTL/ATL state into it instead of recomputing the whole history.
+        load = task(training_load.update)(settings.athlete_id, end=today)
+        ctl_atl_metrics = {key: load[key] for key in ("ctl", "atl", "tsb")}
+        # Today's HRV / resting HR / sleep z-scores from the persisted rolling windows.
+        baseline = task(baselines.update)(settings.athlete_id, settings.baselines.windows)
+        zscores = {f"{metric}_zscore": stats["zscore"] for metric, stats in baseline.items()}
+        # Combine metrics - assuming evaluate_flags can handle a combined dictionary or similar structure
+        metrics = {**ctl_atl_metrics, "hrv_zscore": None, **zscores}
     flags = task(analytics.evaluate_flags)(metrics)
 
     if flags:
@@ -76,4 +155,17 @@ schedulePlan:
     else:
         print("No flags detected, no plan revision needed.")
 
-    task(monitoring.alert)(metrics, flags)
\ No newline at end of file
+    task(monitoring.alert)(metrics, flags)
+
+@flow(name="storage_maintenance", schedule=settings.maintenance_cron)
+@retry.retry_budget()
+def storage_maintenance():
+    """
+    Monthly flow: retention, table rewrites, checkpoint, compaction and statistics.
+    """
+    print("Running storage_maintenance flow.")
+    report = task(maintenance.run)(settings)
+    task(monitoring.log_event)(
+        "storage_maintenance_ok",
+        {"bytes_reclaimed": report["bytes_reclaimed"], "seconds": report["total_seconds"]},
+    )
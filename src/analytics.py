@@ -7,75 +7,347 @@ based on configured thresholds.
 
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from src.settings import Settings # Import Settings class
 
+def requires_columns(*columns: str):
+    """Declares the input columns a metric reads, so callers can project only those (``storage.read_table``)."""
+    def decorator(func):
+        func.required_columns = list(columns)
+        return func
+    return decorator
+
 # Constants for CTL/ATL calculation (days)
 CTL_DAYS = 42
 ATL_DAYS = 7
+# Ramp rate: relative CTL change over this many days
+RAMP_DAYS = 7
+# TSB below this is flagged as low
+LOW_TSB_THRESHOLD = -10
+
+# Longest block the EWMA scan handles in closed form; bounded so decay**-block stays well inside float64.
+_EWMA_MAX_BLOCK = 256
+_EWMA_MAX_GROWTH = 1e12
+
+
+def ewma_alpha(span: float) -> float:
+    """Smoothing factor for a span in days, as pandas ``ewm(span=...)`` defines it."""
+    return 2.0 / (span + 1.0)
 
-def compute_ctl_atl(activities_df: pd.DataFrame) -> Dict[str, Any]:
+
+def ewma(values, alpha: float, initial=0.0) -> np.ndarray:
+    """
+    Exponentially weighted moving average ``y[t] = (1 - alpha) * y[t-1] + alpha * x[t]`` along the last axis.
+    The recurrence is solved in closed form over blocks of days (cumulative sums of decay-scaled
+    inputs), so a 2-D (athletes x days) array runs as a handful of whole-array NumPy operations.
+    Args:
+        values (array-like): Inputs, days along the last axis.
+        alpha (float): Smoothing factor in (0, 1].
+        initial (float or array-like): State before the first day (one per row for 2-D input). Defaults to 0.
+    Returns: np.ndarray: The EWMA for every day, same shape as ``values``.
     """
-    Computes Chronic Training Load (CTL), Acute Training Load (ATL), and Training Stress Balance (TSB).
+    x = np.asarray(values, dtype=float)
+    state = np.array(np.broadcast_to(np.asarray(initial, dtype=float), x.shape[:-1]))
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        return x.copy()
+    block = int(min(_EWMA_MAX_BLOCK, max(1, np.log(_EWMA_MAX_GROWTH) // -np.log(decay))))
+    powers = decay ** np.arange(1, block + 1)
+    out = np.empty_like(x)
+    for start in range(0, x.shape[-1], block):
+        chunk = x[..., start:start + block]
+        p = powers[:chunk.shape[-1]]
+        # y[j] = decay**(j+1) * (state + alpha * sum_{k<=j} x[k] / decay**(k+1))
+        y = p * (state[..., None] + alpha * np.cumsum(chunk / p, axis=-1))
+        out[..., start:start + block] = y
+        state = y[..., -1]
+    return out
+
+
+def _days(values) -> np.ndarray:
+    """Calendar day (datetime64[D]) of each value; tz-aware or string values are taken in UTC, as storage does."""
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_dtype(values.dtype):
+        return values.to_numpy().astype('datetime64[D]')
+    return pd.to_datetime(values, utc=True).dt.tz_localize(None).to_numpy().astype('datetime64[D]')
+
+
+def _day(value) -> np.datetime64:
+    return np.datetime64(pd.Timestamp(value).date(), 'D')
+
+
+def daily_tss(activities_df: pd.DataFrame, end=None, start=None) -> pd.Series:
+    """
+    Sums TSS per calendar day, with a zero for every rest day in between.
+    Args:
+        activities_df (pd.DataFrame): Rows with 'timestamp' (datetime-like) and 'tss' (numeric).
+        end (date-like, optional): Last day of the series, so rest days up to e.g. today decay the load.
+            Defaults to the day of the last activity.
+        start (date-like, optional): First day of the series; earlier activities are ignored.
+            Defaults to the day of the first activity.
+    Returns: pd.Series: TSS indexed by day (DatetimeIndex), empty if there are no days to cover.
+    """
+    days = _days(activities_df['timestamp'])
+    tss = pd.to_numeric(activities_df['tss'], errors='coerce').fillna(0.0).to_numpy(dtype=float)
+    valid = ~np.isnat(days)
+    first = _day(start) if start is not None else (days[valid].min() if valid.any() else None)
+    if first is not None:
+        valid &= days >= first
+    days, tss = days[valid], tss[valid]
+    last = days.max() if len(days) else None
+    if end is not None:
+        last = _day(end) if last is None else max(last, _day(end))
+    if first is None or last is None or last < first:
+        return pd.Series(dtype=float, index=pd.DatetimeIndex([], name='date'), name='tss')
+    n_days = int((last - first).astype(int)) + 1
+    totals = np.bincount((days - first).astype(int), weights=tss, minlength=n_days)
+    return pd.Series(totals, index=pd.date_range(first, periods=n_days, freq='D', name='date'), name='tss')
+
+
+def compute_training_load(
+    activities_df: pd.DataFrame,
+    end=None,
+    initial: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Computes the full daily CTL/ATL/TSB series: TSS is summed per calendar day (rest days count as 0)
+    and each load is an EWMA over days, CTL with a 42-day and ATL with a 7-day span.
+    Args:
+        activities_df (pd.DataFrame): Rows with 'timestamp' and 'tss'; any number of activities per day.
+        end (date-like, optional): Extend the series with rest days up to this day.
+        initial (Dict[str, Any], optional): State to continue from, as returned here or stored by
+            ``training_load``: 'ctl'/'atl' (default 0) as of 'date'. The series then starts the day
+            after 'date' and only later activities are folded in.
+    Returns: Dict[str, Any]: {'series': DataFrame of tss/ctl/atl/tsb per day, 'date', 'ctl', 'atl', 'tsb'}
+        (the latest day's values; the initial state, or 0 and date None, if there are no days).
+    """
+    initial = initial or {}
+    start = pd.Timestamp(initial['date']) + pd.Timedelta(days=1) if initial.get('date') is not None else None
+    if activities_df.empty:
+        activities_df = pd.DataFrame({'timestamp': pd.Series(dtype='datetime64[ns]'), 'tss': pd.Series(dtype=float)})
+    tss = daily_tss(activities_df, end=end, start=start)
+    ctl = ewma(tss.to_numpy(), ewma_alpha(CTL_DAYS), initial.get('ctl', 0.0))
+    atl = ewma(tss.to_numpy(), ewma_alpha(ATL_DAYS), initial.get('atl', 0.0))
+    series = pd.DataFrame({'tss': tss.to_numpy(), 'ctl': ctl, 'atl': atl, 'tsb': ctl - atl}, index=tss.index)
+    if series.empty:
+        ctl_0, atl_0 = initial.get('ctl', 0), initial.get('atl', 0)
+        return {"series": series, "date": initial.get('date'), "ctl": ctl_0, "atl": atl_0, "tsb": ctl_0 - atl_0}
+    latest = series.iloc[-1]
+    return {
+        "series": series,
+        "date": series.index[-1].date(),
+        "ctl": float(latest['ctl']),
+        "atl": float(latest['atl']),
+        "tsb": float(latest['tsb']),
+    }
+
+
+@requires_columns('timestamp', 'tss')
+def compute_ctl_atl(activities_df: pd.DataFrame, end=None) -> Dict[str, Any]:
+    """
+    Computes Chronic Training Load (CTL), Acute Training Load (ATL), and Training Stress Balance (TSB)
+    on the latest day (see ``compute_training_load`` for the full series).
     Assumes activities_df has 'timestamp' (datetime) and 'tss' (numeric) columns.
     Args:
         activities_df (pd.DataFrame): DataFrame containing activity data.
+        end (date-like, optional): Decay the loads through rest days up to this day.
     Returns: Dict[str, Any]: Dictionary containing computed metrics (e.g., {'ctl': 50, 'atl': 45, 'tsb': 5}).
     """
     if activities_df.empty or 'timestamp' not in activities_df.columns or 'tss' not in activities_df.columns:
         print("Analytics compute_ctl_atl: Input DataFrame is empty or missing required columns.")
         return {"ctl": 0, "atl": 0, "tsb": 0}
 
-    # Ensure data is sorted by timestamp
-    activities_df = activities_df.sort_values(by='timestamp').copy()
+    load = compute_training_load(activities_df, end=end)
+    latest_metrics = {key: load[key] for key in ('ctl', 'atl', 'tsb')}
+
+    print(f"Analytics compute_ctl_atl: Computed CTL={latest_metrics['ctl']:.2f}, ATL={latest_metrics['atl']:.2f}, TSB={latest_metrics['tsb']:.2f}")
+    return latest_metrics
+
+@requires_columns('date', 'total_tss')
+def compute_ctl_atl_from_daily_load(daily_load_df: pd.DataFrame, end=None) -> Dict[str, Any]:
+    """
+    Computes CTL/ATL/TSB from the compact ``daily_load`` table (one row per day) instead of raw activities.
+    Args:
+        daily_load_df (pd.DataFrame): Rows from ``storage.read_daily_load`` ('date', 'total_tss').
+        end (date-like, optional): Decay the loads through rest days up to this day.
+    Returns: Dict[str, Any]: Same as ``compute_ctl_atl``.
+    """
+    if daily_load_df.empty or 'date' not in daily_load_df.columns:
+        return compute_ctl_atl(pd.DataFrame())
+    return compute_ctl_atl(daily_load_df.rename(columns={'date': 'timestamp', 'total_tss': 'tss'}), end=end)
+
+def load_matrix(daily_load_df: pd.DataFrame, end=None) -> Tuple[np.ndarray, pd.DatetimeIndex, np.ndarray]:
+    """
+    Builds the athletes x days TSS matrix from ``daily_load`` rows in one scatter (``np.bincount``).
+    Every athlete shares the same calendar, from the first recorded day to the last (or ``end``);
+    days without a row, including days before an athlete's first activity, are 0.
+    Args:
+        daily_load_df (pd.DataFrame): Rows with 'athlete_id', 'date' and 'total_tss'.
+        end (date-like, optional): Extend the calendar with rest days up to this day.
+    Returns: Tuple[np.ndarray, pd.DatetimeIndex, np.ndarray]: Athlete ids (sorted), the days, and the
+        (athletes, days) float matrix.
+    """
+    codes, athletes = pd.factorize(daily_load_df['athlete_id'], sort=True)
+    days = _days(daily_load_df['date'])
+    tss = pd.to_numeric(daily_load_df['total_tss'], errors='coerce').fillna(0.0).to_numpy(dtype=float)
+    valid = (codes >= 0) & ~np.isnat(days)
+    codes, days, tss = codes[valid], days[valid], tss[valid]
+    if not len(days):
+        return np.asarray(athletes), pd.DatetimeIndex([], name='date'), np.zeros((len(athletes), 0))
+    first, last = days.min(), days.max()
+    if end is not None:
+        last = max(last, _day(end))
+    n_days = int((last - first).astype(int)) + 1
+    cells = codes.astype(np.int64) * n_days + (days - first).astype(np.int64)
+    matrix = np.bincount(cells, weights=tss, minlength=len(athletes) * n_days).reshape(len(athletes), n_days)
+    return np.asarray(athletes), pd.date_range(first, periods=n_days, freq='D', name='date'), matrix
 
-    # Calculate EMA for CTL and ATL
-    # Pandas ewm uses alpha = 2/(span+1)
-    activities_df['ctl'] = activities_df['tss'].ewm(span=CTL_DAYS, adjust=False).mean()
-    activities_df['atl'] = activities_df['tss'].ewm(span=ATL_DAYS, adjust=False).mean()
 
-    # TSB = CTL - ATL
-    activities_df['tsb'] = activities_df['ctl'] - activities_df['atl']
+def team_metrics(
+    daily_load_df: pd.DataFrame,
+    settings: Settings,
+    end=None,
+    chunk_size: int = 2048,
+) -> pd.DataFrame:
+    """
+    CTL/ATL/TSB, ramp rate and flags on the latest day for every athlete in one vectorized pass
+    over the athletes x days matrix (``load_matrix``), instead of one DataFrame per athlete.
+    Athletes are processed ``chunk_size`` rows at a time so the full CTL/ATL series never exist
+    for everyone at once.
+    Args:
+        daily_load_df (pd.DataFrame): ``daily_load`` rows ('athlete_id', 'date', 'total_tss') for any athletes.
+        settings (Settings): Thresholds (``ctl_atl_ratio_max``, ``ramp_percentage_max``).
+        end (date-like, optional): Decay every athlete's load through rest days up to this day.
+        chunk_size (int): Athletes per block.
+    Returns: pd.DataFrame: One row per athlete: athlete_id, date, ctl, atl, tsb, ramp_rate (relative CTL
+        change over RAMP_DAYS; NaN without history), atl_ctl_ratio and the flags high_atl_ctl_ratio,
+        high_ramp and low_tsb.
+    """
+    athletes, days, tss = load_matrix(daily_load_df, end=end)
+    n_athletes, n_days = tss.shape
+    ctl, atl, ctl_before = (np.zeros(n_athletes) for _ in range(3))
+    ctl_alpha, atl_alpha = ewma_alpha(CTL_DAYS), ewma_alpha(ATL_DAYS)
+    for start in range(0, n_athletes if n_days else 0, chunk_size):
+        block = tss[start:start + chunk_size]
+        ctl_series = ewma(block, ctl_alpha)
+        ctl[start:start + chunk_size] = ctl_series[:, -1]
+        atl[start:start + chunk_size] = ewma(block, atl_alpha)[:, -1]
+        if n_days > RAMP_DAYS:
+            ctl_before[start:start + chunk_size] = ctl_series[:, -1 - RAMP_DAYS]
 
-    # Get the latest values
-    latest_metrics = activities_df.iloc[-1][['ctl', 'atl', 'tsb']].to_dict()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ramp_rate = np.where(ctl_before > 0, (ctl - ctl_before) / ctl_before, np.nan)
+        ratio = np.where(ctl > 0, atl / ctl, np.nan)
+    tsb = ctl - atl
+    return pd.DataFrame({
+        'athlete_id': athletes,
+        'date': days[-1].date() if n_days else None,
+        'ctl': ctl,
+        'atl': atl,
+        'tsb': tsb,
+        'ramp_rate': ramp_rate,
+        'atl_ctl_ratio': ratio,
+        # NaN compares False: no flag without a CTL to compare against.
+        'high_atl_ctl_ratio': ratio > settings.ctl_atl_ratio_max,
+        'high_ramp': ramp_rate > settings.ramp_percentage_max,
+        'low_tsb': tsb < LOW_TSB_THRESHOLD,
+    })
 
-    print(f"Analytics compute_ctl_atl: Computed CTL={latest_metrics['ctl']:.2f}, ATL={latest_metrics['atl']:.2f}, TSB={latest_metrics['tsb']:.2f}")
-    return latest_metrics
 
-def compute_hrv_zscore(hrv_data: List[Dict[str, Any]]) -> Optional[float]:
+# Readings in the HRV baseline when no window is configured (Settings.baselines.windows).
+HRV_WINDOW = 30
+
+
+class RollingStats:
+    """
+    Mean and sample standard deviation of the last ``window`` readings, updated in O(1) per reading:
+    a ring buffer holds the window, and Welford's update adds the new reading and removes the one it
+    replaces. NaN readings are skipped.
     """
-    Computes the HRV z-score based on a rolling baseline.
+
+    def __init__(self, window: int, values=()):
+        self.window = int(window)
+        self._buffer = np.zeros(self.window)
+        self._head = 0  # index of the oldest reading once the window is full
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        for value in values:
+            self.push(value)
+
+    def push(self, value: float):
+        value = float(value)
+        if np.isnan(value):
+            return
+        if self.count < self.window:
+            self._buffer[self.count] = value
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (value - self.mean)
+            return
+        oldest = self._buffer[self._head]
+        self._buffer[self._head] = value
+        self._head = (self._head + 1) % self.window
+        previous_mean = self.mean
+        self.mean += (value - oldest) / self.window
+        self._m2 = max(0.0, self._m2 + (value - oldest) * (value - self.mean + oldest - previous_mean))
+
+    @property
+    def full(self) -> bool:
+        return self.count == self.window
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self._m2 / (self.count - 1))) if self.count > 1 else float('nan')
+
+    @property
+    def latest(self) -> Optional[float]:
+        if self.count == 0:
+            return None
+        return float(self._buffer[(self._head + self.count - 1) % self.window])
+
+    def zscore(self, value: Optional[float] = None) -> Optional[float]:
+        """z-score of ``value`` (default: the latest reading) against a full window; None otherwise."""
+        value = self.latest if value is None else value
+        std = self.std
+        if value is None or not self.full or not std > 0:
+            return None
+        return float((value - self.mean) / std)
+
+    def values(self) -> np.ndarray:
+        """Readings in the window, oldest first."""
+        return np.concatenate([self._buffer[self._head:self.count], self._buffer[:self._head]])
+
+
+@requires_columns('timestamp', 'hrv')
+def compute_hrv_zscore(hrv_data: List[Dict[str, Any]], window: int = HRV_WINDOW) -> Optional[float]:
+    """
+    Computes the HRV z-score of the latest reading against the rolling baseline that ends on it.
+    Only the last ``window`` readings are used (see ``baselines`` for the persisted, incremental version).
     Assumes hrv_data is a list of dictionaries with a 'hrv' key (numeric).
     Args:
-        hrv_data (List[Dict[str, Any]]): List of dictionaries containing HRV data.
+        hrv_data (List[Dict[str, Any]]): List of dictionaries containing HRV data, oldest first.
+        window (int): Readings in the baseline. Defaults to HRV_WINDOW.
     Returns: Optional[float]: The latest HRV z-score, or None if insufficient data.
     """
     if not hrv_data:
         print("Analytics compute_hrv_zscore: Input HRV data is empty.")
         return None
 
-    # Convert list of dicts to DataFrame
-    hrv_df = pd.DataFrame(hrv_data)
-
-    if 'hrv' not in hrv_df.columns:
-         print("Analytics compute_hrv_zscore: Input HRV data missing 'hrv' column.")
-         return None
-
-    # Calculate rolling mean and standard deviation (e.g., 30-day rolling window)
-    window_size = 30 # TODO: Make window size configurable via settings
-    if len(hrv_df) < window_size:
-        print(f"Analytics compute_hrv_zscore: Insufficient data ({len(hrv_df)} points) for {window_size}-day rolling window.")
+    if any('hrv' not in row for row in hrv_data[-window:]):
+        print("Analytics compute_hrv_zscore: Input HRV data missing 'hrv' column.")
         return None
 
-    hrv_df['hrv_mean'] = hrv_df['hrv'].rolling(window=window_size).mean()
-    hrv_df['hrv_std'] = hrv_df['hrv'].rolling(window=window_size).std()
-
-    # Calculate z-score
-    hrv_df['hrv_zscore'] = (hrv_df['hrv'] - hrv_df['hrv_mean']) / hrv_df['hrv_std']
+    if len(hrv_data) < window:
+        print(f"Analytics compute_hrv_zscore: Insufficient data ({len(hrv_data)} points) for {window}-day rolling window.")
+        return None
 
-    # Get the latest z-score
-    latest_zscore = hrv_df['hrv_zscore'].iloc[-1]
+    stats = RollingStats(window, [row['hrv'] if row['hrv'] is not None else np.nan for row in hrv_data[-window:]])
+    latest_zscore = stats.zscore()
+    if latest_zscore is None:
+        print("Analytics compute_hrv_zscore: Baseline window has missing or constant readings.")
+        return None
 
     print(f"Analytics compute_hrv_zscore: Latest HRV z-score: {latest_zscore:.2f}")
     return latest_zscore
@@ -115,9 +387,9 @@ def evaluate_flags(metrics: Dict[str, Any], settings: Settings) -> Dict[str, Any
     # TODO: Add more flags based on other metrics and settings (e.g., sleep, TSB)
     # Example: Low TSB flag
     tsb = metrics.get('tsb', 0)
-    if tsb < -10: # Example threshold for low TSB
+    if tsb < LOW_TSB_THRESHOLD:
         flags['low_tsb'] = True
-        print(f"Flagged: Low TSB ({tsb:.2f}) < threshold (-10)")
+        print(f"Flagged: Low TSB ({tsb:.2f}) < threshold ({LOW_TSB_THRESHOLD})")
     else:
         flags['low_tsb'] = False
 
@@ -0,0 +1,89 @@
+"""
+Online Rolling Baselines
+
+Rolling mean / standard deviation baselines for the daily wellness readings in
+``storage.BASELINE_SOURCE`` (HRV, resting HR, sleep), one window per metric
+with lengths from ``Settings.baselines.windows``.
+
+Each window is an ``analytics.RollingStats`` ring buffer stored per athlete in
+DuckDB (``storage.BASELINE_STATE_TABLE``) with the timestamp of its last
+reading. An update reads only the readings after that timestamp and pushes
+them in O(1) each, so today's z-score never touches the history. A window is
+rebuilt from the history when it is missing, its configured length changed, or
+``storage`` dropped it because a backdated or corrected reading arrived;
+re-fetched readings that did not change keep it.
+"""
+
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from src import analytics, storage
+from src.monitoring import inc_counter
+
+
+def _timestamps(values: pd.Series) -> pd.Series:
+    # Same normalisation as the stored cursors: naive UTC.
+    return pd.to_datetime(values, utc=True).dt.tz_localize(None)
+
+
+def update(athlete_id: str, windows: Dict[str, int]) -> Dict[str, Dict[str, Any]]:
+    """
+    Folds new readings into an athlete's stored baselines and returns today's statistics.
+    Args:
+        athlete_id (str): Athlete to update.
+        windows (Dict[str, int]): Metric (column of the source table) -> readings in its window.
+    Returns: Dict[str, Dict[str, Any]]: metric -> {'value', 'mean', 'std', 'zscore', 'count', 'rebuilt'};
+        'zscore' is None until the window is full.
+    """
+    stored = storage.get_baseline_states(athlete_id)
+    stats: Dict[str, analytics.RollingStats] = {}
+    last: Dict[str, Optional[pd.Timestamp]] = {}
+    rebuilt = set()
+    for metric, window in windows.items():
+        state = stored.get(metric)
+        if state is None or state["window_size"] != window:
+            stats[metric], last[metric] = analytics.RollingStats(window), None
+            rebuilt.add(metric)
+        else:
+            stats[metric], last[metric] = analytics.RollingStats(window, state["values"]), state["last_timestamp"]
+
+    # Read from the oldest stored window on; from the start of history if any window is rebuilt.
+    where: Dict[str, Any] = {"athlete_id": athlete_id}
+    if windows and not rebuilt:
+        where[storage.CURSOR_TIMESTAMP_COLUMN] = (min(last.values()), None)
+    readings = storage.read_table(
+        storage.BASELINE_SOURCE,
+        columns=[storage.CURSOR_TIMESTAMP_COLUMN, *windows],
+        where=where,
+        order_by=[storage.CURSOR_TIMESTAMP_COLUMN],
+    ) if windows else pd.DataFrame()
+
+    changed = {}
+    if not readings.empty:
+        ts = _timestamps(readings[storage.CURSOR_TIMESTAMP_COLUMN])
+        for metric, window in windows.items():
+            new = readings[metric][ts > last[metric]] if last[metric] is not None else readings[metric]
+            if new.empty:
+                continue
+            # A rebuilt window only needs its last ``window`` readings.
+            for value in new.dropna().to_numpy(dtype=float)[-window:] if metric in rebuilt else new.to_numpy(dtype=float):
+                stats[metric].push(value)
+            last[metric] = ts.max()
+            changed[metric] = {"window_size": window, "last_timestamp": last[metric], "values": stats[metric].values()}
+    if changed:
+        storage.save_baseline_states(athlete_id, changed)
+    inc_counter("baseline_rebuilds_total", len(rebuilt))
+    inc_counter("baseline_incremental_updates_total", len(windows) - len(rebuilt))
+
+    return {
+        metric: {
+            "value": s.latest,
+            "mean": s.mean if s.count else None,
+            "std": s.std if s.count > 1 else None,
+            "zscore": s.zscore(),
+            "count": s.count,
+            "rebuilt": metric in rebuilt,
+        }
+        for metric, s in stats.items()
+    }
@@ -1,35 +1,35 @@
 """Garmin client utilities using the ``garmindb`` CLI."""
 
+import asyncio
 import json
 import subprocess
-import time
-from typing import Any, Dict, Optional
+import tempfile
+from typing import IO, Any, Dict, Iterator, List, Optional
 
+import pandas as pd
+
+from src.garmindb_worker import GarmindbWorker, WorkerError
 from src.monitoring import log_event
+from src.response_cache import ResponseCache
+from src.retry import CircuitOpenError, acall_with_retry, call_with_retry
+from src.retry import configure as configure_retry
+from src.settings import RetrySettings, Settings
 
+# Default command used to invoke garmindb; ``GarminClient`` passes ``Settings.garmin.cli_command`` instead.
+CLI_COMMAND: List[str] = ["python", "garmindb_cli.py"]
 
-def retry(tries: int = 3, delay: int = 5):
-    """Retry decorator with exponential backoff."""
+# Records per batch yielded by the streaming fetchers.
+STREAM_BATCH_SIZE = 5000
+STREAM_CHUNK_SIZE = 64 * 1024
+# Largest single record the streaming parser buffers; bigger (or malformed) output fails the stream.
+STREAM_MAX_RECORD_SIZE = 16 * 1024 * 1024
 
-    def decorator(func):
-        def wrapper(*args, **kwargs):
-            _tries, _delay = tries, delay
-            while _tries > 1:
-                result = func(*args, **kwargs)
-                if result and result.get("returncode", -1) == 0:
-                    return result
-                log_event(
-                    "garmin_client_retry_attempt",
-                    {"function": func.__name__, "tries_left": _tries - 1, "delay": _delay},
-                )
-                time.sleep(_delay)
-                _tries -= 1
-                _delay *= 2
-            return func(*args, **kwargs)
+# Long-lived worker used instead of spawning the CLI per call (see ``start_worker``).
+_worker: Optional[GarmindbWorker] = None
 
-        return wrapper
-
-    return decorator
+# Raw response cache (see ``enable_cache``): "off", "record" or "replay".
+_cache: Optional[ResponseCache] = None
+_cache_mode = "off"
 
 
 # Authentication and token refresh are handled by ``garmindb_cli.py``.
@@ -47,10 +47,104 @@ def refresh_access_token() -> None:
     print("Garmin token refresh handled by garmindb_cli.py.")
 
 
-def _run_garmindb_cli(command_args: list) -> Optional[Dict[str, Any]]:
-    """Run the ``garmindb_cli.py`` script as a subprocess."""
+def start_worker(cli_command: Optional[List[str]] = None, timeout: float = 300.0) -> GarmindbWorker:
+    """Start a persistent garmindb worker and route CLI calls through it."""
+
+    global _worker
+    stop_worker()
+    _worker = GarmindbWorker(cli_command or CLI_COMMAND, timeout=timeout)
+    _worker.start()
+    log_event("garmin_client_worker_started", {"command": " ".join(cli_command or CLI_COMMAND)})
+    return _worker
+
+
+def stop_worker() -> None:
+    """Shut down the persistent worker, if any, and fall back to spawn-per-call."""
+
+    global _worker
+    if _worker is not None:
+        _worker.close()
+        log_event("garmin_client_worker_stopped", {"spawn_count": _worker.spawn_count})
+        _worker = None
+
+
+def _run_via_worker(command_args: list) -> Optional[Dict[str, Any]]:
+    """Run a CLI command on the persistent worker (respawned automatically if it died)."""
+
+    spawn_count = _worker.spawn_count
+    try:
+        result = _worker.run(command_args)
+    except WorkerError as e:
+        log_event("garmin_client_worker_error", {"command": " ".join(command_args), "error": str(e)})
+        return None
+    if _worker.spawn_count != spawn_count:
+        log_event("garmin_client_worker_respawned", {"spawn_count": _worker.spawn_count})
+    log_event(
+        "garmin_client_worker_completed",
+        {
+            "command": " ".join(command_args),
+            "returncode": result["returncode"],
+            "stdout": result["stdout"],
+            "stderr": result["stderr"],
+        },
+    )
+    return result
+
+
+def enable_cache(cache_dir: str, mode: str = "record") -> ResponseCache:
+    """
+    Enable the raw response cache.
+
+    ``record`` stores every successful CLI response; ``replay`` serves fetches
+    from the cache only and never invokes the CLI (misses return ``None``).
+    """
+
+    global _cache, _cache_mode
+    if mode not in ("record", "replay"):
+        raise ValueError(f"Unknown cache mode: {mode}")
+    _cache = ResponseCache(cache_dir)
+    _cache_mode = mode
+    log_event("garmin_client_cache_enabled", {"cache_dir": cache_dir, "mode": mode})
+    return _cache
+
 
-    command = ["python", "garmindb_cli.py"] + command_args
+def disable_cache() -> None:
+    global _cache, _cache_mode
+    _cache, _cache_mode = None, "off"
+
+
+def _replay_from_cache(command_args: list) -> Optional[Dict[str, Any]]:
+    result = _cache.get(command_args)
+    log_event(
+        "garmin_client_cache_hit" if result is not None else "garmin_client_cache_miss",
+        {"command": " ".join(command_args)},
+    )
+    return result
+
+
+def _record_to_cache(command_args: list, result: Optional[Dict[str, Any]]) -> None:
+    if _cache_mode == "record" and _cli_succeeded(result):
+        content_hash = _cache.put(command_args, result)
+        log_event("garmin_client_cache_recorded", {"command": " ".join(command_args), "content": content_hash})
+
+
+def _run_garmindb_cli(command_args: list, cli_command: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """Run ``garmindb_cli.py`` through the response cache, the worker, or a subprocess."""
+
+    if _cache_mode == "replay":
+        return _replay_from_cache(command_args)
+    result = _execute_garmindb_cli(command_args, cli_command=cli_command)
+    _record_to_cache(command_args, result)
+    return result
+
+
+def _execute_garmindb_cli(command_args: list, cli_command: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """Run ``cli_command`` (default ``CLI_COMMAND``) as a subprocess, or on the worker if one is running."""
+
+    if _worker is not None:
+        return _run_via_worker(command_args)
+
+    command = list(cli_command or CLI_COMMAND) + command_args
     log_event("garmin_client_subprocess_command", {"command": " ".join(command)})
     try:
         result = subprocess.run(command, capture_output=True, text=True, check=False)
@@ -75,56 +169,341 @@ def _run_garmindb_cli(command_args: list) -> Optional[Dict[str, Any]]:
         return None
 
 
-@retry()
-def _run_cli(command_args: list) -> Optional[Dict[str, Any]]:
-    return _run_garmindb_cli(command_args)
+def _cli_succeeded(result: Optional[Dict[str, Any]]) -> bool:
+    return bool(result) and result.get("returncode", -1) == 0
 
 
-def get_activities(delta_only: bool = False):
-    """Fetch activity data using ``garmindb_cli.py``."""
+def _run_cli(command_args: list, cli_command: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """Run a CLI command with the settings-driven retry engine; ``None`` if Garmin's circuit is open."""
+
+    if _cache_mode == "replay":
+        # Replays are deterministic: a miss will not turn into a hit on retry.
+        return _run_garmindb_cli(command_args, cli_command=cli_command)
+    try:
+        return call_with_retry(
+            _run_garmindb_cli, command_args, upstream="garmin", is_success=_cli_succeeded, cli_command=cli_command
+        )
+    except CircuitOpenError:
+        log_event("garmin_client_circuit_open", {"command": " ".join(command_args)})
+        return None
 
-    log_event("garmin_client_get_activities_start", {"delta_only": delta_only})
-    command_args = ["fetch", "activities"]
-    if delta_only:
-        command_args.append("--delta-only")
 
-    result = _run_cli(command_args)
+def _parse_result(name: str, result: Optional[Dict[str, Any]]):
+    """Decode a CLI result's JSON stdout, logging ``garmin_client_<name>_*`` events."""
+
     if result and result["returncode"] == 0:
         try:
-            activities = json.loads(result["stdout"])
-            log_event("garmin_client_get_activities_success", {"count": len(activities)})
-            return activities
+            records = json.loads(result["stdout"])
+            log_event(f"garmin_client_{name}_success", {"count": len(records)})
+            return records
         except json.JSONDecodeError as e:
             log_event(
-                "garmin_client_get_activities_json_decode_error",
+                f"garmin_client_{name}_json_decode_error",
                 {"error": str(e), "stdout": result["stdout"]},
             )
             return None
     else:
-        log_event("garmin_client_get_activities_failed", {"result": result})
+        log_event(f"garmin_client_{name}_failed", {"result": result})
         return None
 
 
-def get_hrv():
-    """Fetch HRV data using ``garmindb_cli.py``."""
+def _since_args(since: Optional[str]) -> List[str]:
+    """CLI arguments asking only for records newer than an ingest cursor timestamp."""
 
-    log_event("garmin_client_get_hrv_start")
-    command_args = ["fetch", "hrv"]
-    result = _run_cli(command_args)
-    if result and result["returncode"] == 0:
+    return ["--since", since] if since else []
+
+
+def get_activities(delta_only: bool = False, since: Optional[str] = None, cli_command: Optional[List[str]] = None):
+    """Fetch activity data using ``garmindb_cli.py``, optionally only records after ``since``."""
+
+    log_event("garmin_client_get_activities_start", {"delta_only": delta_only, "since": since})
+    command_args = ["fetch", "activities"]
+    if delta_only:
+        command_args.append("--delta-only")
+    command_args += _since_args(since)
+
+    return _parse_result("get_activities", _run_cli(command_args, cli_command=cli_command))
+
+
+def get_hrv(since: Optional[str] = None, cli_command: Optional[List[str]] = None):
+    """Fetch HRV data using ``garmindb_cli.py``, optionally only records after ``since``."""
+
+    log_event("garmin_client_get_hrv_start", {"since": since})
+    command_args = ["fetch", "hrv"] + _since_args(since)
+    return _parse_result("get_hrv", _run_cli(command_args, cli_command=cli_command))
+
+
+class GarminStreamError(RuntimeError):
+    """Raised when a streaming fetch hits malformed output or a non-zero exit code."""
+
+
+def iter_json_records(
+    stream: IO[str], chunk_size: int = STREAM_CHUNK_SIZE, max_record_size: int = STREAM_MAX_RECORD_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """
+    Incrementally parse JSON objects from ``stream``.
+
+    Accepts either NDJSON (one object per line) or a single top-level JSON
+    array of objects; only one chunk plus the current object is buffered.
+    Raises ``json.JSONDecodeError`` at EOF inside a record, or as soon as an
+    unparsable record grows past ``max_record_size`` characters, so malformed
+    output cannot make it buffer the rest of the stream.
+    """
+
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    while True:
+        # Skip whitespace and top-level array punctuation.
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,[]":
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                return
+            buffer, pos = "", 0
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return
+            buffer = chunk
+            continue
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof or len(buffer) - pos > max_record_size:
+                raise
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                eof = True
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        pos = end
+        yield record
+
+
+def _replay_batches(command_args: list, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Stream a cached payload in batches without decompressing it all at once."""
+
+    stream = _cache.open_text(command_args)
+    if stream is None:
+        log_event("garmin_client_cache_miss", {"command": " ".join(command_args)})
+        raise GarminStreamError(f"No cached response for {' '.join(command_args)}")
+    with stream:
+        batch: List[Dict[str, Any]] = []
+        for record in iter_json_records(stream):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _stream_batches(
+    command_args: list, batch_size: int, cli_command: Optional[List[str]] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """Spawn the CLI and yield lists of at most ``batch_size`` records as stdout is read."""
+
+    if _cache_mode == "replay":
+        yield from _replay_batches(command_args, batch_size)
+        return
+
+    command = list(cli_command or CLI_COMMAND) + command_args
+    log_event("garmin_client_stream_command", {"command": " ".join(command), "batch_size": batch_size})
+    # stderr goes to a temp file so a chatty CLI cannot fill the pipe and deadlock us.
+    stderr_file = tempfile.TemporaryFile(mode="w+")
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file, text=True)
+    batch: List[Dict[str, Any]] = []
+    total = 0
+    try:
         try:
-            hrv_data = json.loads(result["stdout"])
-            log_event("garmin_client_get_hrv_success", {"count": len(hrv_data)})
-            return hrv_data
+            for record in iter_json_records(proc.stdout):
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    total += len(batch)
+                    yield batch
+                    batch = []
         except json.JSONDecodeError as e:
+            log_event("garmin_client_stream_json_decode_error", {"command": " ".join(command), "error": str(e)})
+            raise GarminStreamError(f"Malformed output from {' '.join(command)}: {e}") from e
+        if batch:
+            total += len(batch)
+            yield batch
+        returncode = proc.wait()
+        stderr_file.seek(0)
+        stderr = stderr_file.read()
+        if returncode != 0:
             log_event(
-                "garmin_client_get_hrv_json_decode_error",
-                {"error": str(e), "stdout": result["stdout"]},
+                "garmin_client_stream_failed",
+                {"command": " ".join(command), "returncode": returncode, "stderr": stderr, "records": total},
+            )
+            raise GarminStreamError(f"{' '.join(command)} exited with code {returncode}")
+        log_event("garmin_client_stream_completed", {"command": " ".join(command), "records": total})
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        stderr_file.close()
+
+
+def stream_activities(
+    delta_only: bool = False, batch_size: int = STREAM_BATCH_SIZE, cli_command: Optional[List[str]] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream activity data as DataFrames of at most ``batch_size`` rows.
+
+    Each batch can be handed straight to ``storage.write_df``; peak memory is
+    bounded by the batch size rather than the length of the history. Spawns
+    the CLI even when a worker is running, since the worker protocol returns
+    whole payloads; in replay mode the cached payload is streamed instead.
+    """
+
+    command_args = ["fetch", "activities"]
+    if delta_only:
+        command_args.append("--delta-only")
+    for batch in _stream_batches(command_args, batch_size, cli_command=cli_command):
+        yield pd.DataFrame.from_records(batch)
+
+
+def stream_hrv(batch_size: int = STREAM_BATCH_SIZE, cli_command: Optional[List[str]] = None) -> Iterator[pd.DataFrame]:
+    """Stream HRV data as DataFrames of at most ``batch_size`` rows."""
+
+    for batch in _stream_batches(["fetch", "hrv"], batch_size, cli_command=cli_command):
+        yield pd.DataFrame.from_records(batch)
+
+
+# CLI arguments for each data type fetched by ``AsyncGarminClient.fetch_all``.
+DATA_TYPE_COMMANDS: Dict[str, List[str]] = {
+    "activities": ["fetch", "activities"],
+    "hrv": ["fetch", "hrv"],
+}
+
+
+class AsyncGarminClient:
+    """
+    asyncio client that fetches several data types concurrently.
+
+    At most ``max_concurrency`` CLI processes run at once. Back-off between
+    retries uses ``asyncio.sleep`` and does not hold a concurrency slot, so a
+    retrying stream never stalls the others.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        retry_settings: Optional[RetrySettings] = None,
+        cli_command: Optional[List[str]] = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.retry_settings = retry_settings
+        self.cli_command = list(cli_command) if cli_command else None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "AsyncGarminClient":
+        return cls(
+            max_concurrency=settings.garmin.max_concurrency,
+            retry_settings=settings.retry,
+            cli_command=settings.garmin.cli_command,
+        )
+
+    async def _run_garmindb_cli(self, command_args: list) -> Optional[Dict[str, Any]]:
+        """Run ``garmindb_cli.py`` via ``asyncio.create_subprocess_exec``, honouring the response cache."""
+
+        if _cache_mode == "replay":
+            return _replay_from_cache(command_args)
+        result = await self._execute_garmindb_cli(command_args)
+        _record_to_cache(command_args, result)
+        return result
+
+    async def _execute_garmindb_cli(self, command_args: list) -> Optional[Dict[str, Any]]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        command = list(self.cli_command or CLI_COMMAND) + command_args
+        async with self._semaphore:
+            log_event("garmin_client_async_subprocess_command", {"command": " ".join(command)})
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+                )
+                stdout, stderr = await proc.communicate()
+            except FileNotFoundError:
+                log_event(
+                    "garmin_client_garmindb_cli_not_found",
+                    {"message": "garmindb_cli.py command not found. Is it in the PATH or current directory?"},
+                )
+                return None
+        result = {"stdout": stdout.decode(), "stderr": stderr.decode(), "returncode": proc.returncode}
+        log_event(
+            "garmin_client_async_subprocess_completed",
+            {"command": " ".join(command), **result},
+        )
+        return result
+
+    async def _run_cli(self, command_args: list) -> Optional[Dict[str, Any]]:
+        """Async counterpart of ``_run_cli`` with non-blocking back-off."""
+
+        if _cache_mode == "replay":
+            return await self._run_garmindb_cli(command_args)
+        try:
+            return await acall_with_retry(
+                self._run_garmindb_cli,
+                command_args,
+                upstream="garmin",
+                is_success=_cli_succeeded,
+                retry_settings=self.retry_settings,
             )
+        except CircuitOpenError:
+            log_event("garmin_client_circuit_open", {"command": " ".join(command_args)})
             return None
-    else:
-        log_event("garmin_client_get_hrv_failed", {"result": result})
-        return None
+
+    async def fetch(self, data_type: str, delta_only: bool = False, since: Optional[str] = None):
+        """Fetch a single data type; returns the decoded records or ``None`` on failure."""
+
+        log_event(f"garmin_client_get_{data_type}_start", {"delta_only": delta_only, "since": since})
+        command_args = list(DATA_TYPE_COMMANDS[data_type])
+        if delta_only:
+            command_args.append("--delta-only")
+        command_args += _since_args(since)
+        return _parse_result(f"get_{data_type}", await self._run_cli(command_args))
+
+    async def get_activities(self, delta_only: bool = False, since: Optional[str] = None):
+        return await self.fetch("activities", delta_only=delta_only, since=since)
+
+    async def get_hrv(self, since: Optional[str] = None):
+        return await self.fetch("hrv", since=since)
+
+    async def fetch_all(
+        self,
+        data_types: Optional[List[str]] = None,
+        delta_only: bool = False,
+        since: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """Fetch all ``data_types`` concurrently; failed types map to ``None``.
+
+        ``since`` maps data types to the cursor timestamp to fetch from.
+        """
+
+        data_types = data_types or list(DATA_TYPE_COMMANDS)
+        since = since or {}
+        results = await asyncio.gather(
+            *(self.fetch(t, delta_only=delta_only, since=since.get(t)) for t in data_types)
+        )
+        return dict(zip(data_types, results))
+
+
+def fetch_all(
+    data_types: Optional[List[str]] = None,
+    delta_only: bool = False,
+    max_concurrency: int = 4,
+    since: Optional[Dict[str, str]] = None,
+    cli_command: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """Blocking entry point: fetch all data types concurrently with ``AsyncGarminClient``."""
+
+    client = AsyncGarminClient(max_concurrency=max_concurrency, cli_command=cli_command)
+    return asyncio.run(client.fetch_all(data_types, delta_only=delta_only, since=since))
 
 
 def upload_data(data_type: str, data: Any) -> bool:
@@ -140,7 +519,38 @@ def upload_data(data_type: str, data: Any) -> bool:
 
 
 class GarminClient:
-    """Thin wrapper around module-level Garmin client functions."""
+    """
+    Thin wrapper around module-level Garmin client functions.
+
+    Built from settings it applies ``Settings.garmin`` for its lifetime: every
+    call uses its ``cli_command``, and the worker and response cache are
+    started here and stopped by ``close``.
+    """
+
+    def __init__(self, settings: Optional[Settings] = None):
+        self.cli_command: Optional[List[str]] = None
+        self.max_concurrency = 4
+        self._cache_enabled = False
+        if settings is not None:
+            configure_retry(settings.retry)
+            self.cli_command = list(settings.garmin.cli_command)
+            self.max_concurrency = settings.garmin.max_concurrency
+            if settings.garmin.use_worker:
+                start_worker(self.cli_command, timeout=settings.garmin.worker_timeout)
+            if settings.garmin.cache_mode != "off":
+                enable_cache(settings.garmin.cache_dir, settings.garmin.cache_mode)
+                self._cache_enabled = True
+
+    def close(self) -> None:
+        stop_worker()
+        if self._cache_enabled:
+            disable_cache()
+
+    def __enter__(self) -> "GarminClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
 
     def login(self) -> None:  # pragma: no cover - wrapper delegates to function
         login()
@@ -148,11 +558,20 @@ class GarminClient:
     def refresh_access_token(self) -> None:  # pragma: no cover - wrapper delegates to function
         refresh_access_token()
 
-    def get_activities(self, delta_only: bool = False):
-        return get_activities(delta_only=delta_only)
+    def get_activities(self, delta_only: bool = False, since: Optional[str] = None):
+        return get_activities(delta_only=delta_only, since=since, cli_command=self.cli_command)
+
+    def get_hrv(self, since: Optional[str] = None):
+        return get_hrv(since=since, cli_command=self.cli_command)
+
+    def stream_activities(self, delta_only: bool = False, batch_size: int = STREAM_BATCH_SIZE):
+        return stream_activities(delta_only=delta_only, batch_size=batch_size, cli_command=self.cli_command)
+
+    def stream_hrv(self, batch_size: int = STREAM_BATCH_SIZE):
+        return stream_hrv(batch_size=batch_size, cli_command=self.cli_command)
 
-    def get_hrv(self):
-        return get_hrv()
+    def fetch_all(self, data_types: Optional[List[str]] = None, since: Optional[Dict[str, str]] = None):
+        return fetch_all(data_types, max_concurrency=self.max_concurrency, since=since, cli_command=self.cli_command)
 
 
 __all__ = [
@@ -160,7 +579,17 @@ __all__ = [
     "refresh_access_token",
     "get_activities",
     "get_hrv",
+    "stream_activities",
+    "stream_hrv",
+    "iter_json_records",
+    "GarminStreamError",
+    "fetch_all",
+    "AsyncGarminClient",
     "upload_data",
+    "start_worker",
+    "stop_worker",
+    "enable_cache",
+    "disable_cache",
     "GarminClient",
 ]
 
@@ -0,0 +1,188 @@
+"""
+garmindb SQLite Ingestion Backend
+
+Reads garmindb's on-disk SQLite databases (activities, monitoring, HRV,
+sleep) as Arrow record batches, bypassing the CLI -> JSON -> dicts -> pandas
+path. Selected with ``garmin.backend: sqlite`` in settings.
+
+Each source's ``columns`` maps garmindb's columns onto the raw_* schema the
+CLI path writes (``timestamp``, ``tss``, ``duration_s``, ...). The batches go
+through the write queue like every other ingest, so keyed upserts, cursors,
+the Parquet layout and the daily_load refresh all apply, and only rows from
+the athlete's cursor window on (``storage.fetch_since``) are read.
+"""
+
+import io
+import os
+import sqlite3
+from typing import Dict, Iterator, List, Optional
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.json as pa_json
+
+from src import storage, write_queue
+from src.monitoring import log_event
+from src.settings import Settings
+
+# Rows per Arrow batch read from SQLite.
+BATCH_SIZE = 50_000
+
+# SQLite declared type (by substring, as SQLite's own affinity rules) -> Arrow type and SQLite cast.
+_TYPES = (("INT", pa.int64(), "INTEGER"), ("REAL", pa.float64(), "REAL"), ("FLOA", pa.float64(), "REAL"), ("DOUB", pa.float64(), "REAL"))
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _load_sqlite_extension(conn: duckdb.DuckDBPyConnection) -> bool:
+    """Load DuckDB's sqlite scanner, installing it if needed. Returns False if unavailable."""
+
+    try:
+        conn.execute("LOAD sqlite")
+        return True
+    except duckdb.Error:
+        pass
+    try:
+        conn.execute("INSTALL sqlite")
+        conn.execute("LOAD sqlite")
+        return True
+    except duckdb.Error as e:
+        log_event("garmindb_sqlite_extension_unavailable", {"error": str(e)})
+        return False
+
+
+def _json_reader(sqlite_path: str, sqlite_table: str, batch_size: int) -> pa.RecordBatchReader:
+    """
+    Fallback without the sqlite scanner: SQLite renders each batch as one NDJSON
+    string and Arrow parses it into columns, so no Python object is built per row.
+    """
+    # DuckDB pulls the batches from its own threads, one at a time.
+    src = sqlite3.connect(f"file:{sqlite_path}?mode=ro", uri=True, check_same_thread=False)
+    fields, values = [], []
+    for _, name, declared, *_ in src.execute(f"PRAGMA table_info({_quote(sqlite_table)})"):
+        declared = (declared or "").upper()
+        arrow_type, cast = next(((t, c) for marker, t, c in _TYPES if marker in declared), (pa.string(), "TEXT"))
+        fields.append(pa.field(name, arrow_type))
+        # Cast so a value stored with another type still parses against the declared schema.
+        values.append(f"'{name.replace(chr(39), chr(39) * 2)}', CAST({_quote(name)} AS {cast})")
+    if not fields:
+        src.close()
+        raise sqlite3.OperationalError(f"no such table: {sqlite_table}")
+    schema = pa.schema(fields)
+    query = (
+        f"SELECT max(rid), group_concat(line, char(10)) FROM ("
+        f"SELECT rowid AS rid, json_object({', '.join(values)}) AS line FROM {_quote(sqlite_table)} "
+        "WHERE rowid > ? ORDER BY rowid LIMIT ?)"
+    )
+    options = pa_json.ParseOptions(explicit_schema=schema)
+
+    def batches() -> Iterator[pa.RecordBatch]:
+        try:
+            last = -(2 ** 63)
+            while True:
+                last_rowid, lines = src.execute(query, [last, batch_size]).fetchone()
+                if last_rowid is None:
+                    return
+                yield from pa_json.read_json(io.BytesIO(lines.encode()), parse_options=options).to_batches()
+                last = last_rowid
+        finally:
+            src.close()
+
+    return pa.RecordBatchReader.from_batches(schema, batches())
+
+
+def _select(source: str, source_columns: List[str], columns: Dict[str, str], since: bool) -> str:
+    # Mapped raw columns first, then garmindb's other columns unchanged.
+    mapped = [f"{expression} AS {_quote(name)}" for name, expression in columns.items()]
+    kept = [_quote(name) for name in source_columns if name not in columns]
+    select = f"SELECT {', '.join(mapped + kept)} FROM {source}"
+    if since:
+        select = f"SELECT * FROM ({select}) WHERE {storage.CURSOR_TIMESTAMP_COLUMN} >= CAST(? AS TIMESTAMP)"
+    return select
+
+
+def read_source(
+    sqlite_path: str,
+    sqlite_table: str,
+    columns: Optional[Dict[str, str]] = None,
+    use_scanner: Optional[bool] = None,
+    batch_size: Optional[int] = None,
+    since: Optional[pd.Timestamp] = None,
+) -> Iterator[pa.RecordBatch]:
+    """
+    Streams a garmindb SQLite table as Arrow record batches in the raw_* schema.
+    Args:
+        sqlite_path (str): Path to the garmindb SQLite file.
+        sqlite_table (str): Table to read.
+        columns (Dict[str, str], optional): Raw column -> DuckDB SQL expression over the garmindb
+            columns. Columns not mapped are passed through unchanged.
+        use_scanner (bool, optional): Force or skip DuckDB's sqlite scanner; autodetected if None.
+        batch_size (int, optional): Rows per batch. Defaults to BATCH_SIZE.
+        since (pd.Timestamp, optional): Only rows whose mapped ``timestamp`` is at or after this.
+    Returns: Iterator[pa.RecordBatch]: Batches, read lazily; pass to ``write_queue.write_df``.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    # A private in-memory connection: the mapping runs here, the database is only written by the queue.
+    conn = duckdb.connect()
+    try:
+        if use_scanner is None:
+            use_scanner = _load_sqlite_extension(conn)
+        elif use_scanner:
+            conn.execute("LOAD sqlite")
+        if use_scanner:
+            source, params = "sqlite_scan(?, ?)", [sqlite_path, sqlite_table]
+            source_columns = [d[0] for d in conn.execute(f"SELECT * FROM {source} LIMIT 0", params).description]
+        else:
+            reader = _json_reader(sqlite_path, sqlite_table, batch_size)
+            conn.register("_garmindb_source", reader)
+            source, params, source_columns = "_garmindb_source", [], reader.schema.names
+        columns = columns or {}
+        since = since if since is not None and storage.CURSOR_TIMESTAMP_COLUMN in [*columns, *source_columns] else None
+        if since is not None:
+            params = params + [since.to_pydatetime()]
+        result = conn.execute(_select(source, source_columns, columns, since is not None), params)
+        yield from storage.arrow_reader(result, batch_size)
+    finally:
+        conn.close()
+
+
+def ingest(settings: Settings, data_types: Optional[List[str]] = None) -> Dict[str, Optional[int]]:
+    """
+    Writes the configured garmindb SQLite tables to ``raw_<data type>`` through the write queue.
+    Args:
+        settings (Settings): Application settings (``athlete_id``, ``garmin.sqlite_db_dir`` / ``garmin.sqlite_sources``).
+        data_types (List[str], optional): Subset of ``garmin.sqlite_sources`` to read. Defaults to all.
+    Returns: Dict[str, Optional[int]]: Rows written per data type, or None where the read or write failed.
+    """
+    db_dir = os.path.expanduser(settings.garmin.sqlite_db_dir)
+    sources = settings.garmin.sqlite_sources
+    data_types = data_types or list(sources)
+    counts: Dict[str, Optional[int]] = {}
+
+    probe = duckdb.connect()
+    use_scanner = _load_sqlite_extension(probe)
+    probe.close()
+    for data_type in data_types:
+        source = sources[data_type]
+        sqlite_path = os.path.join(db_dir, source.database)
+        target_table = f"raw_{data_type}"
+        if not os.path.exists(sqlite_path):
+            log_event("garmindb_sqlite_database_missing", {"data_type": data_type, "path": sqlite_path})
+            counts[data_type] = None
+            continue
+        try:
+            # Only the window around the cursor is read; the keyed upsert absorbs the overlap.
+            since = storage.fetch_since(storage.get_cursor(settings.athlete_id, data_type))
+            batches = read_source(sqlite_path, source.table, source.columns, use_scanner, since=since)
+            counts[data_type] = write_queue.write_df(batches, target_table, cursor=(settings.athlete_id, data_type))
+            log_event(
+                "garmindb_sqlite_ingest_completed",
+                {"data_type": data_type, "table": target_table, "rows": counts[data_type], "scanner": use_scanner},
+            )
+        except (duckdb.Error, sqlite3.Error, pa.ArrowException) as e:
+            log_event("garmindb_sqlite_ingest_failed", {"data_type": data_type, "error": str(e)})
+            counts[data_type] = None
+    return counts
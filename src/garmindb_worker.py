@@ -0,0 +1,244 @@
+"""Long-lived ``garmindb_cli.py`` worker speaking JSON lines over stdin/stdout.
+
+Spawning ``python garmindb_cli.py ...`` for every fetch pays a full interpreter
+start plus the garmindb import each time. The worker imports garmindb once and
+then executes the CLI script in-process for every request.
+
+Protocol (one JSON object per line):
+
+* ``{"id": 1, "op": "run", "args": ["fetch", "activities"]}`` ->
+  ``{"id": 1, "stdout": "...", "stderr": "...", "returncode": 0}``
+* ``{"id": 2, "op": "ping"}`` -> ``{"id": 2, "ok": true}``
+* ``{"id": 3, "op": "shutdown"}`` -> ``{"id": 3, "ok": true}`` and exit
+
+This file is executed directly as a script by ``GarmindbWorker`` and must not
+import anything from ``src`` at module level.
+"""
+
+import io
+import json
+import os
+import queue
+import runpy
+import subprocess
+import sys
+import threading
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from typing import Any, Dict, List, Optional
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+def _run_script(script: str, args: List[str]) -> Dict[str, Any]:
+    """Execute ``script`` in-process as ``__main__`` and capture its output."""
+
+    stdout, stderr = io.StringIO(), io.StringIO()
+    returncode = 0
+    saved_argv = sys.argv
+    sys.argv = [script] + list(args)
+    try:
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            returncode = 0
+        elif isinstance(e.code, int):
+            returncode = e.code
+        else:
+            stderr.write(str(e.code))
+            returncode = 1
+    except BaseException:  # noqa: BLE001 - report every failure to the client
+        stderr.write(traceback.format_exc())
+        returncode = 1
+    finally:
+        sys.argv = saved_argv
+    return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "returncode": returncode}
+
+
+def serve(script: str, prefix_args: Optional[List[str]] = None) -> None:
+    """Serve requests from stdin until EOF or a ``shutdown`` request."""
+
+    prefix_args = prefix_args or []
+    # Keep a private handle on the real stdout for protocol messages and point
+    # fd 1 at stderr so stray writes from the CLI cannot corrupt the stream.
+    protocol_out = os.fdopen(os.dup(1), "w", buffering=1)
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+
+    script_dir = os.path.dirname(os.path.abspath(script))
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+    try:  # Pay the garmindb import once, up front.
+        import garmindb  # noqa: F401
+    except ImportError:
+        pass
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as e:
+            response = {"id": None, "stdout": "", "stderr": f"Invalid request: {e}", "returncode": 1}
+            protocol_out.write(json.dumps(response) + "\n")
+            continue
+
+        op = request.get("op", "run")
+        if op == "ping":
+            response = {"id": request.get("id"), "ok": True}
+        elif op == "shutdown":
+            protocol_out.write(json.dumps({"id": request.get("id"), "ok": True}) + "\n")
+            break
+        else:
+            response = {"id": request.get("id"), **_run_script(script, prefix_args + request.get("args", []))}
+        protocol_out.write(json.dumps(response) + "\n")
+
+
+# ---------------------------------------------------------------------------
+# Client side
+# ---------------------------------------------------------------------------
+
+class WorkerError(RuntimeError):
+    """Raised when the worker process dies or stops responding."""
+
+
+class GarmindbWorker:
+    """Client handle for a long-lived worker process with health checks and respawn."""
+
+    def __init__(self, cli_command: Optional[List[str]] = None, timeout: float = 300.0, ping_timeout: float = 5.0):
+        cli_command = cli_command or ["python", "garmindb_cli.py"]
+        self.python = sys.executable if cli_command[0] in ("python", "python3") else cli_command[0]
+        self.script = cli_command[1]
+        self.prefix_args = list(cli_command[2:])
+        self.timeout = timeout
+        self.ping_timeout = ping_timeout
+        self.spawn_count = 0
+        self._proc: Optional[subprocess.Popen] = None
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Spawn the worker process if it is not already running."""
+
+        if self.is_alive():
+            return
+        command = [self.python, os.path.abspath(__file__), self.script] + self.prefix_args
+        self._proc = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+        self._lines = queue.Queue()
+        threading.Thread(target=self._pump, args=(self._proc, self._lines), daemon=True).start()
+        self.spawn_count += 1
+
+    @staticmethod
+    def _pump(proc: subprocess.Popen, lines: "queue.Queue[Optional[str]]") -> None:
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)  # EOF marker
+
+    def is_alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def _request(self, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        if not self.is_alive():
+            raise WorkerError("garmindb worker is not running")
+        self._next_id += 1
+        payload = {"id": self._next_id, **payload}
+        try:
+            self._proc.stdin.write(json.dumps(payload) + "\n")
+            self._proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerError(f"Failed to send request to garmindb worker: {e}") from e
+
+        while True:
+            try:
+                line = self._lines.get(timeout=timeout or self.timeout)
+            except queue.Empty:
+                raise WorkerError("Timed out waiting for garmindb worker response")
+            if line is None:
+                raise WorkerError("garmindb worker exited unexpectedly")
+            try:
+                response = json.loads(line)
+            except json.JSONDecodeError as e:
+                # The protocol stream is out of sync; the caller respawns the worker.
+                raise WorkerError(f"Malformed response from garmindb worker: {line[:200]!r}") from e
+            # Skip stale responses left over from a request that timed out.
+            if response.get("id") == payload["id"]:
+                return response
+
+    def _ping(self, timeout: Optional[float] = None) -> bool:
+        try:
+            return bool(self._request({"op": "ping"}, timeout=timeout or self.ping_timeout).get("ok"))
+        except WorkerError:
+            return False
+
+    def ping(self, timeout: Optional[float] = None) -> bool:
+        """Health check: ``True`` if the worker answers a ping within ``timeout`` (default ``ping_timeout``)."""
+
+        with self._lock:
+            return self._ping(timeout)
+
+    def run(self, command_args: List[str]) -> Dict[str, Any]:
+        """Run one CLI command, respawning the worker once if it has died or stopped answering."""
+
+        with self._lock:
+            # A hung worker is replaced before it is handed a request, not after a full request timeout.
+            if self.is_alive() and not self._ping():
+                self._kill()
+            for attempt in range(2):
+                if not self.is_alive():
+                    self.start()
+                try:
+                    response = self._request({"op": "run", "args": list(command_args)})
+                    return {
+                        "stdout": response.get("stdout", ""),
+                        "stderr": response.get("stderr", ""),
+                        "returncode": response.get("returncode", 1),
+                    }
+                except WorkerError:
+                    self._kill()
+                    if attempt == 1:
+                        raise
+
+    def _kill(self) -> None:
+        if self._proc is not None:
+            if self._proc.poll() is None:
+                self._proc.kill()
+            self._proc.wait()
+            self._proc = None
+
+    def close(self) -> None:
+        """Ask the worker to exit, killing it if it does not comply."""
+
+        with self._lock:
+            if self.is_alive():
+                try:
+                    self._request({"op": "shutdown"}, timeout=5.0)
+                    self._proc.wait(timeout=5.0)
+                except (WorkerError, subprocess.TimeoutExpired):
+                    pass
+            self._kill()
+
+    def __enter__(self) -> "GarmindbWorker":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: garmindb_worker.py <garmindb_cli.py> [prefix args...]", file=sys.stderr)
+        sys.exit(2)
+    serve(sys.argv[1], sys.argv[2:])
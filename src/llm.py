@@ -8,12 +8,16 @@ to propose training plan revisions.
 import json
 from typing import Any, Dict, List, Optional
 
-from openai import OpenAI
+from openai import APIConnectionError, APITimeoutError, InternalServerError, OpenAI, RateLimitError
 from pydantic import BaseModel, ConfigDict, Field, ValidationError
 
 from src.monitoring import log_event  # Assuming monitoring module is available
+from src.retry import CircuitOpenError, call_with_retry
 from src.settings import Settings  # Import Settings class
 
+# OpenAI errors worth retrying; auth and validation errors fail immediately.
+RETRYABLE_OPENAI_ERRORS = (APIConnectionError, APITimeoutError, InternalServerError, RateLimitError)
+
 
 # Pydantic model for a single JSON Patch operation
 class JsonPatchOperation(BaseModel):
@@ -115,7 +119,12 @@ def propose_revision(
 
     try:
         # TODO: Make model and other parameters configurable via settings
-        response = client.chat.completions.create(
+        # Transient API errors are retried; the "openai" circuit fails fast once the API is down.
+        response = call_with_retry(
+            client.chat.completions.create,
+            upstream="openai",
+            retry_on=RETRYABLE_OPENAI_ERRORS,
+            retry_settings=settings.retry,
             model="gpt-4o-mini",  # Or another suitable model
             messages=[
                 {
@@ -159,6 +168,10 @@ def propose_revision(
             print("Raw LLM response:", llm_output_str)
             return "[]"
 
+    except CircuitOpenError as e:
+        log_event("llm_propose_revision_circuit_open", {"error": str(e)})
+        print(f"Skipping OpenAI call: {e}")
+        return "[]"
     except Exception as e:
         log_event("llm_propose_revision_api_error", {"error": str(e)})
         print(f"Error calling OpenAI API: {e}")
@@ -167,5 +180,4 @@ def propose_revision(
 
 # Pydantic models, OpenAI integration, prompt building, validation, and JSON Patch formatting implemented.
 # TODO: Add openai_api_key to settings model and load it.
-# TODO: Handle potential API errors more gracefully (e.g., rate limits, invalid key).
 # TODO: Make LLM model and other parameters configurable via settings.
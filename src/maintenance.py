@@ -0,0 +1,192 @@
+"""
+Storage Maintenance
+
+Keeps the DuckDB file and the partitioned raw tables from growing and
+fragmenting over months of ingestion:
+
+1. retention   - trims the configured tables (rows) and, with the parquet layout, raw partitions
+2. rewrite     - rewrites tables that lost rows, in timestamp order
+3. checkpoint  - folds the WAL into the database file
+4. compact     - copies the database into a fresh file, releasing free blocks
+5. analyze     - refreshes optimizer statistics
+
+Runs monthly as the ``storage_maintenance`` Prefect flow, or from the command line::
+
+    python -m src.maintenance [--env ENV] [--no-compact] [--no-retention]
+"""
+
+import argparse
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+import duckdb
+
+from src import retry, storage, write_queue
+from src.monitoring import configure_payload_logging, inc_counter, log_event, set_gauge
+from src.settings import Settings, load_settings
+
+
+def _file_bytes(path: str) -> int:
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _dir_bytes(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(_file_bytes(os.path.join(root, name)) for name in files)
+    return total
+
+
+def storage_bytes() -> Dict[str, int]:
+    """Bytes used by the database file, its WAL and the partitioned raw tables."""
+    return {
+        "database": _file_bytes(storage.DATABASE_PATH),
+        "wal": _file_bytes(f"{storage.DATABASE_PATH}.wal"),
+        "parquet": _dir_bytes(storage.PARQUET_DIR) if storage.STORAGE_LAYOUT == "parquet" else 0,
+    }
+
+
+def _retention_tables(settings: Settings) -> Dict[str, int]:
+    """
+    Table -> retention days: the tables named in ``maintenance.retention_days``, plus, with the
+    parquet layout, every partitioned raw_* table at ``storage.raw_retention_days``. Rows of the
+    DuckDB tables are never deleted unless their table is named.
+    """
+    retention = {}
+    if storage.STORAGE_LAYOUT == "parquet" and os.path.isdir(storage.PARQUET_DIR):
+        retention = {t: storage.RAW_RETENTION_DAYS for t in os.listdir(storage.PARQUET_DIR) if t.startswith("raw_")}
+    retention.update(settings.maintenance.retention_days)
+    return retention
+
+
+def _rewrite_table(conn, table_name: str) -> None:
+    """Rewrites a table into fresh row groups, in timestamp order so range scans skip more."""
+    columns = {row[0] for row in conn.execute(f"DESCRIBE {storage._quote_ident(table_name)}").fetchall()}
+    order = f" ORDER BY {storage.CURSOR_TIMESTAMP_COLUMN}" if storage.CURSOR_TIMESTAMP_COLUMN in columns else ""
+    quoted = storage._quote_ident(table_name)
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        conn.execute(f"CREATE OR REPLACE TABLE {quoted} AS SELECT * FROM {quoted}{order}")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def compact_database() -> None:
+    """
+    Copies the database into a new file and swaps it in; DuckDB never shrinks a file in place.
+    Closes every managed connection first; they reopen on the compacted file. The write queue
+    is paused from before the copy until after the swap, so a write queued meanwhile lands in
+    the compacted file instead of the one being replaced.
+    """
+    path = storage.DATABASE_PATH
+    compacted = f"{path}.compact"
+    if os.path.exists(compacted):
+        os.remove(compacted)
+    with write_queue.get_write_queue().paused():
+        storage.close_all()
+        conn = duckdb.connect(path)
+        try:
+            conn.execute("CHECKPOINT")
+            source = conn.execute("SELECT current_database()").fetchone()[0]
+            quoted_path = compacted.replace("'", "''")
+            conn.execute(f"ATTACH '{quoted_path}' AS compacted")
+            conn.execute(f"COPY FROM DATABASE {storage._quote_ident(source)} TO compacted")
+            conn.execute("DETACH compacted")
+        finally:
+            conn.close()
+        os.replace(compacted, path)
+        storage.invalidate()
+
+
+@contextmanager
+def _timed(report: Dict[str, Any], step: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        report["seconds"][step] = time.perf_counter() - started
+
+
+def run(
+    settings: Settings,
+    retention: bool = True,
+    compact: Optional[bool] = None,
+    today=None,
+) -> Dict[str, Any]:
+    """
+    Runs every maintenance step and reports what it did.
+    Args:
+        settings (Settings): Application settings (``maintenance``; storage must already be configured).
+        retention (bool): Enforce retention. Defaults to True.
+        compact (bool, optional): Rewrite the database file. Defaults to ``maintenance.compact_database``.
+        today (date, optional): Reference date for retention. Defaults to today.
+    Returns: Dict[str, Any]: Bytes before/after/reclaimed, seconds per step and per-table retention results.
+    """
+    cfg = settings.maintenance
+    compact = cfg.compact_database if compact is None else compact
+    report: Dict[str, Any] = {"bytes_before": storage_bytes(), "seconds": {}, "tables": {}}
+    started = time.perf_counter()
+
+    # Queued ingestion writes land before maintenance takes the database.
+    write_queue.get_write_queue().flush()
+
+    with storage.get_db_connection() as conn:
+        if retention:
+            with _timed(report, "retention"):
+                for table_name, days in sorted(_retention_tables(settings).items()):
+                    report["tables"][table_name] = storage.enforce_retention(table_name, days, today)
+        if cfg.rewrite_after_retention:
+            with _timed(report, "rewrite"):
+                for table_name, result in report["tables"].items():
+                    if result["rows_deleted"]:
+                        _rewrite_table(conn, table_name)
+                        result["rewritten"] = True
+        with _timed(report, "checkpoint"):
+            conn.execute("FORCE CHECKPOINT")
+    if compact:
+        with _timed(report, "compact"):
+            compact_database()
+    with _timed(report, "analyze"):
+        with storage.get_db_connection() as conn:
+            conn.execute("ANALYZE")
+
+    report["bytes_after"] = storage_bytes()
+    before, after = sum(report["bytes_before"].values()), sum(report["bytes_after"].values())
+    report["bytes_reclaimed"] = before - after
+    report["total_seconds"] = time.perf_counter() - started
+    inc_counter("maintenance_bytes_reclaimed_total", max(0, report["bytes_reclaimed"]))
+    set_gauge("storage_bytes", after)
+    log_event("maintenance_completed", report)
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run DuckDB/Parquet storage maintenance")
+    parser.add_argument("--env", help="Environment config (config/<env>.yaml) layered over the defaults")
+    parser.add_argument("--no-compact", action="store_true", help="Skip rewriting the database file")
+    parser.add_argument("--no-retention", action="store_true", help="Skip retention")
+    opts = parser.parse_args(argv)
+
+    settings = load_settings(opts.env)
+    # The configuration dags/flows.py applies, so a CLI run behaves like the storage_maintenance flow.
+    retry.configure(settings.retry)
+    storage.configure(settings.storage)
+    write_queue.configure(settings.storage)
+    configure_payload_logging(
+        settings.logging.payload_max_bytes,
+        settings.logging.spill_path,
+        settings.logging.spill_max_bytes,
+        settings.logging.spill_backup_count,
+    )
+    report = run(settings, retention=not opts.no_retention, compact=False if opts.no_compact else None)
+    print(json.dumps(report, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
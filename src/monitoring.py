@@ -4,24 +4,122 @@ Monitoring Module (MVP)
 Handles basic structured logging.
 """
 
+import hashlib
 import logging
+import logging.handlers
 import json
-from typing import Dict, Any
+import os
+import threading
+from typing import Dict, Any, Optional
 
 # Configure basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Payload-aware logging: string fields larger than this many bytes are truncated
+# and logged with their length and sha256 instead (0 disables truncation).
+payload_max_bytes = 4096
+
+# Optional rotating file receiving the full text of truncated fields.
+_spill_logger: Optional[logging.Logger] = None
+
+def configure_payload_logging(max_bytes: int = 4096, spill_path: Optional[str] = None,
+                              spill_max_bytes: int = 50 * 1024 * 1024, spill_backup_count: int = 3):
+    """
+    Configures truncation of large log fields.
+    Args:
+        max_bytes (int): Byte cap per string field; 0 disables truncation.
+        spill_path (str, optional): Rotating file that receives full payloads of truncated fields.
+        spill_max_bytes (int): Size at which the spill file rotates.
+        spill_backup_count (int): Number of rotated spill files kept.
+    """
+    global payload_max_bytes, _spill_logger
+    payload_max_bytes = max_bytes
+    if _spill_logger is not None:
+        for handler in list(_spill_logger.handlers):
+            _spill_logger.removeHandler(handler)
+            handler.close()
+        _spill_logger = None
+    if spill_path:
+        os.makedirs(os.path.dirname(spill_path) or ".", exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            spill_path, maxBytes=spill_max_bytes, backupCount=spill_backup_count, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        _spill_logger = logging.getLogger(f"{__name__}.payload_spill")
+        _spill_logger.propagate = False
+        _spill_logger.setLevel(logging.INFO)
+        _spill_logger.addHandler(handler)
+
+# In-process metrics (e.g. the blueprint's db_lock_seconds): name -> value, plus each
+# metric's Prometheus type. Rendered in the text exposition format by prometheus_text().
+_metrics: Dict[str, float] = {}
+_metric_types: Dict[str, str] = {}
+_metrics_lock = threading.Lock()
+
+def inc_counter(name: str, value: float = 1.0):
+    """Adds ``value`` to the counter ``name``."""
+    with _metrics_lock:
+        _metrics[name] = _metrics.get(name, 0.0) + value
+        _metric_types[name] = "counter"
+
+def set_gauge(name: str, value: float):
+    """Sets the gauge ``name`` to ``value``."""
+    with _metrics_lock:
+        _metrics[name] = float(value)
+        _metric_types[name] = "gauge"
+
+def get_metrics() -> Dict[str, float]:
+    """Returns a snapshot of every metric."""
+    with _metrics_lock:
+        return dict(_metrics)
+
+def prometheus_text() -> str:
+    """Renders all metrics in the Prometheus text exposition format (for a scrape endpoint or textfile collector)."""
+    with _metrics_lock:
+        lines = []
+        for name in sorted(_metrics):
+            lines.append(f"# TYPE {name} {_metric_types[name]}")
+            lines.append(f"{name} {_metrics[name]:g}")
+    return "\n".join(lines) + "\n" if lines else ""
+
+def _cap_payloads(event_name: str, details: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns details with oversized string fields replaced by a prefix plus <field>_bytes/<field>_sha256."""
+    capped = {}
+    for key, value in details.items():
+        if isinstance(value, dict):
+            capped[key] = _cap_payloads(event_name, value)
+            continue
+        if isinstance(value, bytes):
+            value = value.decode("utf-8", errors="replace")
+        if not isinstance(value, str) or len(value) <= payload_max_bytes // 4:
+            # Strings under a quarter of the cap cannot exceed it in UTF-8; skip encoding them.
+            capped[key] = value
+            continue
+        encoded = value.encode("utf-8")
+        if len(encoded) <= payload_max_bytes:
+            capped[key] = value
+            continue
+        digest = hashlib.sha256(encoded).hexdigest()
+        capped[key] = encoded[:payload_max_bytes].decode("utf-8", errors="ignore") + "...[truncated]"
+        capped[f"{key}_bytes"] = len(encoded)
+        capped[f"{key}_sha256"] = digest
+        if _spill_logger is not None:
+            _spill_logger.info(json.dumps({"event": event_name, "field": key, "sha256": digest, "payload": value}))
+    return capped
+
 def log_event(event_name: str, details: Dict[str, Any] = None):
     """
     Logs a structured event in JSON format.
+    String fields over ``payload_max_bytes`` are truncated and logged with their
+    length and sha256; the full text goes to the spill file if one is configured.
     Args:
         event_name (str): The name of the event.
         details (Dict[str, Any], optional): Additional details for the event. Defaults to None.
     """
     log_data = {"event": event_name}
     if details:
-        log_data.update(details)
+        log_data.update(_cap_payloads(event_name, details) if payload_max_bytes else details)
     logger.info(json.dumps(log_data))
 
 def alert(metrics: Dict[str, Any], flags: Dict[str, Any]):
@@ -38,6 +136,6 @@ def alert(metrics: Dict[str, Any], flags: Dict[str, Any]):
         logger.info(json.dumps({"alert_condition": False, "metrics": metrics}))
 
 # Omitted for MVP:
-# - Prometheus metric emitters
+# - Prometheus scrape endpoint / pushgateway (metrics are only rendered by prometheus_text())
 # - Slack client integration
 # - Complex alert evaluation logic
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+Partitioned Parquet Store
+
+Month-partitioned Parquet layout for the raw tables, used by ``storage`` when
+``storage.layout`` is ``parquet``::
+
+    <root>/<table>/athlete_id=<athlete>/month=<YYYY-MM>/data.parquet
+
+A write rewrites only the partitions it touches, upserting on the table's
+natural key, so re-ingestion stays idempotent. Range reads list only the
+months they cover, and retention deletes whole month directories.
+"""
+
+import datetime
+import os
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PARTITION_FILE = "data.parquet"
+ATHLETE_COLUMN = "athlete_id"
+TIMESTAMP_COLUMN = "timestamp"
+
+
+def _month(value) -> str:
+    return pd.Timestamp(value).strftime("%Y-%m")
+
+
+def partition_path(root: str, table_name: str, athlete_id: str, month: str) -> str:
+    return os.path.join(root, table_name, f"{ATHLETE_COLUMN}={athlete_id}", f"month={month}", PARTITION_FILE)
+
+
+def glob_pattern(root: str, table_name: str) -> str:
+    """Glob matching every partition file of ``table_name`` (for DuckDB's ``read_parquet``)."""
+    return os.path.join(os.path.abspath(root), table_name, "*", "*", PARTITION_FILE)
+
+
+def _dedupe(table: pa.Table, key: List[str]) -> pa.Table:
+    """Keeps the last row per key, so rows from the newest write win."""
+    duplicated = table.select(key).to_pandas().duplicated(keep="last").to_numpy()
+    return table.filter(pa.array(~duplicated)) if duplicated.any() else table
+
+
+def write_partitions(root: str, table_name: str, table: pa.Table, key: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+    """
+    Upserts ``table`` into its (athlete, month) partitions.
+    Args:
+        root (str): Root directory of the store.
+        table_name (str): Logical table name (directory under ``root``).
+        table (pa.Table): Rows to write; needs ``athlete_id`` and ``timestamp`` columns.
+        key (List[str], optional): Natural key to upsert on; rows are appended to the partition if None.
+    Returns: List[Tuple[str, str]]: The (athlete_id, month) partitions that were rewritten.
+    """
+    missing = [c for c in (ATHLETE_COLUMN, TIMESTAMP_COLUMN) if c not in table.column_names]
+    if missing:
+        raise ValueError(f"Partition columns {missing} missing from data for {table_name}")
+    # The athlete is encoded in the directory; the key is unique within a partition without it.
+    key = [c for c in key or [] if c != ATHLETE_COLUMN]
+    keys = pd.DataFrame({
+        "athlete": table.column(ATHLETE_COLUMN).to_pandas().astype(str),
+        "month": pd.to_datetime(table.column(TIMESTAMP_COLUMN).to_pandas(), utc=True).dt.strftime("%Y-%m"),
+    })
+    data = table.drop_columns([ATHLETE_COLUMN])
+    written = []
+    for (athlete_id, month), indices in keys.groupby(["athlete", "month"]).indices.items():
+        part = data.take(pa.array(indices))
+        path = partition_path(root, table_name, athlete_id, month)
+        if os.path.exists(path):
+            part = pa.concat_tables([pq.read_table(path), part], promote_options="permissive")
+        if key:
+            part = _dedupe(part, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        pq.write_table(part, tmp_path)
+        os.replace(tmp_path, path)
+        written.append((athlete_id, month))
+    return written
+
+
+def partitions(root: str, table_name: str) -> Dict[Tuple[str, str], str]:
+    """Maps every (athlete_id, month) partition of ``table_name`` to its directory."""
+    table_dir = os.path.join(root, table_name)
+    found = {}
+    if not os.path.isdir(table_dir):
+        return found
+    for athlete_dir in os.listdir(table_dir):
+        if not athlete_dir.startswith(f"{ATHLETE_COLUMN}="):
+            continue
+        for month_dir in os.listdir(os.path.join(table_dir, athlete_dir)):
+            if month_dir.startswith("month="):
+                athlete_id, month = athlete_dir.split("=", 1)[1], month_dir.split("=", 1)[1]
+                found[(athlete_id, month)] = os.path.join(table_dir, athlete_dir, month_dir)
+    return found
+
+
+def partition_files(
+    root: str,
+    table_name: str,
+    athlete_id: Optional[str] = None,
+    start=None,
+    end=None,
+) -> List[str]:
+    """
+    Lists the partition files that can hold rows for an athlete and time range (partition pruning).
+    Args:
+        root (str): Root directory of the store.
+        table_name (str): Logical table name.
+        athlete_id (str, optional): Only this athlete's partitions.
+        start, end (date-like, optional): Inclusive time range; open-ended if None.
+    Returns: List[str]: Paths of the matching partition files, oldest month first.
+    """
+    first = _month(start) if start is not None else None
+    last = _month(end) if end is not None else None
+    files = []
+    for (athlete, month), directory in sorted(partitions(root, table_name).items(), key=lambda item: item[0][1]):
+        if athlete_id is not None and athlete != athlete_id:
+            continue
+        if (first and month < first) or (last and month > last):
+            continue
+        path = os.path.join(directory, PARTITION_FILE)
+        if os.path.exists(path):
+            files.append(path)
+    return files
+
+
+def drop_partitions_before(root: str, table_name: str, cutoff: datetime.date) -> List[Tuple[str, str]]:
+    """
+    Retention: deletes every month partition that ends before ``cutoff``.
+    Returns: List[Tuple[str, str]]: The (athlete_id, month) partitions removed.
+    """
+    cutoff_month = _month(cutoff)
+    dropped = []
+    for (athlete_id, month), directory in partitions(root, table_name).items():
+        # A month is only dropped once all of it is older than the cutoff.
+        if month < cutoff_month:
+            shutil.rmtree(directory)
+            dropped.append((athlete_id, month))
+    return sorted(dropped)
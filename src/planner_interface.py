@@ -12,6 +12,7 @@ import jsonpatch
 import os
 import shutil
 from src.monitoring import log_event
+from src.retry import CircuitOpenError, call_with_retry
 
 # TODO: Implement logic to apply JSON Patch locally before pushing (optional but good practice)
 # TODO: Implement interaction with garmin_planner CLI
@@ -80,7 +81,17 @@ def patch_and_push(diff: str):
     command = ["garmin_planner", "push", "--plan", patched_plan_path]
     log_event("planner_subprocess_command", {"command": " ".join(command)})
     try:
-        result = subprocess.run(command, capture_output=True, text=True, check=False)
+        # Non-zero exits are retried; the "garmin_planner" circuit fails fast after repeated failures.
+        result = call_with_retry(
+            subprocess.run,
+            command,
+            upstream="garmin_planner",
+            is_success=lambda r: r.returncode == 0,
+            retry_on=(),
+            capture_output=True,
+            text=True,
+            check=False,
+        )
 
         if result.returncode != 0:
             log_event("planner_subprocess_failed", {
@@ -105,6 +116,10 @@ def patch_and_push(diff: str):
 
             log_event("planner_patch_and_push_end", {"status": "succeeded"})
 
+    except CircuitOpenError as e:
+        log_event("planner_circuit_open", {"error": str(e)})
+        # Adhere to fail-open
+        log_event("planner_patch_and_push_end", {"status": "failed_circuit_open"})
     except FileNotFoundError:
         log_event("planner_garmin_planner_not_found", {"message": "garmin_planner command not found. Is it in the PATH?"})
         # Adhere to fail-open
@@ -0,0 +1,124 @@
+"""
+Raw Response Cache
+
+Content-addressed, gzip-compressed store of raw garmindb CLI responses.
+
+Layout under the cache root::
+
+    objects/<h[:2]>/<h>.json.gz        stdout payload, addressed by its sha256
+    refs/<command hash>/<until>.json   which payload a command returned for a date range
+
+A ref is keyed by the CLI arguments (which carry the range start, e.g.
+``--since``) and the range end (``until``, the fetch date). Identical
+payloads fetched by different commands or on different days are stored once.
+"""
+
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+
+class ResponseCache:
+    """Content-addressed cache of raw CLI responses."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.refs_dir = os.path.join(root, "refs")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.refs_dir, exist_ok=True)
+
+    @staticmethod
+    def command_hash(command_args: List[str]) -> str:
+        return hashlib.sha256(json.dumps(list(command_args)).encode()).hexdigest()
+
+    def _object_path(self, content_hash: str) -> str:
+        return os.path.join(self.objects_dir, content_hash[:2], f"{content_hash}.json.gz")
+
+    def _ref_dir(self, command_args: List[str]) -> str:
+        return os.path.join(self.refs_dir, self.command_hash(command_args))
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def put(self, command_args: List[str], result: Dict[str, Any], until: Optional[str] = None) -> str:
+        """
+        Stores a CLI result's stdout and records it for ``command_args`` / ``until``.
+        Args:
+            command_args (List[str]): CLI arguments that produced the result.
+            result (Dict[str, Any]): ``{"stdout", "stderr", "returncode"}`` as returned by the client.
+            until (str, optional): End of the fetched date range (ISO date). Defaults to today.
+        Returns: str: sha256 of the stored payload.
+        """
+        payload = result["stdout"].encode()
+        content_hash = hashlib.sha256(payload).hexdigest()
+        object_path = self._object_path(content_hash)
+        if not os.path.exists(object_path):
+            self._atomic_write(object_path, gzip.compress(payload))
+
+        until = until or datetime.date.today().isoformat()
+        ref = {
+            "command": list(command_args),
+            "until": until,
+            "content": content_hash,
+            "bytes": len(payload),
+            "returncode": result["returncode"],
+            "fetched_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        }
+        self._atomic_write(os.path.join(self._ref_dir(command_args), f"{until}.json"), json.dumps(ref).encode())
+        return content_hash
+
+    def get_ref(self, command_args: List[str], until: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Returns the ref for ``command_args`` and ``until``, or the latest one if ``until`` is None."""
+
+        ref_dir = self._ref_dir(command_args)
+        if not os.path.isdir(ref_dir):
+            return None
+        if until is None:
+            names = sorted(os.listdir(ref_dir))
+            if not names:
+                return None
+            path = os.path.join(ref_dir, names[-1])
+        else:
+            path = os.path.join(ref_dir, f"{until}.json")
+            if not os.path.exists(path):
+                return None
+        with open(path) as f:
+            return json.load(f)
+
+    def get(self, command_args: List[str], until: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Returns a cached result shaped like the client's CLI results, or None on a miss."""
+
+        ref = self.get_ref(command_args, until)
+        if ref is None:
+            return None
+        with gzip.open(self._object_path(ref["content"]), "rt") as f:
+            stdout = f.read()
+        return {"stdout": stdout, "stderr": "", "returncode": ref["returncode"]}
+
+    def open_text(self, command_args: List[str], until: Optional[str] = None) -> Optional[IO[str]]:
+        """Opens a cached payload for incremental reading (used by streaming replay)."""
+
+        ref = self.get_ref(command_args, until)
+        if ref is None:
+            return None
+        return gzip.open(self._object_path(ref["content"]), "rt")
+
+    def entries(self) -> Iterator[Dict[str, Any]]:
+        """Yields every ref in fetch order, e.g. to rebuild DuckDB from the cache."""
+
+        refs = []
+        for command_dir in os.listdir(self.refs_dir):
+            for name in os.listdir(os.path.join(self.refs_dir, command_dir)):
+                with open(os.path.join(self.refs_dir, command_dir, name)) as f:
+                    refs.append(json.load(f))
+        yield from sorted(refs, key=lambda ref: ref["fetched_at"])
@@ -0,0 +1,311 @@
+"""
+Retry Engine
+
+Settings-driven retries shared by ``garmin_client``, ``llm`` and
+``planner_interface``: exponential back-off with full jitter, a per-flow
+retry time budget, and per-upstream circuit breakers that fail fast once an
+upstream has failed repeatedly.
+"""
+
+import asyncio
+import contextvars
+import functools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from src.monitoring import log_event
+from src.settings import RetrySettings
+
+# Module-wide retry settings; replaced from ``Settings.retry`` via ``configure``.
+_settings = RetrySettings()
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, upstream: str):
+        super().__init__(f"Circuit for upstream '{upstream}' is open")
+        self.upstream = upstream
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are rejected for ``reset_timeout`` seconds. Then a single trial call
+    is let through (half-open): success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                log_event("retry_circuit_closed", {"upstream": self.name})
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            reopen = self._trial_in_flight
+            self._trial_in_flight = False
+            if reopen or (self.opened_at is None and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                log_event("retry_circuit_opened", {"upstream": self.name, "failures": self.failures})
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    """Returns the process-wide circuit breaker for ``upstream``."""
+
+    with _breakers_lock:
+        if upstream not in _breakers:
+            _breakers[upstream] = CircuitBreaker(
+                upstream, _settings.breaker_failure_threshold, _settings.breaker_reset_seconds
+            )
+        return _breakers[upstream]
+
+
+def reset_breakers() -> None:
+    """Forget all circuit breaker state (closes every circuit)."""
+
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def configure(retry_settings: RetrySettings) -> None:
+    """Use ``retry_settings`` (normally ``Settings.retry``) for all subsequent retries."""
+
+    global _settings
+    _settings = retry_settings
+    with _breakers_lock:
+        for breaker in _breakers.values():
+            breaker.failure_threshold = retry_settings.breaker_failure_threshold
+            breaker.reset_timeout = retry_settings.breaker_reset_seconds
+
+
+class RetryBudget:
+    """Wall-clock deadline after which a flow run stops scheduling retries."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+
+_budget: contextvars.ContextVar[Optional[RetryBudget]] = contextvars.ContextVar("retry_budget", default=None)
+
+
+@contextmanager
+def retry_budget(seconds: Optional[float] = None):
+    """
+    Stops retries inside the block from sleeping past ``seconds`` from now.
+    Usable as a context manager or as a decorator on a flow function.
+    """
+    token = _budget.set(RetryBudget(_settings.budget_seconds if seconds is None else seconds))
+    try:
+        yield _budget.get()
+    finally:
+        _budget.reset(token)
+
+
+def backoff_delay(attempt: int, retry_settings: Optional[RetrySettings] = None) -> float:
+    """Back-off before retry number ``attempt`` (1-based): ``base * 2**(attempt-1)``, capped, with full jitter."""
+
+    retry_settings = retry_settings or _settings
+    delay = min(retry_settings.max_delay, retry_settings.base * 2 ** (attempt - 1))
+    return random.uniform(0, delay) if retry_settings.jitter else delay
+
+
+class _Attempts:
+    """Shared bookkeeping for the sync and async retry loops."""
+
+    def __init__(self, func, upstream, is_success, retry_settings):
+        self.func_name = getattr(func, "__name__", repr(func))
+        self.upstream = upstream
+        self.is_success = is_success or (lambda result: True)
+        self.settings = retry_settings or _settings
+        self.breaker = get_breaker(upstream)
+
+    def check_circuit(self) -> None:
+        if not self.breaker.allow():
+            log_event("retry_circuit_rejected", {"upstream": self.upstream, "function": self.func_name})
+            raise CircuitOpenError(self.upstream)
+
+    def succeeded(self, result: Any) -> bool:
+        if self.is_success(result):
+            self.breaker.record_success()
+            return True
+        self.breaker.record_failure()
+        return False
+
+    def next_delay(self, attempt: int, error: Optional[BaseException]) -> Optional[float]:
+        """Delay before the next attempt, or None when retries are exhausted."""
+
+        if attempt >= self.settings.max_attempts:
+            return None
+        delay = backoff_delay(attempt, self.settings)
+        budget = _budget.get()
+        if budget is not None and delay > budget.remaining():
+            log_event(
+                "retry_budget_exhausted",
+                {"upstream": self.upstream, "function": self.func_name, "remaining": budget.remaining()},
+            )
+            return None
+        log_event(
+            "retry_attempt",
+            {
+                "upstream": self.upstream,
+                "function": self.func_name,
+                "attempt": attempt,
+                "tries_left": self.settings.max_attempts - attempt,
+                "delay": delay,
+                "error": str(error) if error else None,
+            },
+        )
+        return delay
+
+
+def call_with_retry(
+    func: Callable,
+    *args,
+    upstream: str,
+    is_success: Optional[Callable[[Any], bool]] = None,
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+    retry_settings: Optional[RetrySettings] = None,
+    **kwargs,
+) -> Any:
+    """
+    Calls ``func`` with retries.
+    Args:
+        func (Callable): The function to call.
+        upstream (str): Name of the upstream service; selects the circuit breaker.
+        is_success (Callable, optional): Predicate on the return value; falsy results are retried.
+        retry_on (tuple): Exception types that are retried. Others propagate immediately.
+        retry_settings (RetrySettings, optional): Overrides the configured settings.
+    Returns: Any: The first successful result, or the last result once retries are exhausted.
+    Raises: CircuitOpenError if the upstream's circuit is open; the last exception if every attempt raised.
+    """
+    attempts = _Attempts(func, upstream, is_success, retry_settings)
+    attempt = 0
+    while True:
+        attempt += 1
+        attempts.check_circuit()
+        error = None
+        try:
+            result = func(*args, **kwargs)
+        except retry_on as e:
+            attempts.breaker.record_failure()
+            error = e
+        except BaseException:
+            # Not retried, but still a failed call: a half-open trial must not stay in flight.
+            attempts.breaker.record_failure()
+            raise
+        else:
+            if attempts.succeeded(result):
+                return result
+        delay = attempts.next_delay(attempt, error)
+        if delay is None:
+            if error is not None:
+                raise error
+            return result
+        time.sleep(delay)
+
+
+async def acall_with_retry(
+    func: Callable,
+    *args,
+    upstream: str,
+    is_success: Optional[Callable[[Any], bool]] = None,
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+    retry_settings: Optional[RetrySettings] = None,
+    **kwargs,
+) -> Any:
+    """Async counterpart of ``call_with_retry``: awaits ``func`` and backs off with ``asyncio.sleep``."""
+
+    attempts = _Attempts(func, upstream, is_success, retry_settings)
+    attempt = 0
+    while True:
+        attempt += 1
+        attempts.check_circuit()
+        error = None
+        try:
+            result = await func(*args, **kwargs)
+        except retry_on as e:
+            attempts.breaker.record_failure()
+            error = e
+        except BaseException:
+            # Not retried, but still a failed call: a half-open trial must not stay in flight.
+            attempts.breaker.record_failure()
+            raise
+        else:
+            if attempts.succeeded(result):
+                return result
+        delay = attempts.next_delay(attempt, error)
+        if delay is None:
+            if error is not None:
+                raise error
+            return result
+        await asyncio.sleep(delay)
+
+
+def retry(
+    upstream: str,
+    is_success: Optional[Callable[[Any], bool]] = None,
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,),
+):
+    """Decorator form of ``call_with_retry`` / ``acall_with_retry``."""
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await acall_with_retry(
+                    func, *args, upstream=upstream, is_success=is_success, retry_on=retry_on, **kwargs
+                )
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return call_with_retry(func, *args, upstream=upstream, is_success=is_success, retry_on=retry_on, **kwargs)
+
+        return wrapper
+
+    return decorator
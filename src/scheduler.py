@@ -0,0 +1,191 @@
+"""
+Multi-Athlete Ingestion Scheduler
+
+Fans Garmin fetches for many accounts out across a process pool. Starts are
+throttled by a global and a per-account token bucket, accounts furthest
+behind their ingest cursor go first, and per-account throughput is reported.
+
+Fetches run in worker processes; all DuckDB writes go through the scheduling
+process's single-writer queue, since DuckDB allows a single writer per file.
+"""
+
+import heapq
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from src import garmin_client, retry, storage, write_queue
+from src.monitoring import log_event
+from src.settings import Settings
+
+
+class TokenBucket:
+    """Token bucket: ``rate`` tokens per second, holding at most ``capacity``."""
+
+    def __init__(self, rate: float, capacity: int, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._clock = clock
+        self._last = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 if one is available now)."""
+
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self._refill()
+        self.tokens -= 1
+
+
+def _fetch_job(cli_command: List[str], command_args: List[str], retry_settings) -> Tuple[Optional[list], float]:
+    """Runs in a worker process: one CLI fetch with retries. Returns (records, seconds)."""
+
+    retry.configure(retry_settings)
+    start = time.perf_counter()
+    records = garmin_client._parse_result(
+        "scheduler_fetch", garmin_client._run_cli(command_args, cli_command=list(cli_command))
+    )
+    return records, time.perf_counter() - start
+
+
+def _staleness_key(cursor: Optional[Dict[str, Any]]) -> pd.Timestamp:
+    """Priority key: never-ingested first, then the oldest cursor."""
+
+    if cursor is None or cursor["last_timestamp"] is None:
+        return pd.Timestamp.min
+    return cursor["last_timestamp"]
+
+
+def plan_jobs(settings: Settings, data_types: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Builds the fetch jobs for every configured account, ordered furthest-behind first.
+    Args:
+        settings (Settings): Application settings (``athletes``).
+        data_types (List[str], optional): Data types to fetch. Defaults to all client data types.
+    Returns: List[Dict[str, Any]]: Jobs with 'athlete_id', 'data_type', 'command_args' and 'cursor'.
+    """
+    data_types = data_types or list(garmin_client.DATA_TYPE_COMMANDS)
+    jobs = []
+    for account in settings.athletes:
+        cursors = storage.get_cursors(account.athlete_id)
+        for data_type in data_types:
+            cursor = cursors.get(data_type)
+            command_args = list(account.cli_args) + list(garmin_client.DATA_TYPE_COMMANDS[data_type])
+            since = storage.fetch_since(cursor)
+            if since is not None:
+                command_args += ["--since", since.isoformat()]
+            jobs.append({"athlete_id": account.athlete_id, "data_type": data_type, "command_args": command_args, "cursor": cursor})
+    return sorted(jobs, key=lambda job: _staleness_key(job["cursor"]))
+
+
+def run(settings: Settings, data_types: Optional[List[str]] = None, executor: Optional[Executor] = None) -> List[Dict[str, Any]]:
+    """
+    Ingests every configured account.
+    Args:
+        settings (Settings): Application settings (``athletes``, ``scheduler``, ``garmin``, ``retry``).
+        data_types (List[str], optional): Data types to fetch. Defaults to all client data types.
+        executor (Executor, optional): Pool to fetch on. Defaults to a ProcessPoolExecutor
+            with ``scheduler.max_workers`` processes.
+    Returns: List[Dict[str, Any]]: Per-account report with records, fetch seconds, failures and records/s.
+    """
+    cfg = settings.scheduler
+    jobs = plan_jobs(settings, data_types)
+    global_bucket = TokenBucket(cfg.global_rate_per_second, cfg.global_burst)
+    account_buckets = {
+        account.athlete_id: TokenBucket(cfg.account_rate_per_second, cfg.account_burst) for account in settings.athletes
+    }
+    report = {
+        account.athlete_id: {"athlete_id": account.athlete_id, "records": 0, "fetch_seconds": 0.0, "failures": 0}
+        for account in settings.athletes
+    }
+
+    # (position in priority order, job) for jobs not yet started.
+    pending: List[Tuple[int, Dict[str, Any]]] = list(enumerate(jobs))
+    heapq.heapify(pending)
+    in_flight: Dict[Future, Dict[str, Any]] = {}
+    # (write future, job, records) for fetched data queued for DuckDB.
+    writes: List[Tuple[Future, Dict[str, Any], int]] = []
+    own_executor = executor is None
+    executor = executor or ProcessPoolExecutor(max_workers=cfg.max_workers)
+    started = time.perf_counter()
+    try:
+        while pending or in_flight:
+            # Start the highest-priority jobs whose account and the global bucket allow it.
+            wait_for = None
+            deferred = []
+            while pending and len(in_flight) < cfg.max_workers:
+                position, job = heapq.heappop(pending)
+                account_wait = account_buckets[job["athlete_id"]].wait_time()
+                global_wait = global_bucket.wait_time()
+                if account_wait or global_wait:
+                    deferred.append((position, job))
+                    needed = max(account_wait, global_wait)
+                    wait_for = needed if wait_for is None else min(wait_for, needed)
+                    if global_wait:
+                        break  # nothing else can start until the global bucket refills
+                    continue
+                account_buckets[job["athlete_id"]].take()
+                global_bucket.take()
+                future = executor.submit(_fetch_job, settings.garmin.cli_command, job["command_args"], settings.retry)
+                in_flight[future] = job
+            for item in deferred:
+                heapq.heappush(pending, item)
+
+            if not in_flight:
+                time.sleep(wait_for or 0)
+                continue
+            done, _ = wait(list(in_flight), timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = in_flight.pop(future)
+                _complete(job, future, report[job["athlete_id"]], writes)
+    finally:
+        if own_executor:
+            executor.shutdown()
+    for future, job, records in writes:
+        try:
+            future.result()
+        except Exception as e:
+            report[job["athlete_id"]]["records"] -= records
+            report[job["athlete_id"]]["failures"] += 1
+            log_event("scheduler_write_failed", {"athlete_id": job["athlete_id"], "data_type": job["data_type"], "error": str(e)})
+
+    elapsed = time.perf_counter() - started
+    for account_report in report.values():
+        seconds = account_report["fetch_seconds"]
+        account_report["records_per_second"] = account_report["records"] / seconds if seconds else 0.0
+        log_event("scheduler_account_report", account_report)
+    log_event(
+        "scheduler_run_completed",
+        {"accounts": len(report), "jobs": len(jobs), "records": sum(r["records"] for r in report.values()), "seconds": elapsed},
+    )
+    return list(report.values())
+
+
+def _complete(job: Dict[str, Any], future: Future, account_report: Dict[str, Any], writes: list) -> None:
+    """Queues a finished fetch for writing (which advances its cursor); failures are counted, not raised."""
+
+    try:
+        records, seconds = future.result()
+    except Exception as e:
+        records, seconds = None, 0.0
+        log_event("scheduler_fetch_exception", {"athlete_id": job["athlete_id"], "data_type": job["data_type"], "error": str(e)})
+    account_report["fetch_seconds"] += seconds
+    if records is None:
+        account_report["failures"] += 1
+        return
+    if records:
+        write = write_queue.get_write_queue().submit(
+            records, f"raw_{job['data_type']}", cursor=(job["athlete_id"], job["data_type"])
+        )
+        writes.append((write, job, len(records)))
+    account_report["records"] += len(records)
@@ -1,5 +1,5 @@
 import os
-from typing import Optional
+from typing import Literal, Optional
 
 import yaml
 from pydantic import BaseModel, Field
@@ -7,23 +7,135 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class RetrySettings(BaseModel):
     max_attempts: int = Field(default=5)
-    base: int = Field(default=2)
-    jitter: bool = Field(default=True)
+    base: float = Field(default=2, description="Initial back-off in seconds, doubled on every retry")
+    jitter: bool = Field(default=True, description="Full jitter: sleep a random time up to the back-off")
+    max_delay: float = Field(default=60.0, description="Upper bound for a single back-off")
+    budget_seconds: float = Field(default=600.0, description="Wall-clock seconds after which a flow stops retrying")
+    breaker_failure_threshold: int = Field(default=5, description="Consecutive failures before an upstream's circuit opens")
+    breaker_reset_seconds: float = Field(default=60.0, description="Seconds an open circuit waits before a trial call")
+
+class SqliteSource(BaseModel):
+    database: str = Field(..., description="garmindb SQLite file name, relative to sqlite_db_dir")
+    table: str = Field(..., description="Table to read from that database")
+    columns: dict[str, str] = Field(
+        default_factory=dict,
+        description="raw_<data type> column -> DuckDB SQL expression over the garmindb columns; unmapped columns are copied as-is",
+    )
+
+class GarminSettings(BaseModel):
+    backend: Literal["cli", "sqlite"] = Field(default="cli", description="Ingestion backend: garmindb CLI or garmindb's SQLite databases")
+    cli_command: list[str] = Field(default_factory=lambda: ["python", "garmindb_cli.py"], description="Command used to invoke garmindb_cli.py")
+    use_worker: bool = Field(default=False, description="Route CLI calls through a long-lived garmindb worker process")
+    worker_timeout: float = Field(default=300.0, description="Seconds to wait for a single worker response")
+    max_concurrency: int = Field(default=4, description="Maximum concurrent CLI processes for AsyncGarminClient")
+    cache_mode: Literal["off", "record", "replay"] = Field(default="off", description="Raw response cache: off, record every response, or replay from cache only")
+    cache_dir: str = Field(default="data/raw_cache", description="Directory of the content-addressed raw response cache")
+    sqlite_db_dir: str = Field(default="~/HealthData/DBs", description="Directory holding garmindb's SQLite databases")
+    sqlite_sources: dict[str, SqliteSource] = Field(
+        default_factory=lambda: {
+            "activities": SqliteSource(
+                database="garmin_activities.db",
+                table="activities",
+                columns={
+                    "activity_id": "CAST(activity_id AS VARCHAR)",
+                    "timestamp": "CAST(start_time AS TIMESTAMP)",
+                    "duration_s": "date_part('epoch', CAST(elapsed_time AS TIME))",
+                    "distance_m": "distance * 1000",
+                    "tss": "training_load",
+                },
+            ),
+            "monitoring": SqliteSource(
+                database="garmin_monitoring.db", table="monitoring", columns={"timestamp": "CAST(timestamp AS TIMESTAMP)"}
+            ),
+            "hrv": SqliteSource(database="garmin.db", table="hrv", columns={"timestamp": "CAST(day AS TIMESTAMP)"}),
+            "sleep": SqliteSource(database="garmin.db", table="sleep", columns={"timestamp": "CAST(day AS TIMESTAMP)"}),
+        },
+        description="Data type -> SQLite table written to raw_<data type> by the sqlite backend",
+    )
+
+class AthleteAccount(BaseModel):
+    athlete_id: str = Field(..., description="Athlete identifier used for cursors and stored rows")
+    cli_args: list[str] = Field(default_factory=list, description="Extra garmindb_cli.py arguments selecting this account, e.g. its config file")
+
+class SchedulerSettings(BaseModel):
+    max_workers: int = Field(default=4, description="Processes fetching accounts in parallel")
+    global_rate_per_second: float = Field(default=2.0, description="Fetches started per second across all accounts")
+    global_burst: int = Field(default=4)
+    account_rate_per_second: float = Field(default=0.2, description="Fetches started per second for a single account")
+    account_burst: int = Field(default=2)
+
+class StorageSettings(BaseModel):
+    database_path: str = Field(default="data/garmin.duckdb", description="DuckDB database file")
+    read_only: bool = Field(default=False, description="Open the database read-only in this process")
+    layout: Literal["duckdb", "parquet"] = Field(default="duckdb", description="Where raw_* tables are stored")
+    parquet_dir: str = Field(default="data/parquet", description="Root of the month-partitioned raw tables")
+    raw_retention_days: int = Field(default=90, description="Raw partitions older than this are dropped")
+    query_cache_max_bytes: int = Field(default=0, description="Memory budget of the read_df result cache; 0 disables it")
+    writer_max_batch_requests: int = Field(default=64, description="Queued writes coalesced into one transaction")
+    writer_max_batch_rows: int = Field(default=200_000, description="Row cap of one coalesced transaction")
+    writer_lock_timeout_seconds: float = Field(default=300, description="How long the writer waits for another process's DB lock")
+    writer_release_when_idle: bool = Field(
+        default=False,
+        description=(
+            "Close the database when the write queue drains. Off, this process keeps DuckDB's file lock while idle and "
+            "other processes (the maintenance CLI, a notebook) cannot open the file until it exits; on, the lock is "
+            "free between writes at the cost of reopening the database after every drained batch and of failing reads "
+            "on other threads that overlap the close"
+        ),
+    )
+
+class MaintenanceSettings(BaseModel):
+    retention_days: dict[str, int] = Field(
+        default_factory=dict, description="Per-table row retention in days; only these tables lose rows (parquet raw partitions follow storage.raw_retention_days)"
+    )
+    rewrite_after_retention: bool = Field(default=True, description="Rewrite tables that lost rows to retention")
+    compact_database: bool = Field(default=True, description="Copy the database into a fresh file to reclaim space")
+
+class BaselineSettings(BaseModel):
+    windows: dict[str, int] = Field(
+        default_factory=lambda: {"hrv": 30, "resting_hr": 30, "sleep_hours": 14},
+        description="raw_hrv column -> readings in its rolling baseline (one reading per day)",
+    )
+
+class LoggingSettings(BaseModel):
+    payload_max_bytes: int = Field(default=4096, description="Byte cap per logged string field; 0 disables truncation")
+    spill_path: Optional[str] = Field(default=None, description="Rotating file receiving full truncated payloads")
+    spill_max_bytes: int = Field(default=50 * 1024 * 1024)
+    spill_backup_count: int = Field(default=3)
 
 class Settings(BaseSettings):
     overrides_allowed: bool = Field(default=True)
+    athlete_id: str = Field(default="default", description="Athlete whose data this pipeline ingests")
     # thresholds
     ramp_percentage_max: float = Field(default=0.10)
     ctl_atl_ratio_max: float = Field(default=1.3)
     hrv_drop_zscore: float = Field(default=-1.0)
     sleep_min_hours: int = Field(default=6)
+    # rolling wellness baselines
+    baselines: BaselineSettings = Field(default_factory=BaselineSettings)
+    analytics_backend: Literal["python", "duckdb"] = Field(
+        default="python",
+        description="python: incremental state folded in Python; duckdb: metrics computed by SQL inside DuckDB",
+    )
     llm_volume_change_max: float = Field(default=0.20)
     # retries & back-off
     retry: RetrySettings = Field(default_factory=RetrySettings)
+    # garmin ingestion
+    garmin: GarminSettings = Field(default_factory=GarminSettings)
+    # multi-athlete ingestion
+    athletes: list[AthleteAccount] = Field(default_factory=list, description="Accounts ingested by the multi-athlete scheduler")
+    scheduler: SchedulerSettings = Field(default_factory=SchedulerSettings)
+    # storage
+    storage: StorageSettings = Field(default_factory=StorageSettings)
+    # storage maintenance
+    maintenance: MaintenanceSettings = Field(default_factory=MaintenanceSettings)
+    # structured logging
+    logging: LoggingSettings = Field(default_factory=LoggingSettings)
     # scheduling
     sync_daily_cron: str = Field(default="0 1 * * *")
     sync_catchup_cron: str = Field(default="0 10 * * *")
     adapt_weekly_cron: str = Field(default="0 17 * * SUN")
+    maintenance_cron: str = Field(default="0 3 1 * *")
     # llm settings
     openai_api_key: Optional[str] = Field(default=None, description="API key for OpenAI")
     llm_model: str = Field(default="gpt-4o-mini", description="The LLM model to use for plan revisions")
@@ -0,0 +1,163 @@
+"""
+SQL Analytics Backend
+
+Computes the training-load and baseline metrics inside DuckDB, so only one
+row per athlete (or per athlete and metric) leaves the database however long
+the history grows. Selected with ``analytics_backend: duckdb``.
+
+* Training load: the EWMA recurrence ``y[t] = (1 - a) * y[t-1] + a * x[t]``
+  started from 0 unrolls to ``y[T] = sum_k a * x[k] * (1 - a) ** (T - k)``
+  over calendar days, so CTL/ATL as of day ``T`` is a plain aggregate over
+  the ``daily_load`` rows. Rest days contribute nothing, which is exactly the
+  zero-filled calendar of ``analytics.compute_training_load``.
+* Baselines: the last ``window`` readings per athlete (``row_number()`` over
+  the timestamp), reduced to the latest value, mean and sample standard
+  deviation, as ``analytics.RollingStats`` keeps them.
+"""
+
+import datetime
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from src import analytics, storage
+
+
+def _query(sql: str, params: List[Any], label: str) -> pd.DataFrame:
+    try:
+        with storage.get_db_connection(read_only=True) as conn:
+            return conn.execute(sql, params).fetchdf()
+    except Exception as e:
+        print(f"Error computing {label} in DuckDB: {e}")
+        return pd.DataFrame()
+
+
+def _athlete_filter(column: str, athlete_ids: Optional[List[str]], params: List[Any]) -> str:
+    if athlete_ids is None:
+        return ""
+    params.append(list(athlete_ids))
+    return f" AND list_contains(?, {column})"
+
+
+def training_load(
+    settings,
+    athlete_ids: Optional[List[str]] = None,
+    end: Optional[datetime.date] = None,
+) -> pd.DataFrame:
+    """
+    CTL/ATL/TSB, ramp rate and flags per athlete, computed from ``daily_load`` in one aggregate query.
+    Args:
+        settings (Settings): Thresholds (``ctl_atl_ratio_max``, ``ramp_percentage_max``).
+        athlete_ids (List[str], optional): Only these athletes. Defaults to all.
+        end (date, optional): Day the metrics are computed as of (later days are ignored).
+            Defaults to the last recorded day across the selected athletes.
+    Returns: pd.DataFrame: Same columns as ``analytics.team_metrics``, one row per athlete; empty on error.
+    """
+    params: List[Any] = [end]
+    athletes = _athlete_filter("athlete_id", athlete_ids, params)
+    _athlete_filter("athlete_id", athlete_ids, params)  # the filter appears in both CTEs
+    params += [settings.ctl_atl_ratio_max, settings.ramp_percentage_max, analytics.LOW_TSB_THRESHOLD]
+    # Smoothing factors and the ramp span are code constants, inlined as numeric literals.
+    ctl_alpha, atl_alpha = analytics.ewma_alpha(analytics.CTL_DAYS), analytics.ewma_alpha(analytics.ATL_DAYS)
+    ramp_days = int(analytics.RAMP_DAYS)
+    sql = f"""
+        WITH as_of AS (
+            SELECT coalesce(CAST(? AS DATE), max(date)) AS day
+            FROM {storage.DAILY_LOAD_TABLE}
+            WHERE athlete_id IS NOT NULL{athletes}
+        ),
+        -- daily_load already holds one row per athlete and day; age is days before the as-of day.
+        days AS (
+            SELECT athlete_id, a.day AS as_of, total_tss AS tss, a.day - date AS age
+            FROM {storage.DAILY_LOAD_TABLE}, as_of a
+            WHERE athlete_id IS NOT NULL AND total_tss IS NOT NULL AND date <= a.day{athletes}
+        ),
+        loads AS (
+            SELECT
+                athlete_id,
+                as_of AS date,
+                {ctl_alpha!r}::DOUBLE * sum(tss * pow({1 - ctl_alpha!r}::DOUBLE, age)) AS ctl,
+                {atl_alpha!r}::DOUBLE * sum(tss * pow({1 - atl_alpha!r}::DOUBLE, age)) AS atl,
+                {ctl_alpha!r}::DOUBLE * sum(tss * pow({1 - ctl_alpha!r}::DOUBLE, age - {ramp_days}))
+                    FILTER (WHERE age >= {ramp_days}) AS ctl_before
+            FROM days
+            GROUP BY athlete_id, as_of
+        )
+        SELECT
+            athlete_id,
+            date,
+            ctl,
+            atl,
+            ctl - atl AS tsb,
+            (ctl - ctl_before) / nullif(ctl_before, 0) AS ramp_rate,
+            atl / nullif(ctl, 0) AS atl_ctl_ratio,
+            coalesce(atl / nullif(ctl, 0) > ?, false) AS high_atl_ctl_ratio,
+            coalesce((ctl - ctl_before) / nullif(ctl_before, 0) > ?, false) AS high_ramp,
+            ctl - atl < ? AS low_tsb
+        FROM loads
+        ORDER BY athlete_id
+    """
+    return _query(sql, params, "training load")
+
+
+def baselines(windows: Dict[str, int], athlete_ids: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Latest reading, mean, standard deviation and z-score of each metric's rolling window per athlete,
+    computed from ``storage.BASELINE_SOURCE`` inside DuckDB.
+    Args:
+        windows (Dict[str, int]): Metric (column of the source table) -> readings in its window.
+        athlete_ids (List[str], optional): Only these athletes. Defaults to all.
+    Returns: pd.DataFrame: athlete_id, metric, value, mean, std, count, zscore (NULL until the window
+        is full); empty on error or without windows.
+    """
+    if not windows:
+        return pd.DataFrame()
+    params: List[Any] = []
+    selects = []
+    for metric, window in windows.items():
+        column = storage._quote_ident(metric)
+        athletes = _athlete_filter("athlete_id", athlete_ids, params)
+        params += [window, metric, window]
+        selects.append(f"""
+            SELECT athlete_id, metric, value, mean, std, count,
+                CASE WHEN count = window_size AND std > 0 THEN (value - mean) / std END AS zscore
+            FROM (
+                SELECT
+                    athlete_id,
+                    arg_max(value, ts) AS value,
+                    avg(value) AS mean,
+                    stddev_samp(value) AS std,
+                    count(*) AS count
+                FROM (
+                    SELECT athlete_id, CAST({column} AS DOUBLE) AS value,
+                        CAST({storage.CURSOR_TIMESTAMP_COLUMN} AS TIMESTAMP) AS ts
+                    FROM {storage.BASELINE_SOURCE}
+                    WHERE {column} IS NOT NULL AND NOT isnan(CAST({column} AS DOUBLE)){athletes}
+                    QUALIFY row_number() OVER (PARTITION BY athlete_id ORDER BY ts DESC) <= ?
+                )
+                GROUP BY athlete_id
+            ), (SELECT ? AS metric, ? AS window_size)
+        """)
+    sql = " UNION ALL ".join(selects) + " ORDER BY athlete_id, metric"
+    return _query(sql, params, "baselines")
+
+
+def athlete_metrics(settings, athlete_id: str, end: Optional[datetime.date] = None) -> Dict[str, Any]:
+    """
+    One athlete's flag inputs for ``adapt_weekly``: ctl, atl, tsb and a ``<metric>_zscore`` per baseline window.
+    Args:
+        settings (Settings): Thresholds and ``baselines.windows``.
+        athlete_id (str): Athlete to compute.
+        end (date, optional): Day the training load is computed as of.
+    Returns: Dict[str, Any]: Metrics; loads are 0 and z-scores None without data.
+    """
+    load = training_load(settings, [athlete_id], end=end)
+    row = load.iloc[0] if not load.empty else {}
+    metrics: Dict[str, Any] = {key: float(row[key]) if key in row else 0 for key in ("ctl", "atl", "tsb")}
+    metrics["hrv_zscore"] = None
+    stats = baselines(settings.baselines.windows, [athlete_id])
+    for metric in settings.baselines.windows:
+        found = stats[stats["metric"] == metric] if not stats.empty else stats
+        zscore = found["zscore"].iloc[0] if not found.empty else None
+        metrics[f"{metric}_zscore"] = None if zscore is None or pd.isna(zscore) else float(zscore)
+    return metrics
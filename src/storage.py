@@ -4,71 +4,1111 @@ Storage Module
 Handles DuckDB I/O and concurrency-safe writes.
 """
 
+import datetime
+import functools
+import logging
+import re
 import duckdb
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
+import threading
+from collections import OrderedDict
 from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-# Define the database path - TODO: Make this configurable via settings
+from src import parquet_store
+
+logger = logging.getLogger(__name__)
+
+# Database path; overridden from ``Settings.storage`` via ``configure``.
 DATABASE_PATH = "data/garmin.duckdb"
 
+# Per-athlete, per-day training load aggregated from raw_activities. Kept up to date by
+# write_df so analytics read one compact row per day instead of the raw history.
+DAILY_LOAD_TABLE = "daily_load"
+DAILY_LOAD_SOURCE = "raw_activities"
+# daily_load column -> summed raw_activities column
+DAILY_LOAD_SUMS = {"total_tss": "tss", "duration_s": "duration_s", "distance_m": "distance_m"}
+
+# Last CTL/ATL per athlete and the day they were computed through (see ``training_load``), so
+# new days fold in without recomputing from the first activity. A change to that athlete's
+# daily_load on or before the state date drops the state, forcing one full recompute.
+TRAINING_LOAD_STATE_TABLE = "training_load_state"
+
+# Rolling-baseline windows (HRV, resting HR, sleep) per athlete and metric (see ``baselines``).
+# A new or changed reading at or before a stored window's last reading drops that window.
+BASELINE_STATE_TABLE = "baseline_state"
+BASELINE_SOURCE = "raw_hrv"
+
+# Raw table layout: "duckdb" (tables in DATABASE_PATH) or "parquet" (month-partitioned
+# files under PARQUET_DIR, exposed to queries as DuckDB views). Set via ``configure``.
+STORAGE_LAYOUT = "duckdb"
+PARQUET_DIR = "data/parquet"
+RAW_RETENTION_DAYS = 90
+
 # Ensure the data directory exists
 os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
 
+# High-water-mark cursors: one row per (athlete, data type) recording the last
+# ingested record, so fetches ask only for recent data.
+CURSOR_TABLE = "ingest_cursors"
+CURSOR_TIMESTAMP_COLUMN = "timestamp"
+CURSOR_ID_COLUMN = "activity_id"
+# Fetch windows start this long before the cursor, so records backdated or edited
+# upstream within that span are fetched again; the keyed upsert replaces them.
+CURSOR_OVERLAP = datetime.timedelta(days=7)
+
+# Natural keys of the ingested tables. Writes to these tables upsert on the key,
+# so re-ingesting an overlapping window replaces rows instead of duplicating them.
+TABLE_KEYS: Dict[str, List[str]] = {
+    "raw_activities": ["activity_id"],
+    "raw_hrv": ["athlete_id", "timestamp"],
+    "raw_monitoring": ["athlete_id", "timestamp", "activity_type"],
+    "raw_sleep": ["athlete_id", "timestamp"],
+}
+
+class ReadOnlyDatabaseError(RuntimeError):
+    """Raised when a write connection is requested from a read-only connection manager."""
+
+class ConnectionManager:
+    """
+    Keeps one DuckDB database instance open per process and hands out one
+    cursor per thread, so file open, WAL replay and catalog load happen once
+    instead of on every read and write.
+
+    A read-write manager serves read-only requests from the same instance:
+    DuckDB refuses to open one file with two configurations in one process.
+    A read-only manager (for processes that must not take the write lock)
+    rejects write requests. The instance is reopened after a fork.
+    """
+
+    def __init__(self, database_path: str, read_only: bool = False):
+        self.database_path = database_path
+        self.read_only = read_only
+        self._db: Optional[duckdb.DuckDBPyConnection] = None
+        self._pid: Optional[int] = None
+        self._generation = 0
+        self._cursors = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _database(self) -> duckdb.DuckDBPyConnection:
+        with self._lock:
+            if self._db is None or self._pid != os.getpid():
+                if self._pid != os.getpid():
+                    # Inherited from the parent process: never touch its handles.
+                    self._db, self._cursors = None, []
+                    self._generation += 1
+                directory = os.path.dirname(self.database_path)
+                if directory and not self.read_only:
+                    os.makedirs(directory, exist_ok=True)
+                self._db = duckdb.connect(database=self.database_path, read_only=self.read_only)
+                self._pid = os.getpid()
+            return self._db
+
+    def cursor(self, read_only: bool = False) -> duckdb.DuckDBPyConnection:
+        """Returns the calling thread's cursor, creating it on first use."""
+        if self.read_only and not read_only:
+            raise ReadOnlyDatabaseError(f"{self.database_path} is opened read-only")
+        db = self._database()
+        if getattr(self._local, "generation", None) != self._generation:
+            cursor = db.cursor()
+            with self._lock:
+                self._cursors.append(cursor)
+            self._local.cursor = cursor
+            self._local.generation = self._generation
+        return self._local.cursor
+
+    def stream_cursor(self, read_only: bool = False) -> duckdb.DuckDBPyConnection:
+        """A separate cursor for a long-lived result, so other queries on this thread do not cancel it."""
+        if self.read_only and not read_only:
+            raise ReadOnlyDatabaseError(f"{self.database_path} is opened read-only")
+        cursor = self._database().cursor()
+        with self._lock:
+            self._cursors.append(cursor)
+        return cursor
+
+    def release(self, cursor: duckdb.DuckDBPyConnection):
+        """Closes a cursor from ``stream_cursor``."""
+        with self._lock:
+            if cursor in self._cursors:
+                self._cursors.remove(cursor)
+                cursor.close()
+
+    def close(self):
+        """Closes every cursor and the database instance; the next request reopens it."""
+        with self._lock:
+            if self._pid == os.getpid():
+                for cursor in self._cursors:
+                    cursor.close()
+                if self._db is not None:
+                    self._db.close()
+            self._db, self._cursors = None, []
+            self._generation += 1
+
+_managers: Dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+_read_only_paths = set()
+
+def get_connection_manager(database_path: Optional[str] = None) -> ConnectionManager:
+    """Returns the process-wide connection manager for ``database_path`` (default: DATABASE_PATH)."""
+    database_path = database_path or DATABASE_PATH
+    with _managers_lock:
+        if database_path not in _managers:
+            _managers[database_path] = ConnectionManager(database_path, read_only=database_path in _read_only_paths)
+        return _managers[database_path]
+
+def close_all():
+    """Closes every managed database, releasing DuckDB's file lock."""
+    with _managers_lock:
+        managers = list(_managers.values())
+        _managers.clear()
+    for manager in managers:
+        manager.close()
+
+class QueryCache:
+    """
+    LRU cache of ``read_df`` results, bounded by the DataFrames' memory size.
+
+    Entries are keyed by the normalized query text plus the write version of
+    every table the query reads, so a ``write_df`` into any of them makes the
+    old entry unreachable (it then ages out of the LRU). Versions only track
+    writes made through this process's ``storage`` module.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Tuple, Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple) -> Optional[pd.DataFrame]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Tuple, df: pd.DataFrame):
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (df, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+# Per-table write versions, bumped after every committed write through this module.
+_table_versions: Dict[str, int] = {}
+_versions_lock = threading.Lock()
+# Tables read by each normalized query (None: query cannot be cached), least recently used first.
+# Bounded so that ad-hoc queries with inlined values do not grow it for the life of the process.
+QUERY_TABLES_MAX_ENTRIES = 1024
+_query_tables: "OrderedDict[str, Optional[Tuple[str, ...]]]" = OrderedDict()
+_query_tables_lock = threading.Lock()
+_query_cache: Optional[QueryCache] = None
+
+def _bump_versions(*table_names: str):
+    with _versions_lock:
+        for table_name in table_names:
+            table_name = table_name.lower()
+            _table_versions[table_name] = _table_versions.get(table_name, 0) + 1
+
+def invalidate(table_name: Optional[str] = None):
+    """Marks ``table_name`` (or, if None, everything) as changed, e.g. after writing it outside ``storage``."""
+    if table_name is not None:
+        _bump_versions(table_name)
+    elif _query_cache is not None:
+        _query_cache.clear()
+
+def enable_query_cache(max_bytes: int):
+    """Caches ``read_df`` results up to ``max_bytes`` of DataFrame memory."""
+    global _query_cache
+    _query_cache = QueryCache(max_bytes)
+
+def disable_query_cache():
+    global _query_cache
+    _query_cache = None
+
+def query_cache_stats() -> Optional[Dict[str, Any]]:
+    """Hit/miss/eviction counters and size of the ``read_df`` cache, or None if it is disabled."""
+    return _query_cache.stats() if _query_cache is not None else None
+
+def _normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query).strip().rstrip(";").strip()
+
+def _cache_key(conn, query: str) -> Optional[Tuple]:
+    """(query, table versions) key for a query, or None if its tables cannot be determined."""
+    normalized = _normalize_query(query)
+    with _query_tables_lock:
+        known = normalized in _query_tables
+        if known:
+            _query_tables.move_to_end(normalized)
+            tables = _query_tables[normalized]
+    if not known:
+        try:
+            tables = tuple(sorted(name.lower() for name in conn.get_table_names(normalized)))
+        except duckdb.Error:
+            tables = None
+        # Table functions (read_parquet, ...) are not versioned; such queries are never cached.
+        tables = tables or None
+        with _query_tables_lock:
+            _query_tables[normalized] = tables
+            while len(_query_tables) > QUERY_TABLES_MAX_ENTRIES:
+                _query_tables.popitem(last=False)
+    if tables is None:
+        return None
+    with _versions_lock:
+        return (normalized,) + tuple((table, _table_versions.get(table, 0)) for table in tables)
+
+def configure(storage_settings):
+    """Applies ``Settings.storage``: database path, read-only mode, raw table layout and query cache."""
+    global DATABASE_PATH, STORAGE_LAYOUT, PARQUET_DIR, RAW_RETENTION_DAYS
+    DATABASE_PATH = storage_settings.database_path
+    if storage_settings.query_cache_max_bytes > 0:
+        enable_query_cache(storage_settings.query_cache_max_bytes)
+    else:
+        disable_query_cache()
+    STORAGE_LAYOUT = storage_settings.layout
+    PARQUET_DIR = storage_settings.parquet_dir
+    RAW_RETENTION_DAYS = storage_settings.raw_retention_days
+    if storage_settings.read_only:
+        _read_only_paths.add(DATABASE_PATH)
+    else:
+        _read_only_paths.discard(DATABASE_PATH)
+    with _managers_lock:
+        manager = _managers.pop(DATABASE_PATH, None)
+    if manager is not None:
+        manager.close()
+
 @contextmanager
 def get_db_connection(read_only: bool = False):
     """
     Provides a context manager for DuckDB connections.
-    Ensures the connection is closed after use.
+    Yields the calling thread's cursor on the process-wide database instance;
+    the instance stays open across calls (see ``ConnectionManager``).
+    """
+    yield get_connection_manager().cursor(read_only=read_only)
+
+def _ensure_cursor_table(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CURSOR_TABLE} (
+            athlete_id VARCHAR,
+            data_type VARCHAR,
+            last_timestamp TIMESTAMP,
+            last_activity_id VARCHAR,
+            updated_at TIMESTAMP DEFAULT current_timestamp,
+            PRIMARY KEY (athlete_id, data_type)
+        )
+    """)
+
+def get_cursors(athlete_id: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the ingest cursors for an athlete.
+    Args:
+        athlete_id (str): The athlete whose cursors to read.
+    Returns: Dict[str, Dict[str, Any]]: data_type -> {'last_timestamp', 'last_activity_id'}; empty if none recorded.
+    """
+    try:
+        with get_db_connection(read_only=True) as conn:
+            rows = conn.execute(
+                f"SELECT data_type, last_timestamp, last_activity_id FROM {CURSOR_TABLE} WHERE athlete_id = ?",
+                [athlete_id],
+            ).fetchall()
+    except duckdb.Error:
+        # Database or cursor table not created yet: nothing ingested.
+        return {}
+    return {
+        data_type: {"last_timestamp": pd.Timestamp(ts) if ts is not None else None, "last_activity_id": activity_id}
+        for data_type, ts, activity_id in rows
+    }
+
+def get_cursor(athlete_id: str, data_type: str) -> Optional[Dict[str, Any]]:
+    """Returns the ingest cursor for one athlete and data type, or None if nothing was ingested yet."""
+    return get_cursors(athlete_id).get(data_type)
+
+def fetch_since(cursor: Optional[Dict[str, Any]]) -> Optional[pd.Timestamp]:
+    """Start of the next fetch window for a cursor (``CURSOR_OVERLAP`` before it), or None to fetch everything."""
+    if cursor is None or cursor["last_timestamp"] is None:
+        return None
+    return cursor["last_timestamp"] - CURSOR_OVERLAP
+
+def _cursor_order(table: pa.Table) -> pd.DataFrame:
+    """(timestamp, id) key columns used to order records against a cursor."""
+    # Only the two key columns are converted to pandas; the payload stays in Arrow.
+    # Normalise to naive UTC so cursors compare consistently with stored TIMESTAMPs.
+    ts = pd.to_datetime(table.column(CURSOR_TIMESTAMP_COLUMN).to_pandas(), utc=True).dt.tz_localize(None)
+    keys = pd.DataFrame({"ts": ts})
+    keys["id"] = (
+        table.column(CURSOR_ID_COLUMN).to_pandas().astype(str)
+        if CURSOR_ID_COLUMN in table.column_names else ""
+    )
+    return keys
+
+def _rows_after_cursor(table: pa.Table, cursor: Optional[Dict[str, Any]]) -> pa.Table:
+    """Drops rows at or before the cursor so overlapping fetch windows are not re-appended to unkeyed tables."""
+    if cursor is None or cursor["last_timestamp"] is None or CURSOR_TIMESTAMP_COLUMN not in table.column_names:
+        return table
+    keys = _cursor_order(table)
+    last_ts, last_id = cursor["last_timestamp"], cursor["last_activity_id"] or ""
+    newer = (keys["ts"] > last_ts) | ((keys["ts"] == last_ts) & (keys["id"] > last_id))
+    return table.filter(pa.array(newer.to_numpy()))
+
+def _newest_key(table: pa.Table) -> Optional[Tuple[pd.Timestamp, str]]:
+    """(timestamp, id) of the newest row, or None if the table has no timestamp column."""
+    if CURSOR_TIMESTAMP_COLUMN not in table.column_names:
+        return None
+    last = _cursor_order(table).sort_values(["ts", "id"]).iloc[-1]
+    return last["ts"], last["id"]
+
+def _advance_cursor(conn, athlete_id: str, data_type: str, newest: Tuple[pd.Timestamp, str]):
+    """Moves the cursor to the newest written row. Runs inside the write transaction."""
+    _ensure_cursor_table(conn)
+    conn.execute(
+        f"INSERT OR REPLACE INTO {CURSOR_TABLE} (athlete_id, data_type, last_timestamp, last_activity_id, updated_at) "
+        "VALUES (?, ?, ?, ?, current_timestamp)",
+        [athlete_id, data_type, newest[0].to_pydatetime(), newest[1] or None],
+    )
+
+WriteData = Union[pd.DataFrame, pa.Table, pa.RecordBatch, List[Dict[str, Any]], Iterable[Any]]
+
+def _to_arrow(chunk) -> pa.Table:
+    """Converts one chunk (records, DataFrame, Table or RecordBatch) to an Arrow table."""
+    if isinstance(chunk, pa.Table):
+        return chunk
+    if isinstance(chunk, pa.RecordBatch):
+        return pa.Table.from_batches([chunk])
+    if isinstance(chunk, pd.DataFrame):
+        return pa.Table.from_pandas(chunk, preserve_index=False)
+    # Records go straight to Arrow columns, without pandas' per-row object construction.
+    return pa.Table.from_pylist(list(chunk))
+
+def _iter_chunks(data: WriteData) -> Iterator[pa.Table]:
+    """Yields ``data`` as Arrow tables: one for a single frame or record list, one per batch otherwise."""
+    if isinstance(data, (pd.DataFrame, pa.Table, pa.RecordBatch)):
+        yield _to_arrow(data)
+    elif isinstance(data, pa.RecordBatchReader):
+        for batch in data:
+            yield _to_arrow(batch)
+    elif isinstance(data, list) and (not data or isinstance(data[0], dict)):
+        yield _to_arrow(data)
+    else:
+        # List or iterator of batches (e.g. garmin_client.stream_activities); consumed lazily.
+        for chunk in data:
+            yield _to_arrow(chunk)
+
+def _merge(conn, table_name: str, batch: pa.Table, key: List[str]):
+    """Upserts ``batch`` into ``table_name`` on ``key``: matching rows are updated, the rest inserted."""
+    missing = [column for column in key if column not in batch.column_names]
+    if missing:
+        raise ValueError(f"Key columns {missing} missing from data for {table_name}")
+    # Several source rows must not update one target row; the latest record wins.
+    duplicated = batch.select(key).to_pandas().duplicated(keep="last").to_numpy()
+    if duplicated.any():
+        batch = batch.filter(pa.array(~duplicated))
+    on = " AND ".join(f"t.{column} = s.{column}" for column in key)
+    update = ", ".join(f"{column} = s.{column}" for column in batch.column_names if column not in key)
+    conn.register("_write_batch", batch)
+    try:
+        # UPDATE then INSERT in the caller's transaction rather than MERGE, which needs DuckDB 1.4.
+        # Columns the batch lacks keep their stored values.
+        if update:
+            conn.execute(f"UPDATE {table_name} AS t SET {update} FROM _write_batch AS s WHERE {on}")
+        conn.execute(
+            f"INSERT INTO {table_name} BY NAME SELECT * FROM _write_batch AS s "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {table_name} AS t WHERE {on})"
+        )
+    finally:
+        conn.unregister("_write_batch")
+
+def _is_partitioned(table_name: str) -> bool:
+    """Whether ``table_name`` lives in the partitioned Parquet store."""
+    return STORAGE_LAYOUT == "parquet" and table_name.startswith("raw_")
+
+def _ensure_parquet_view(conn, table_name: str):
+    """Exposes a partitioned table to SQL as a view; hive partitioning adds athlete_id and month."""
+    pattern = parquet_store.glob_pattern(PARQUET_DIR, table_name).replace("'", "''")
+    conn.execute(
+        f"CREATE OR REPLACE VIEW {table_name} AS SELECT * FROM read_parquet('{pattern}', "
+        "hive_partitioning = true, hive_types_autocast = false, union_by_name = true)"
+    )
+
+def _write_chunk(conn, table_name: str, batch: pa.Table, key: Optional[List[str]]):
+    conn.register("_write_batch", batch)
+    try:
+        # DuckDB scans the registered Arrow table in place: no copy into Python objects.
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table_name} AS SELECT * FROM _write_batch LIMIT 0")
+        if not key:
+            conn.execute(f"INSERT INTO {table_name} BY NAME SELECT * FROM _write_batch")
+    finally:
+        conn.unregister("_write_batch")
+    if key:
+        _merge(conn, table_name, batch, key)
+
+def _ensure_daily_load_table(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DAILY_LOAD_TABLE} (
+            athlete_id VARCHAR,
+            date DATE,
+            total_tss DOUBLE,
+            duration_s DOUBLE,
+            distance_m DOUBLE,
+            activity_count BIGINT
+        )
+    """)
+
+def _ensure_training_load_state_table(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TRAINING_LOAD_STATE_TABLE} (
+            athlete_id VARCHAR PRIMARY KEY,
+            date DATE,
+            ctl DOUBLE,
+            atl DOUBLE,
+            updated_at TIMESTAMP DEFAULT current_timestamp
+        )
+    """)
+
+def get_training_load_state(athlete_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns an athlete's stored CTL/ATL state.
+    Returns: Optional[Dict[str, Any]]: {'date', 'ctl', 'atl'}, or None if there is none (or it was invalidated).
+    """
+    try:
+        with get_db_connection(read_only=True) as conn:
+            row = conn.execute(
+                f"SELECT date, ctl, atl FROM {TRAINING_LOAD_STATE_TABLE} WHERE athlete_id = ?", [athlete_id]
+            ).fetchone()
+    except duckdb.Error:
+        # Table not created yet: nothing computed.
+        return None
+    if row is None:
+        return None
+    return {"date": row[0], "ctl": row[1], "atl": row[2]}
+
+def save_training_load_state(athlete_id: str, date: datetime.date, ctl: float, atl: float):
+    """Stores an athlete's CTL/ATL as computed through ``date``, replacing the previous state."""
+    with get_db_connection() as conn:
+        _ensure_training_load_state_table(conn)
+        conn.execute(
+            f"INSERT OR REPLACE INTO {TRAINING_LOAD_STATE_TABLE} (athlete_id, date, ctl, atl, updated_at) "
+            "VALUES (?, ?, ?, ?, current_timestamp)",
+            [athlete_id, date, float(ctl), float(atl)],
+        )
+
+def _ensure_baseline_state_table(conn):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {BASELINE_STATE_TABLE} (
+            athlete_id VARCHAR,
+            metric VARCHAR,
+            window_size INTEGER,
+            last_timestamp TIMESTAMP,
+            window_values DOUBLE[],
+            updated_at TIMESTAMP DEFAULT current_timestamp
+        )
+    """)
+
+def get_baseline_states(athlete_id: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns an athlete's stored rolling-baseline windows.
+    Returns: Dict[str, Dict[str, Any]]: metric -> {'window_size', 'last_timestamp', 'values'} (oldest first);
+        empty if none are stored.
     """
-    conn = None
     try:
-        conn = duckdb.connect(database=DATABASE_PATH, read_only=read_only)
-        yield conn
+        with get_db_connection(read_only=True) as conn:
+            rows = conn.execute(
+                f"SELECT metric, window_size, last_timestamp, window_values FROM {BASELINE_STATE_TABLE} "
+                "WHERE athlete_id = ?",
+                [athlete_id],
+            ).fetchall()
+    except duckdb.Error:
+        # Table not created yet: nothing computed.
+        return {}
+    return {
+        metric: {"window_size": size, "last_timestamp": pd.Timestamp(ts) if ts is not None else None, "values": values}
+        for metric, size, ts, values in rows
+    }
+
+def save_baseline_states(athlete_id: str, states: Dict[str, Dict[str, Any]]):
+    """Stores rolling-baseline windows (as returned by ``get_baseline_states``) in one transaction."""
+    with get_db_connection() as conn:
+        _ensure_baseline_state_table(conn)
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            for metric, state in states.items():
+                last = state["last_timestamp"]
+                # One row per (athlete_id, metric). Not INSERT OR REPLACE and no primary key: DuckDB
+                # before 1.0 can neither update a LIST column nor re-insert a deleted key in one transaction.
+                conn.execute(f"DELETE FROM {BASELINE_STATE_TABLE} WHERE athlete_id = ? AND metric = ?", [athlete_id, metric])
+                conn.execute(
+                    f"INSERT INTO {BASELINE_STATE_TABLE} "
+                    "(athlete_id, metric, window_size, last_timestamp, window_values, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, current_timestamp)",
+                    [athlete_id, metric, state["window_size"], last.to_pydatetime() if last is not None else None,
+                     [float(v) for v in state["values"]]],
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+def _relation_columns(conn, table_name: str) -> List[str]:
+    """Columns of a table or view, or [] if it does not exist yet (without aborting the transaction)."""
+    return [
+        row[0] for row in conn.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+            [table_name],
+        ).fetchall()
+    ]
+
+def _invalidate_baselines(conn, batch: pa.Table):
+    """
+    Drops baseline windows a batch of readings changes, before it is written: a reading at or
+    before the window's last one that is new or differs from the stored row. Re-fetched readings
+    that are unchanged (the cursor overlap) and readings after the window leave it to fold in.
+    """
+    _ensure_baseline_state_table(conn)
+    oldest = _cursor_order(batch)["ts"].min()
+    if pd.isna(oldest):
+        return
+    if "athlete_id" not in batch.column_names:
+        conn.execute(f"DELETE FROM {BASELINE_STATE_TABLE} WHERE last_timestamp >= ?", [oldest.to_pydatetime()])
+        return
+    stored = _relation_columns(conn, BASELINE_SOURCE)
+    key = TABLE_KEYS[BASELINE_SOURCE]
+    compared = [column for column in batch.column_names if column in stored]
+    if any(column not in compared for column in key):
+        # No stored readings to compare with: every reading counts as new.
+        unchanged = "false"
+    else:
+        on = " AND ".join(f"t.{_quote_ident(c)} = s.{_quote_ident(c)}" for c in key)
+        same = "".join(
+            f" AND t.{_quote_ident(c)} IS NOT DISTINCT FROM s.{_quote_ident(c)}" for c in compared if c not in key
+        )
+        unchanged = f"EXISTS (SELECT 1 FROM {BASELINE_SOURCE} AS t WHERE {on}{same})"
+    # Timestamps normalised to naive UTC like the stored last_timestamp.
+    conn.register("_baseline_batch", batch.append_column("_ts", pa.array(_cursor_order(batch)["ts"])))
+    try:
+        conn.execute(f"""
+            DELETE FROM {BASELINE_STATE_TABLE} b WHERE EXISTS (
+                SELECT 1 FROM _baseline_batch AS s
+                WHERE s.athlete_id = b.athlete_id AND s._ts <= b.last_timestamp AND NOT {unchanged}
+            )
+        """)
     finally:
-        if conn:
-            conn.close()
+        conn.unregister("_baseline_batch")
 
-def write_df(df: pd.DataFrame, table_name: str):
+def _activity_dates(conn, batch: pa.Table, key: Optional[List[str]] = None) -> pa.Table:
+    """
+    Distinct dates a batch of activities touches, read before it is written: its own dates and
+    the stored dates of the rows it replaces on ``key``, since an upsert may move an activity to another day.
     """
-    Writes a DataFrame to a DuckDB table.
-    Creates the table if it doesn't exist and appends data.
+    day = f"CAST(CAST({CURSOR_TIMESTAMP_COLUMN} AS TIMESTAMP) AS DATE)"
+    select = f"SELECT DISTINCT {day} AS date FROM _write_batch"
+    stored = _relation_columns(conn, DAILY_LOAD_SOURCE)
+    if key and CURSOR_TIMESTAMP_COLUMN in stored and all(c in stored and c in batch.column_names for c in key):
+        on = " AND ".join(f"t.{c} = s.{c}" for c in key)
+        select += (
+            f" UNION SELECT DISTINCT CAST(CAST(t.{CURSOR_TIMESTAMP_COLUMN} AS TIMESTAMP) AS DATE) "
+            f"FROM {DAILY_LOAD_SOURCE} AS t, _write_batch AS s WHERE {on}"
+        )
+    conn.register("_write_batch", batch)
+    try:
+        return arrow_reader(conn.execute(select), READ_BATCH_SIZE).read_all()
+    finally:
+        conn.unregister("_write_batch")
+
+def _refresh_daily_load(conn, dates: Optional[pa.Table] = None):
+    """
+    Recomputes daily_load rows from raw_activities.
     Args:
-        df (pd.DataFrame): The DataFrame to write.
-        table_name (str): The name of the table.
+        conn: Connection (inside the write transaction).
+        dates (pa.Table, optional): Dates to recompute, for every athlete; all days if None.
+            Dates rather than (athlete, date) pairs, since an upserted row may belong to an
+            athlete the incoming batch does not name. Training-load states are dropped per
+            athlete, where that athlete's recomputed rows differ on or before the state date.
     """
-    if df.empty:
-        print(f"DataFrame for table {table_name} is empty. Skipping write.")
+    _ensure_daily_load_table(conn)
+    _ensure_training_load_state_table(conn)
+    source_columns = {row[0] for row in conn.execute(f"DESCRIBE {DAILY_LOAD_SOURCE}").fetchall()}
+    if CURSOR_TIMESTAMP_COLUMN not in source_columns:
         return
+    athlete = "athlete_id" if "athlete_id" in source_columns else "CAST(NULL AS VARCHAR)"
+    day = f"CAST(CAST({CURSOR_TIMESTAMP_COLUMN} AS TIMESTAMP) AS DATE)"
+    sums = ", ".join(
+        f"sum({raw})::DOUBLE" if raw in source_columns else "NULL" for raw in DAILY_LOAD_SUMS.values()
+    )
+    columns = ", ".join(["athlete_id", "date", *DAILY_LOAD_SUMS, "activity_count"])
+    select = f"SELECT {athlete} AS athlete_id, {day} AS date, {sums}, count(*) FROM {DAILY_LOAD_SOURCE}"
+    if dates is None:
+        conn.execute(f"DELETE FROM {DAILY_LOAD_TABLE}")
+        conn.execute(f"INSERT INTO {DAILY_LOAD_TABLE} ({columns}) {select} GROUP BY ALL")
+        conn.execute(f"DELETE FROM {TRAINING_LOAD_STATE_TABLE}")
+        return
+    conn.register("_affected_dates", dates)
+    try:
+        affected = f"SELECT {columns} FROM {DAILY_LOAD_TABLE} WHERE date IN (SELECT date FROM _affected_dates)"
+        conn.execute(f"CREATE OR REPLACE TEMP TABLE _previous_daily_load AS {affected}")
+        conn.execute(f"DELETE FROM {DAILY_LOAD_TABLE} WHERE date IN (SELECT date FROM _affected_dates)")
+        conn.execute(
+            f"INSERT INTO {DAILY_LOAD_TABLE} ({columns}) {select} "
+            f"WHERE {day} IN (SELECT date FROM _affected_dates) GROUP BY ALL"
+        )
+        # A state is dropped only if its own athlete's load changed on a day it already covers;
+        # other athletes' writes and days after the state date leave it to fold in.
+        conn.execute(f"""
+            DELETE FROM {TRAINING_LOAD_STATE_TABLE} s WHERE EXISTS (
+                SELECT 1 FROM (
+                    (SELECT * FROM _previous_daily_load EXCEPT {affected})
+                    UNION ALL ({affected} EXCEPT SELECT * FROM _previous_daily_load)
+                ) c
+                WHERE c.athlete_id = s.athlete_id AND c.date <= s.date
+            )
+        """)
+        conn.execute("DROP TABLE _previous_daily_load")
+    finally:
+        conn.unregister("_affected_dates")
+
+def rebuild_daily_load():
+    """Recomputes the whole daily_load table, e.g. after loading raw_activities outside write_df."""
+    try:
+        with get_db_connection() as conn:
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                _refresh_daily_load(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        _bump_versions(DAILY_LOAD_TABLE)
+        logger.info("Rebuilt %s", DAILY_LOAD_TABLE)
+    except Exception:
+        logger.exception("Error rebuilding %s", DAILY_LOAD_TABLE)
+        raise
+
+def read_daily_load(
+    athlete_id: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    start: Optional[datetime.date] = None,
+) -> pd.DataFrame:
+    """
+    Reads daily training load, oldest day first.
+    Args:
+        athlete_id (str, optional): Only this athlete's days.
+        columns (List[str], optional): Columns to read. Defaults to all.
+        start (date, optional): First day to read. Defaults to the first recorded day.
+    Returns: pd.DataFrame: athlete_id, date, total_tss, duration_s, distance_m, activity_count.
+    """
+    where: Dict[str, Any] = {}
+    if athlete_id is not None:
+        where["athlete_id"] = athlete_id
+    if start is not None:
+        where["date"] = (start, None)
+    return read_table(DAILY_LOAD_TABLE, columns=columns, where=where, order_by=["date"])
+
+def _cursor_in_transaction(conn, athlete_id: str, data_type: str) -> Optional[Dict[str, Any]]:
+    """Reads a cursor on ``conn`` so earlier writes in the same open transaction are seen."""
+    # A failed statement would abort the transaction, so make sure the table exists instead.
+    _ensure_cursor_table(conn)
+    row = conn.execute(
+        f"SELECT last_timestamp, last_activity_id FROM {CURSOR_TABLE} WHERE athlete_id = ? AND data_type = ?",
+        [athlete_id, data_type],
+    ).fetchone()
+    if row is None:
+        return None
+    return {"last_timestamp": pd.Timestamp(row[0]) if row[0] is not None else None, "last_activity_id": row[1]}
 
-    print(f"Writing DataFrame to DuckDB table: {table_name}")
+def write_in_transaction(
+    conn,
+    df: WriteData,
+    table_name: str,
+    cursor: Optional[Tuple[str, str]] = None,
+    key: Optional[List[str]] = None,
+    changed: Optional[set] = None,
+) -> int:
+    """
+    Does the work of ``write_df`` inside a transaction the caller has opened on ``conn``,
+    so several writes can share one commit (see ``write_queue``).
+    Args:
+        conn: Connection with an open transaction.
+        df, table_name, cursor, key: As for ``write_df``.
+        changed (set, optional): Receives the names of tables written, for ``invalidate``.
+            Filled even if an error is raised later, since partition files are not transactional.
+    Returns: int: Rows written.
+    """
+    key = key or TABLE_KEYS.get(table_name)
+    changed = changed if changed is not None else set()
+    last_cursor = _cursor_in_transaction(conn, *cursor) if cursor is not None else None
+    newest = None
+    rows = 0
+    # Dates whose daily_load rows must be recomputed.
+    touched_dates = []
+    for batch in _iter_chunks(df):
+        if cursor is not None:
+            if "athlete_id" not in batch.column_names:
+                batch = batch.append_column("athlete_id", pa.array([cursor[0]] * batch.num_rows, pa.string()))
+            if not key:
+                # Nothing to upsert on, so the overlap with earlier windows is dropped instead.
+                batch = _rows_after_cursor(batch, last_cursor)
+        if batch.num_rows == 0:
+            continue
+        if rows == 0:
+            logger.info("Writing to DuckDB table %s", table_name)
+        changed.add(table_name)
+        # Both compare with the stored rows, so they run before those are overwritten.
+        if table_name == DAILY_LOAD_SOURCE and CURSOR_TIMESTAMP_COLUMN in batch.column_names:
+            touched_dates.append(_activity_dates(conn, batch, key))
+        if table_name == BASELINE_SOURCE and CURSOR_TIMESTAMP_COLUMN in batch.column_names:
+            _invalidate_baselines(conn, batch)
+        if _is_partitioned(table_name):
+            # Partition rewrites are idempotent upserts, so a rolled-back
+            # cursor simply makes the next run rewrite the same rows.
+            parquet_store.write_partitions(PARQUET_DIR, table_name, batch, key)
+        else:
+            _write_chunk(conn, table_name, batch, key)
+        rows += batch.num_rows
+        if cursor is not None:
+            batch_newest = _newest_key(batch)
+            if batch_newest is not None and (newest is None or batch_newest > newest):
+                newest = batch_newest
+    if rows and _is_partitioned(table_name):
+        _ensure_parquet_view(conn, table_name)
+    if touched_dates:
+        _refresh_daily_load(conn, pa.concat_tables(touched_dates))
+        changed.add(DAILY_LOAD_TABLE)
+    if newest is not None and (
+        last_cursor is None
+        or last_cursor["last_timestamp"] is None
+        or newest > (last_cursor["last_timestamp"], last_cursor["last_activity_id"] or "")
+    ):
+        # Backdated rows are written but never move the cursor back.
+        _advance_cursor(conn, cursor[0], cursor[1], newest)
+        changed.add(CURSOR_TABLE)
+    return rows
+
+def write_df(
+    df: WriteData,
+    table_name: str,
+    cursor: Optional[Tuple[str, str]] = None,
+    key: Optional[List[str]] = None,
+):
+    """
+    Writes data to a DuckDB table through Arrow.
+    Creates the table if it doesn't exist. Rows are upserted on the table's natural key
+    (``key`` or ``TABLE_KEYS``), otherwise appended. All chunks are written in one transaction.
+    Args:
+        df: A DataFrame, a list of record dicts, an Arrow Table/RecordBatch/RecordBatchReader,
+            or a list or iterator of any of these (written batch by batch).
+        table_name (str): The name of the table.
+        cursor (Tuple[str, str], optional): (athlete_id, data_type) ingest cursor. Rows are tagged
+            with athlete_id if they lack one and the cursor is advanced to the newest row in the
+            same transaction as the insert. Rows at or before the cursor are upserted like any
+            other (backdated or edited records); only tables without a key skip them.
+        key (List[str], optional): Natural key columns to upsert on. Defaults to ``TABLE_KEYS[table_name]``.
+    With the parquet layout, raw_* tables are written to month partitions instead (see ``parquet_store``).
+    Writes to raw_activities also recompute the daily_load rows of the days they touch.
+    Returns: int: Rows written.
+    Raises: The write's error, after rolling the transaction back.
+    """
+    changed = set()
     try:
         with get_db_connection() as conn:
-            # Use register to treat the DataFrame as a virtual table
-            conn.execute(f"CREATE TABLE IF NOT EXISTS {table_name} AS SELECT * FROM df LIMIT 0")
-            conn.execute(f"INSERT INTO {table_name} SELECT * FROM df")
-        print(f"Successfully wrote DataFrame to {table_name}")
-    except Exception as e:
-        print(f"Error writing DataFrame to {table_name}: {e}")
-        # TODO: Add proper logging here
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                rows = write_in_transaction(conn, df, table_name, cursor, key, changed)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    except Exception:
+        logger.exception("Error writing to %s", table_name)
+        raise
+    finally:
+        _bump_versions(*changed)
+    if rows == 0:
+        if cursor is not None:
+            logger.info("No rows newer than the %s cursor for %s; nothing written", cursor[1], table_name)
+        else:
+            logger.info("No rows for %s; nothing written", table_name)
+    else:
+        logger.info("Wrote %d rows to %s", rows, table_name)
+    return rows
 
 def read_df(query: str) -> pd.DataFrame:
     """
     Reads data from DuckDB using a SQL query and returns a DataFrame.
+    Served from the query cache when it is enabled and no table the query reads has been written since.
     Args:
         query (str): The SQL query to execute.
     Returns: pd.DataFrame: The result of the query as a DataFrame.
     """
-    print(f"Reading data from DuckDB with query: '{query}'")
     try:
         with get_db_connection(read_only=True) as conn:
+            key = _cache_key(conn, query) if _query_cache is not None else None
+            if key is not None:
+                cached = _query_cache.get(key)
+                if cached is not None:
+                    # Deep copies both ways: without copy-on-write (off by default before pandas 3)
+                    # a caller's in-place edit would otherwise change the cached frame.
+                    return cached.copy()
+            logger.debug("Reading data from DuckDB with query: %r", query)
             df = conn.execute(query).fetchdf()
-        print(f"Successfully read data from DuckDB. Rows returned: {len(df)}")
+        if key is not None:
+            _query_cache.put(key, df.copy())
+        logger.debug("Read %d rows from DuckDB", len(df))
         return df
-    except Exception as e:
-        print(f"Error reading data from DuckDB with query '{query}': {e}")
-        # TODO: Add proper logging here
+    except Exception:
+        logger.exception("Error reading data from DuckDB with query %r", query)
         return pd.DataFrame() # Return empty DataFrame on error
 
-# DuckDB connection/cursor management and concurrency-safe writes implemented using context manager.
-# TODO: Consider connection pooling for high-concurrency scenarios if needed.
\ No newline at end of file
+# Rows per batch yielded by read_batches.
+READ_BATCH_SIZE = 100_000
+
+def arrow_reader(result, batch_size: int) -> pa.RecordBatchReader:
+    """Streams a DuckDB result as Arrow record batches of up to ``batch_size`` rows."""
+    # DuckDB 1.4 renamed fetch_record_batch to to_arrow_reader.
+    to_reader = getattr(result, "to_arrow_reader", None)
+    return to_reader(batch_size) if to_reader is not None else result.fetch_record_batch(batch_size)
+
+def read_batches(query: str, batch_size: Optional[int] = None, as_pandas: bool = False) -> Iterator[Union[pa.RecordBatch, pd.DataFrame]]:
+    """
+    Streams a query result in batches instead of materializing it, so arbitrarily large
+    results are processed in memory proportional to ``batch_size``.
+    Unlike ``read_df``, errors are raised rather than turned into an empty result.
+    Args:
+        query (str): The SQL query to execute.
+        batch_size (int, optional): Rows per batch. Defaults to READ_BATCH_SIZE.
+        as_pandas (bool): Yield small DataFrames instead of Arrow record batches.
+    Returns: Iterator of pa.RecordBatch (or pd.DataFrame).
+    """
+    batch_size = batch_size or READ_BATCH_SIZE
+    manager = get_connection_manager()
+    # A dedicated cursor: the thread's shared cursor may run other queries while this is consumed.
+    conn = manager.stream_cursor(read_only=True)
+    logger.debug("Streaming data from DuckDB with query: %r (batches of %d)", query, batch_size)
+    try:
+        reader = arrow_reader(conn.execute(query), batch_size)
+        for batch in reader:
+            yield batch.to_pandas() if as_pandas else batch
+    except Exception:
+        logger.exception("Error streaming data from DuckDB with query %r", query)
+        raise
+    finally:
+        manager.release(conn)
+
+def export_parquet(query: str, path: str, batch_size: Optional[int] = None) -> int:
+    """
+    Writes a query result to a Parquet file batch by batch.
+    Args:
+        query (str): The SQL query to export.
+        path (str): Destination file.
+        batch_size (int, optional): Rows per batch. Defaults to READ_BATCH_SIZE.
+    Returns: int: Rows written.
+    """
+    rows = 0
+    writer = None
+    try:
+        for batch in read_batches(query, batch_size):
+            if writer is None:
+                writer = pq.ParquetWriter(path, batch.schema)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+    logger.info("Exported %d rows to %s", rows, path)
+    return rows
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _is_time_bound(value) -> bool:
+    return isinstance(value, (datetime.date, pd.Timestamp))
+
+def _predicate_shape(column: str, value) -> Tuple:
+    """Parameter-free description of one predicate; statements with the same shapes share SQL text."""
+    if value is None:
+        return (column, "null")
+    if isinstance(value, tuple):
+        low, high = value
+        return (column, "range", low is not None, high is not None, _is_time_bound(low) or _is_time_bound(high))
+    if isinstance(value, (list, set, frozenset)):
+        return (column, "in", len(value))
+    return (column, "eq")
+
+def _predicate_params(value) -> List[Any]:
+    if value is None:
+        return []
+    if isinstance(value, tuple):
+        return [pd.Timestamp(v).to_pydatetime() if _is_time_bound(v) else v for v in value if v is not None]
+    if isinstance(value, (list, set, frozenset)):
+        return list(value)
+    return [value]
+
+@functools.lru_cache(maxsize=256)
+def _compile_select(source: str, columns: Optional[Tuple[str, ...]], shapes: Tuple[Tuple, ...],
+                    order_by: Tuple[str, ...], limited: bool) -> str:
+    """Builds the parameterized SELECT for a read_table call shape (cached: the text is reused)."""
+    projection = ", ".join(_quote_ident(c) for c in columns) if columns else "*"
+    conditions = []
+    for shape in shapes:
+        column, kind = _quote_ident(shape[0]), shape[1]
+        if kind == "null":
+            conditions.append(f"{column} IS NULL")
+        elif kind == "eq":
+            conditions.append(f"{column} = ?")
+        elif kind == "in":
+            conditions.append(f"{column} IN ({', '.join('?' * shape[2])})" if shape[2] else "FALSE")
+        else:
+            _, _, has_low, has_high, is_time = shape
+            # Raw timestamps may be stored as ISO strings; time bounds compare as TIMESTAMP.
+            operand = f"CAST({column} AS TIMESTAMP)" if is_time else column
+            if has_low:
+                conditions.append(f"{operand} >= ?")
+            if has_high:
+                conditions.append(f"{operand} <= ?")
+    sql = f"SELECT {projection} FROM {source}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if order_by:
+        sql += " ORDER BY " + ", ".join(_quote_ident(c) for c in order_by)
+    if limited:
+        sql += " LIMIT ?"
+    return sql
+
+def read_table(
+    table_name: str,
+    columns: Optional[List[str]] = None,
+    where: Optional[Dict[str, Any]] = None,
+    order_by: Optional[List[str]] = None,
+    limit: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Reads selected columns and rows of a table with a parameterized statement.
+    Only ``columns`` are read, and predicates are pushed down to DuckDB (and, for
+    partitioned raw tables, to partition selection).
+    Args:
+        table_name (str): Table to read.
+        columns (List[str], optional): Columns to read. Defaults to all.
+        where (Dict[str, Any], optional): column -> value (equality), None (IS NULL),
+            list/set (IN), or an inclusive (low, high) tuple with None for an open end.
+            Date/datetime bounds compare the column as TIMESTAMP.
+        order_by (List[str], optional): Columns to sort by.
+        limit (int, optional): Maximum rows.
+    Returns: pd.DataFrame: Matching rows; empty if there are none or on error.
+    """
+    where = where or {}
+    shapes = tuple(_predicate_shape(column, value) for column, value in where.items())
+    params = [p for value in where.values() for p in _predicate_params(value)]
+    source = _quote_ident(table_name)
+    if _is_partitioned(table_name):
+        # Open only the partitions that can match the athlete and time predicates.
+        athlete_id = where.get("athlete_id") if isinstance(where.get("athlete_id"), str) else None
+        start, end = where.get(CURSOR_TIMESTAMP_COLUMN) if isinstance(where.get(CURSOR_TIMESTAMP_COLUMN), tuple) else (None, None)
+        files = parquet_store.partition_files(PARQUET_DIR, table_name, athlete_id, start, end)
+        if not files:
+            return pd.DataFrame(columns=columns)
+        source = "read_parquet(?, hive_partitioning = true, hive_types_autocast = false, union_by_name = true)"
+        params = [files] + params
+    if limit is not None:
+        params.append(limit)
+    sql = _compile_select(source, tuple(columns) if columns else None, shapes, tuple(order_by or ()), limit is not None)
+    try:
+        with get_db_connection(read_only=True) as conn:
+            return conn.execute(sql, params).fetchdf()
+    except Exception:
+        logger.exception("Error reading from %s with %r", table_name, sql)
+        return pd.DataFrame()
+
+def read_range(table_name: str, start=None, end=None, athlete_id: Optional[str] = None) -> pd.DataFrame:
+    """
+    Reads the rows of a raw table within an inclusive time range (see ``read_table``).
+    With the parquet layout only the partitions covering the range are opened.
+    """
+    where: Dict[str, Any] = {}
+    if start is not None or end is not None:
+        where[CURSOR_TIMESTAMP_COLUMN] = (
+            pd.Timestamp(start) if start is not None else None,
+            pd.Timestamp(end) if end is not None else None,
+        )
+    if athlete_id is not None:
+        where["athlete_id"] = athlete_id
+    return read_table(table_name, where=where)
+
+def enforce_retention(table_name: str, retention_days: int, today: Optional[datetime.date] = None) -> Dict[str, int]:
+    """
+    Removes rows of ``table_name`` older than ``retention_days``: whole month partitions
+    with the parquet layout, a DELETE on the timestamp column otherwise.
+    Args:
+        table_name (str): Table to trim.
+        retention_days (int): Days of history to keep.
+        today (date, optional): Reference date. Defaults to today.
+    Returns: Dict[str, int]: 'rows_deleted' and 'partitions_dropped'.
+    """
+    cutoff = (today or datetime.date.today()) - datetime.timedelta(days=retention_days)
+    if _is_partitioned(table_name):
+        dropped = parquet_store.drop_partitions_before(PARQUET_DIR, table_name, cutoff)
+        _bump_versions(table_name)
+        return {"rows_deleted": 0, "partitions_dropped": len(dropped)}
+    with get_db_connection() as conn:
+        columns = {row[0] for row in conn.execute(f"DESCRIBE {_quote_ident(table_name)}").fetchall()}
+        if CURSOR_TIMESTAMP_COLUMN not in columns:
+            return {"rows_deleted": 0, "partitions_dropped": 0}
+        deleted = conn.execute(
+            f"DELETE FROM {_quote_ident(table_name)} WHERE CAST({CURSOR_TIMESTAMP_COLUMN} AS TIMESTAMP) < ?",
+            [datetime.datetime.combine(cutoff, datetime.time())],
+        ).fetchone()[0]
+    _bump_versions(table_name)
+    return {"rows_deleted": deleted, "partitions_dropped": 0}
+
+def apply_retention(retention_days: Optional[int] = None, today: Optional[datetime.date] = None) -> Dict[str, List[Tuple[str, str]]]:
+    """
+    Drops raw month partitions older than the retention window (parquet layout only).
+    Args:
+        retention_days (int, optional): Defaults to ``Settings.storage.raw_retention_days``.
+        today (date, optional): Reference date. Defaults to today.
+    Returns: Dict[str, List[Tuple[str, str]]]: Table -> (athlete_id, month) partitions removed.
+    """
+    if STORAGE_LAYOUT != "parquet" or not os.path.isdir(PARQUET_DIR):
+        return {}
+    retention_days = RAW_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = (today or datetime.date.today()) - datetime.timedelta(days=retention_days)
+    dropped = {}
+    for table_name in sorted(os.listdir(PARQUET_DIR)):
+        if table_name.startswith("raw_"):
+            dropped[table_name] = parquet_store.drop_partitions_before(PARQUET_DIR, table_name, cutoff)
+            _bump_versions(table_name)
+            logger.info("Retention dropped %d partitions from %s", len(dropped[table_name]), table_name)
+    return dropped
+
+# DuckDB connection/cursor management: one database instance per process, one cursor per thread.
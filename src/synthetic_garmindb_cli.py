@@ -0,0 +1,133 @@
+"""
+Synthetic stand-in for ``garmindb_cli.py`` used for load and scale testing.
+
+Accepts the same commands as the real CLI::
+
+    synthetic_garmindb_cli.py [options] fetch activities|hrv [--delta-only] [--since ISO]
+
+and emits realistic synthetic data. Volume, latency, failure rate and
+malformed-output rate are set with the options below, so the stand-in can be
+plugged in through ``garmin.cli_command`` (see ``config/loadtest.yaml``).
+
+Data is deterministic per (seed, athlete, day), so repeated fetches agree
+and ingest cursors behave as they would against a real account. Failures and
+malformed output are random per invocation.
+
+This file runs as a standalone script (also inside the garmindb worker) and
+must not import anything from ``src``.
+"""
+
+import argparse
+import datetime
+import json
+import random
+import sys
+import time
+import zlib
+
+SPORTS = [("running", 0.55), ("cycling", 0.25), ("swimming", 0.1), ("strength", 0.1)]
+DELTA_DAYS = 7
+
+
+def _day_rng(seed: int, athlete: str, day: datetime.date) -> random.Random:
+    return random.Random(zlib.crc32(f"{seed}:{athlete}:{day.isoformat()}".encode()))
+
+
+def _activities_for_day(seed: int, athlete: str, day: datetime.date, per_day: float):
+    rng = _day_rng(seed, athlete, day)
+    count = int(per_day) + (1 if rng.random() < per_day - int(per_day) else 0)
+    for n in range(count):
+        sport = rng.choices([s for s, _ in SPORTS], weights=[w for _, w in SPORTS])[0]
+        duration = rng.randint(20 * 60, 150 * 60)
+        intensity = rng.uniform(0.6, 1.05)
+        start = datetime.datetime.combine(day, datetime.time(6)) + datetime.timedelta(hours=5 * n, minutes=rng.randint(0, 240))
+        yield {
+            "activity_id": f"{athlete}-{day.strftime('%Y%m%d')}-{n}",
+            "timestamp": start.isoformat(),
+            "sport": sport,
+            "duration_s": duration,
+            "distance_m": round(duration * rng.uniform(2.2, 3.8) * (3 if sport == "cycling" else 1), 1),
+            "avg_hr": int(110 + 60 * intensity + rng.gauss(0, 4)),
+            "tss": round(duration / 3600 * intensity ** 2 * 100, 1),
+        }
+
+
+def _hrv_for_day(seed: int, athlete: str, day: datetime.date):
+    rng = _day_rng(seed, athlete, day)
+    yield {
+        "timestamp": datetime.datetime.combine(day, datetime.time(6)).isoformat(),
+        "hrv": round(rng.gauss(62, 8), 1),
+        "resting_hr": round(rng.gauss(50, 3), 1),
+        "sleep_hours": round(min(10.0, max(3.0, rng.gauss(7.2, 0.9))), 2),
+    }
+
+
+def generate(opts):
+    """Yield the records for the requested data type and window."""
+
+    end = datetime.date.fromisoformat(opts.end_date) if opts.end_date else datetime.date.today()
+    start = end - datetime.timedelta(days=DELTA_DAYS if opts.delta_only else opts.days - 1)
+    since = datetime.datetime.fromisoformat(opts.since) if opts.since else None
+    day = start
+    while day <= end:
+        if opts.data_type == "activities":
+            records = _activities_for_day(opts.seed, opts.athlete, day, opts.activities_per_day)
+        else:
+            records = _hrv_for_day(opts.seed, opts.athlete, day)
+        for record in records:
+            if since is None or datetime.datetime.fromisoformat(record["timestamp"]) > since:
+                yield record
+        day += datetime.timedelta(days=1)
+
+
+def _parse_args(argv):
+    parser = argparse.ArgumentParser(description="Synthetic garmindb_cli.py stand-in")
+    parser.add_argument("--athlete", default="synthetic", help="Athlete/account the data is generated for")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", type=int, default=365, help="History length returned without --delta-only")
+    parser.add_argument("--end-date", help="Last day of generated history (ISO date); defaults to today")
+    parser.add_argument("--activities-per-day", type=float, default=1.2)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean response latency in seconds")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Uniform +/- jitter on the latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability of exiting non-zero")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Probability of truncated JSON output")
+    parser.add_argument("--format", choices=["json", "ndjson"], default="json")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fetch = sub.add_parser("fetch")
+    fetch.add_argument("data_type", choices=["activities", "hrv"])
+    fetch.add_argument("--delta-only", action="store_true")
+    fetch.add_argument("--since", help="Only return records after this ISO timestamp")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    opts = _parse_args(sys.argv[1:] if argv is None else argv)
+    chaos = random.Random()
+
+    latency = opts.latency + chaos.uniform(-opts.latency_jitter, opts.latency_jitter)
+    if latency > 0:
+        time.sleep(latency)
+    if chaos.random() < opts.failure_rate:
+        print("synthetic failure: upstream unavailable", file=sys.stderr)
+        return 1
+    malformed = chaos.random() < opts.malformed_rate
+
+    out = sys.stdout
+    if opts.format == "json":
+        out.write("[")
+    for n, record in enumerate(generate(opts)):
+        if opts.format == "json":
+            out.write(("," if n else "") + json.dumps(record))
+        else:
+            out.write(json.dumps(record) + "\n")
+        if malformed and n >= 1:
+            out.write(',{"activity_id": ')  # truncated mid-record
+            out.flush()
+            return 0
+    if opts.format == "json":
+        out.write("]\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
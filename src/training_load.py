@@ -0,0 +1,65 @@
+"""
+Incremental Training Load
+
+Keeps each athlete's CTL/ATL current without recomputing from the first
+activity. The last state and the day it covers are stored in DuckDB
+(``storage.TRAINING_LOAD_STATE_TABLE``); an update reads only the daily_load
+rows after that day and folds them in with the EWMA recurrence, a constant
+amount of work per new day.
+
+The state is stored through the day before the athlete's last recorded day,
+since later activities on that day (a second session, a re-sync) still change
+its load. ``storage`` drops an athlete's state whenever that athlete's
+daily_load changes on or before the state date (backdated or re-ingested
+activities), so the next update recomputes that athlete from the full history
+once.
+"""
+
+import datetime
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from src import analytics, storage
+from src.monitoring import inc_counter
+
+
+def update(athlete_id: str, end: Optional[datetime.date] = None) -> Dict[str, Any]:
+    """
+    Brings an athlete's stored CTL/ATL up to date and returns the latest values.
+    Args:
+        athlete_id (str): Athlete to update.
+        end (date, optional): Report the loads as of this day, decaying them over rest days
+            after the last recorded activity. The stored state stays at the day before the last
+            recorded day.
+    Returns: Dict[str, Any]: {'date', 'ctl', 'atl', 'tsb', 'full_recompute'}.
+    """
+    state = storage.get_training_load_state(athlete_id)
+    start = state["date"] + datetime.timedelta(days=1) if state is not None else None
+    days = storage.read_daily_load(
+        athlete_id, columns=analytics.compute_ctl_atl_from_daily_load.required_columns, start=start
+    )
+    activities = (
+        days.rename(columns={"date": "timestamp", "total_tss": "tss"})
+        if not days.empty else pd.DataFrame(columns=["timestamp", "tss"])
+    )
+
+    load = analytics.compute_training_load(activities, initial=state)
+    through = load["date"] - datetime.timedelta(days=1) if load["date"] is not None else None
+    if through is not None and (state is None or through > state["date"]):
+        # The series is daily, so its second-to-last row is the previous day; a one-day series
+        # without a state starts from zero loads.
+        previous = load["series"].iloc[-2] if len(load["series"]) > 1 else {"ctl": 0.0, "atl": 0.0}
+        storage.save_training_load_state(athlete_id, through, float(previous["ctl"]), float(previous["atl"]))
+    inc_counter("training_load_full_recomputes_total" if state is None else "training_load_incremental_updates_total")
+
+    if end is not None and load["date"] is not None and pd.Timestamp(end) > pd.Timestamp(load["date"]):
+        # Rest days up to ``end``: reported, not stored, so a later activity on those days still folds in.
+        load = analytics.compute_training_load(activities.iloc[0:0], end=end, initial=load)
+    return {
+        "date": load["date"],
+        "ctl": load["ctl"],
+        "atl": load["atl"],
+        "tsb": load["tsb"],
+        "full_recompute": state is None,
+    }
@@ -0,0 +1,240 @@
+"""
+Single-Writer Ingestion Queue
+
+DuckDB allows one writing process per database file, and concurrent writers in
+one process contend for the same transaction. Producers (flows, the
+scheduler, backfills) submit writes to one queue; a single writer thread
+drains it, coalescing queued writes into one transaction, and resolves a
+future per write with the rows written or the error.
+
+When another process holds the database lock, the writer waits and retries
+instead of dropping the write; the time spent waiting is exported as the
+``db_lock_seconds`` metric.
+
+By default the writer keeps the database open between writes, which holds
+DuckDB's file lock for the life of the process: the maintenance CLI or a
+notebook cannot open the file meanwhile. ``release_when_idle``
+(``storage.writer_release_when_idle``) closes it whenever the queue drains,
+trading a reopen per drained batch, and failed reads on other threads that
+overlap the close, for a lock that is free while idle.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, List, Optional, Tuple
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+from src import storage
+from src.monitoring import inc_counter, log_event, set_gauge
+
+# Defaults; replaced from ``Settings.storage`` via ``configure``.
+MAX_BATCH_REQUESTS = 64
+MAX_BATCH_ROWS = 200_000
+LOCK_TIMEOUT_SECONDS = 300.0
+LOCK_RETRY_SECONDS = 0.5
+RELEASE_WHEN_IDLE = False
+
+# Data that can be rewritten if a coalesced transaction has to be replayed one write at a time.
+_REPLAYABLE = (pd.DataFrame, pa.Table, pa.RecordBatch, list)
+
+
+class _Write:
+    def __init__(self, data, table_name: str, cursor: Optional[Tuple[str, str]], key: Optional[List[str]]):
+        self.data = data
+        self.table_name = table_name
+        self.cursor = cursor
+        self.key = key
+        self.future: Future = Future()
+
+    @property
+    def rows(self) -> int:
+        return len(self.data) if isinstance(self.data, _REPLAYABLE) else 0
+
+
+class WriteQueue:
+    """One writer thread serving every producer in the process."""
+
+    def __init__(
+        self,
+        max_batch_requests: Optional[int] = None,
+        max_batch_rows: Optional[int] = None,
+        lock_timeout: Optional[float] = None,
+        release_when_idle: Optional[bool] = None,
+    ):
+        self.max_batch_requests = max_batch_requests or MAX_BATCH_REQUESTS
+        self.max_batch_rows = max_batch_rows or MAX_BATCH_ROWS
+        self.lock_timeout = LOCK_TIMEOUT_SECONDS if lock_timeout is None else lock_timeout
+        self.release_when_idle = RELEASE_WHEN_IDLE if release_when_idle is None else release_when_idle
+        self._queue: "queue.Queue[Optional[_Write]]" = queue.Queue()
+        # A write taken off the queue that did not fit the previous batch (may be the stop sentinel).
+        self._held: List[Optional[_Write]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        # Held by the writer for each transaction, and by ``paused`` callers in between.
+        self._write_lock = threading.Lock()
+
+    def start(self) -> "WriteQueue":
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="duckdb-writer", daemon=True)
+                self._thread.start()
+        return self
+
+    def submit(self, data, table_name: str, cursor: Optional[Tuple[str, str]] = None, key: Optional[List[str]] = None) -> Future:
+        """
+        Queues a write (same arguments as ``storage.write_df``).
+        Returns: Future: Resolves to the number of rows written, or raises the write's error.
+        """
+        self.start()
+        write = _Write(data, table_name, cursor, key)
+        self._queue.put(write)
+        set_gauge("write_queue_depth", self._queue.qsize())
+        return write.future
+
+    def flush(self):
+        """Blocks until every write submitted so far has been committed or failed."""
+        self._queue.join()
+
+    @contextmanager
+    def paused(self):
+        """
+        Holds the writer between transactions for the duration of the block (e.g. while the
+        database file is swapped). Writes submitted meanwhile stay queued and run afterwards.
+        """
+        with self._write_lock:
+            yield
+
+    def close(self):
+        """Drains the queue and stops the writer thread."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _next_batch(self) -> Optional[List[_Write]]:
+        """Blocks for one write, then takes whatever else is queued, within the batch limits."""
+        first = self._held.pop() if self._held else self._queue.get()
+        if first is None:
+            return None
+        batch, rows = [first], first.rows
+        # One-shot iterators are written alone: they cannot be replayed if the batch fails.
+        while isinstance(first.data, _REPLAYABLE) and len(batch) < self.max_batch_requests and rows < self.max_batch_rows:
+            try:
+                write = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if write is None or not isinstance(write.data, _REPLAYABLE):
+                self._held.append(write)
+                break
+            batch.append(write)
+            rows += write.rows
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                self._queue.task_done()
+                return
+            with self._write_lock:
+                try:
+                    self._write_batch(batch)
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                    set_gauge("write_queue_depth", self._queue.qsize())
+                if self.release_when_idle and not self._held and self._queue.empty():
+                    # Let writers in other processes take the database lock.
+                    storage.close_all()
+
+    def _connection(self):
+        """The writer's connection, waiting while another process holds the database lock."""
+        started = time.monotonic()
+        try:
+            while True:
+                try:
+                    return storage.get_connection_manager().cursor()
+                except duckdb.IOException as e:
+                    if "lock" not in str(e).lower() or time.monotonic() - started >= self.lock_timeout:
+                        raise
+                    time.sleep(LOCK_RETRY_SECONDS)
+        finally:
+            inc_counter("db_lock_seconds", time.monotonic() - started)
+
+    def _write_batch(self, batch: List[_Write]):
+        changed = set()
+        started = time.perf_counter()
+        try:
+            conn = self._connection()
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                rows = [
+                    storage.write_in_transaction(conn, w.data, w.table_name, w.cursor, w.key, changed) for w in batch
+                ]
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except Exception as e:
+            if len(batch) > 1:
+                # Replay one by one so a single bad write does not fail the others.
+                log_event("write_queue_batch_failed", {"writes": len(batch), "error": str(e)})
+                for write in batch:
+                    self._write_batch([write])
+                return
+            inc_counter("write_queue_failures_total")
+            log_event("write_queue_write_failed", {"table": batch[0].table_name, "error": str(e)})
+            batch[0].future.set_exception(e)
+            return
+        finally:
+            for table_name in changed:
+                storage.invalidate(table_name)
+        inc_counter("write_queue_transactions_total")
+        inc_counter("write_queue_writes_total", len(batch))
+        inc_counter("write_queue_rows_total", sum(rows))
+        inc_counter("db_write_seconds", time.perf_counter() - started)
+        for write, written in zip(batch, rows):
+            write.future.set_result(written)
+
+
+_queue: Optional[WriteQueue] = None
+_queue_lock = threading.Lock()
+
+
+def configure(storage_settings) -> None:
+    """Applies the writer options of ``Settings.storage`` to queues created afterwards."""
+    global MAX_BATCH_REQUESTS, MAX_BATCH_ROWS, LOCK_TIMEOUT_SECONDS, RELEASE_WHEN_IDLE
+    MAX_BATCH_REQUESTS = storage_settings.writer_max_batch_requests
+    MAX_BATCH_ROWS = storage_settings.writer_max_batch_rows
+    LOCK_TIMEOUT_SECONDS = storage_settings.writer_lock_timeout_seconds
+    RELEASE_WHEN_IDLE = storage_settings.writer_release_when_idle
+
+
+def get_write_queue() -> WriteQueue:
+    """Returns the process-wide write queue, starting it on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = WriteQueue()
+        return _queue.start()
+
+
+def write_df(data: Any, table_name: str, cursor: Optional[Tuple[str, str]] = None, key: Optional[List[str]] = None) -> int:
+    """
+    ``storage.write_df`` through the process-wide queue: waits for the commit and,
+    like ``storage.write_df``, raises the write's error.
+    Returns: int: Rows written.
+    """
+    return get_write_queue().submit(data, table_name, cursor, key).result()
@@ -0,0 +1,17 @@
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import storage
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A fresh DuckDB file for the test; managed connections are closed afterwards."""
+    path = str(tmp_path / "garmin.duckdb")
+    with patch("src.storage.DATABASE_PATH", path):
+        yield path
+    storage.close_all()
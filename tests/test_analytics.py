@@ -0,0 +1,125 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import analytics
+
+
+def test_ewma_matches_pandas_recurrence():
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0, 200, size=1000)
+    for span in (analytics.CTL_DAYS, analytics.ATL_DAYS, 2):
+        alpha = analytics.ewma_alpha(span)
+        # pandas seeds with the first value; prepend the initial state to compare like for like.
+        expected = pd.Series(np.r_[25.0, values]).ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+        np.testing.assert_allclose(analytics.ewma(values, alpha, initial=25.0), expected, rtol=1e-9)
+
+
+def test_ewma_runs_rows_independently():
+    rng = np.random.default_rng(1)
+    matrix = rng.uniform(0, 200, size=(5, 400))
+    initial = np.arange(5, dtype=float)
+    alpha = analytics.ewma_alpha(analytics.CTL_DAYS)
+    result = analytics.ewma(matrix, alpha, initial)
+    for row in range(5):
+        np.testing.assert_allclose(result[row], analytics.ewma(matrix[row], alpha, initial[row]), rtol=1e-12)
+
+
+def test_daily_tss_sums_days_and_zero_fills_rest_days():
+    activities = pd.DataFrame({
+        "timestamp": ["2024-01-01 07:00:00", "2024-01-01 18:00:00", "2024-01-04 07:00:00"],
+        "tss": [50.0, 30.0, 100.0],
+    })
+    tss = analytics.daily_tss(activities, end="2024-01-06")
+    assert list(tss.index.strftime("%Y-%m-%d")) == [f"2024-01-0{d}" for d in range(1, 7)]
+    assert tss.tolist() == [80.0, 0.0, 0.0, 100.0, 0.0, 0.0]
+
+
+def test_compute_training_load_decays_over_rest_days():
+    activities = pd.DataFrame({"timestamp": ["2024-01-01", "2024-01-01"], "tss": [60.0, 40.0]})
+    load = analytics.compute_training_load(activities, end="2024-01-11")
+    series = load["series"]
+    assert len(series) == 11
+    # Two workouts on one day are one time step.
+    assert series["ctl"].iloc[0] == pytest.approx(100.0 * analytics.ewma_alpha(analytics.CTL_DAYS))
+    assert series["atl"].iloc[0] == pytest.approx(100.0 * analytics.ewma_alpha(analytics.ATL_DAYS))
+    assert (np.diff(series["ctl"].to_numpy()) < 0).all()
+    assert load["date"].isoformat() == "2024-01-11"
+    assert load["ctl"] == pytest.approx(series["ctl"].iloc[-1])
+    assert load["tsb"] == pytest.approx(load["ctl"] - load["atl"])
+
+
+def test_compute_ctl_atl_handles_empty_input():
+    assert analytics.compute_ctl_atl(pd.DataFrame()) == {"ctl": 0, "atl": 0, "tsb": 0}
+    assert analytics.compute_training_load(pd.DataFrame({"timestamp": [], "tss": []}))["date"] is None
+
+
+def test_rolling_stats_match_pandas_rolling():
+    rng = np.random.default_rng(2)
+    values = rng.normal(62, 8, size=500)
+    expected = pd.Series(values).rolling(30)
+    means, stds = expected.mean().to_numpy(), expected.std().to_numpy()
+    stats = analytics.RollingStats(30)
+    for i, value in enumerate(values):
+        stats.push(value)
+        if i >= 29:
+            assert stats.mean == pytest.approx(means[i], rel=1e-9)
+            assert stats.std == pytest.approx(stds[i], rel=1e-7)
+    np.testing.assert_allclose(stats.values(), values[-30:])
+    assert stats.latest == values[-1]
+    assert analytics.RollingStats(30, stats.values()).zscore() == pytest.approx(stats.zscore(), rel=1e-9)
+
+
+def test_rolling_stats_needs_a_full_window():
+    stats = analytics.RollingStats(3, [60.0, float("nan"), 62.0])
+    assert stats.count == 2 and stats.zscore() is None
+    stats.push(64.0)
+    assert stats.zscore() == pytest.approx(1.0)
+
+
+def test_compute_hrv_zscore_uses_configured_window():
+    hrv = [{"timestamp": i, "hrv": float(v)} for i, v in enumerate([100, 100, 100, 58, 60, 62, 64])]
+    assert analytics.compute_hrv_zscore(hrv, window=4) == pytest.approx(
+        (64 - np.mean([58, 60, 62, 64])) / np.std([58, 60, 62, 64], ddof=1)
+    )
+    assert analytics.compute_hrv_zscore(hrv, window=8) is None
+
+
+def test_team_metrics_match_per_athlete_computation():
+    rng = np.random.default_rng(6)
+    rows = []
+    for athlete, (start, days) in {"a": ("2024-01-01", 90), "b": ("2024-02-15", 45), "c": ("2024-03-20", 3)}.items():
+        for day in pd.date_range(start, periods=days):
+            if rng.random() < 0.7:
+                rows.append({"athlete_id": athlete, "date": day, "total_tss": float(rng.uniform(20, 200))})
+    daily_load = pd.DataFrame(rows).sample(frac=1, random_state=0)
+    settings = SimpleNamespace(ctl_atl_ratio_max=1.3, ramp_percentage_max=0.10)
+
+    result = analytics.team_metrics(daily_load, settings, end="2024-03-31", chunk_size=2).set_index("athlete_id")
+    assert list(result.index) == ["a", "b", "c"]
+    assert (result["date"] == pd.Timestamp("2024-03-31").date()).all()
+    for athlete, group in daily_load.groupby("athlete_id"):
+        load = analytics.compute_training_load(
+            group.rename(columns={"date": "timestamp", "total_tss": "tss"}), end="2024-03-31"
+        )
+        ctl = load["series"]["ctl"]
+        row = result.loc[athlete]
+        assert row["ctl"] == pytest.approx(load["ctl"], rel=1e-9)
+        assert row["atl"] == pytest.approx(load["atl"], rel=1e-9)
+        assert row["tsb"] == pytest.approx(load["tsb"], rel=1e-9, abs=1e-9)
+        if len(ctl) > analytics.RAMP_DAYS:
+            before = ctl.iloc[-1 - analytics.RAMP_DAYS]
+            assert row["ramp_rate"] == pytest.approx((ctl.iloc[-1] - before) / before, rel=1e-9)
+            assert row["high_ramp"] == (row["ramp_rate"] > 0.10)
+        assert row["high_atl_ctl_ratio"] == (row["atl"] / row["ctl"] > 1.3)
+        assert row["low_tsb"] == (row["tsb"] < analytics.LOW_TSB_THRESHOLD)
+
+
+def test_team_metrics_without_rows():
+    empty = pd.DataFrame({"athlete_id": [], "date": [], "total_tss": []})
+    assert analytics.team_metrics(empty, SimpleNamespace(ctl_atl_ratio_max=1.3, ramp_percentage_max=0.1)).empty
@@ -0,0 +1,109 @@
+import datetime
+import os
+import sys
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import baselines, storage
+
+WINDOWS = {"hrv": 7, "resting_hr": 5}
+
+
+def _readings(rng, start: datetime.date, days: int, athlete_id: str = "a1"):
+    return [
+        {
+            "athlete_id": athlete_id,
+            "timestamp": f"{start + datetime.timedelta(days=d)} 06:00:00",
+            "hrv": float(rng.normal(62, 8)),
+            "resting_hr": float(rng.normal(50, 3)),
+        }
+        for d in range(days)
+    ]
+
+
+def _expected(rows, metric, window):
+    values = pd.Series([r[metric] for r in rows]).dropna().to_numpy()[-window:]
+    return (values[-1] - values.mean()) / values.std(ddof=1)
+
+
+def test_incremental_updates_match_full_window(db_path):
+    rng = np.random.default_rng(3)
+    rows = []
+    day = datetime.date(2024, 1, 1)
+    for days in (10, 1, 3, 1, 1, 12):
+        batch = _readings(rng, day, days)
+        day += datetime.timedelta(days=days)
+        storage.write_df(batch, "raw_hrv")
+        rows += batch
+        result = baselines.update("a1", WINDOWS)
+        for metric, window in WINDOWS.items():
+            assert result[metric]["zscore"] == pytest.approx(_expected(rows, metric, window), rel=1e-9)
+            assert result[metric]["value"] == rows[-1][metric]
+    # Only the first update rebuilt the windows from history.
+    assert not any(stats["rebuilt"] for stats in result.values())
+
+    state = storage.get_baseline_states("a1")
+    assert state["hrv"]["window_size"] == 7
+    assert state["hrv"]["last_timestamp"] == pd.Timestamp(rows[-1]["timestamp"])
+    np.testing.assert_allclose(state["hrv"]["values"], [r["hrv"] for r in rows[-7:]])
+
+
+def test_update_reads_only_new_readings(db_path):
+    rng = np.random.default_rng(4)
+    storage.write_df(_readings(rng, datetime.date(2024, 1, 1), 30), "raw_hrv")
+    baselines.update("a1", WINDOWS)
+    storage.write_df(_readings(rng, datetime.date(2024, 1, 31), 1), "raw_hrv")
+
+    with patch("src.baselines.storage.read_table", wraps=storage.read_table) as read_table:
+        baselines.update("a1", WINDOWS)
+    where = read_table.call_args.kwargs["where"]
+    assert where["timestamp"][0] == pd.Timestamp("2024-01-30 06:00:00")
+
+
+def test_unchanged_overlap_keeps_windows(db_path):
+    rng = np.random.default_rng(6)
+    rows = _readings(rng, datetime.date(2024, 1, 1), 20)
+    storage.write_df(rows, "raw_hrv", cursor=("a1", "hrv"))
+    baselines.update("a1", WINDOWS)
+
+    # The next sync re-fetches the cursor overlap unchanged along with a new day.
+    storage.write_df(rows[-7:] + _readings(rng, datetime.date(2024, 1, 21), 1), "raw_hrv", cursor=("a1", "hrv"))
+    assert set(storage.get_baseline_states("a1")) == set(WINDOWS)
+    result = baselines.update("a1", WINDOWS)
+    assert not any(stats["rebuilt"] for stats in result.values())
+
+    # A reading at a new timestamp inside the window still drops it.
+    storage.write_df([{**rows[-1], "timestamp": "2024-01-20 18:00:00"}], "raw_hrv", cursor=("a1", "hrv"))
+    assert storage.get_baseline_states("a1") == {}
+
+
+def test_backdated_reading_and_window_change_rebuild(db_path):
+    rng = np.random.default_rng(5)
+    rows = _readings(rng, datetime.date(2024, 1, 1), 20)
+    storage.write_df(rows, "raw_hrv")
+    storage.write_df(_readings(rng, datetime.date(2024, 1, 1), 20, athlete_id="a2"), "raw_hrv")
+    baselines.update("a1", WINDOWS)
+    baselines.update("a2", WINDOWS)
+
+    # A corrected reading inside a1's window drops only a1's windows.
+    rows[15] = {**rows[15], "hrv": 99.0}
+    storage.write_df([rows[15]], "raw_hrv")
+    assert storage.get_baseline_states("a1") == {}
+    assert set(storage.get_baseline_states("a2")) == set(WINDOWS)
+
+    result = baselines.update("a1", WINDOWS)
+    assert result["hrv"]["rebuilt"]
+    assert result["hrv"]["zscore"] == pytest.approx(_expected(rows, "hrv", 7), rel=1e-9)
+
+    result = baselines.update("a1", {"hrv": 10})
+    assert result["hrv"]["rebuilt"]
+    assert result["hrv"]["zscore"] == pytest.approx(_expected(rows, "hrv", 10), rel=1e-9)
+
+
+def test_update_without_readings(db_path):
+    result = baselines.update("nobody", WINDOWS)
+    assert result["hrv"] == {"value": None, "mean": None, "std": None, "zscore": None, "count": 0, "rebuilt": True}
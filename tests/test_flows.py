@@ -1,5 +1,6 @@
 """Tests for Prefect flows."""
 
+import datetime
 from pathlib import Path
 import sys
 import types
@@ -8,6 +9,9 @@ from unittest.mock import patch
 # Ensure project root is on sys.path for importing dags module
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
+import pandas as pd
+import pytest
+
 # Make Prefect's flow decorator accept a schedule kwarg for tests
 import prefect
 
@@ -29,105 +33,251 @@ planner_stub.patch_and_push = lambda *args, **kwargs: None
 sys.modules.setdefault("src.planner_interface", planner_stub)
 
 settings_stub = types.ModuleType("settings")
+class RetrySettings:
+    max_attempts = 5
+    base = 2.0
+    jitter = True
+    max_delay = 60.0
+    budget_seconds = 600.0
+    breaker_failure_threshold = 5
+    breaker_reset_seconds = 60.0
 class Settings:
+    athlete_id = "default"
+    retry = RetrySettings()
+    logging = types.SimpleNamespace(
+        payload_max_bytes=4096, spill_path=None, spill_max_bytes=1024 * 1024, spill_backup_count=1
+    )
+    garmin = types.SimpleNamespace(
+        backend="cli", cli_command=["python", "garmindb_cli.py"], use_worker=False, worker_timeout=300.0,
+        max_concurrency=4, cache_mode="off", cache_dir="data/raw_cache",
+    )
+    storage = types.SimpleNamespace(
+        database_path="data/garmin.duckdb", read_only=False, layout="duckdb", parquet_dir="data/parquet",
+        raw_retention_days=90, query_cache_max_bytes=0, writer_max_batch_requests=64,
+        writer_max_batch_rows=200_000, writer_lock_timeout_seconds=300, writer_release_when_idle=False,
+    )
+    baselines = types.SimpleNamespace(windows={"hrv": 30, "resting_hr": 30})
+    analytics_backend = "python"
     sync_daily_cron = None
     sync_catchup_cron = None
     adapt_weekly_cron = None
+    maintenance_cron = None
+settings_stub.RetrySettings = RetrySettings
 settings_stub.Settings = Settings
 settings_stub.load_settings = lambda: Settings()
-sys.modules.setdefault("src.settings", settings_stub)
+# Bind the project modules to the real settings module first, so only dags.flows sees the stub.
+from src import garmin_client, garmindb_sqlite, storage, analytics, monitoring, retry, scheduler, write_queue, maintenance, training_load, baselines, sql_analytics
 
-from dags import flows
+# Swap the stub in only while dags.flows is imported (its load_settings reads config files),
+# then put back whatever other tests see as src.settings.
+with pytest.MonkeyPatch.context() as mp:
+    mp.setitem(sys.modules, "src.settings", settings_stub)
+    from dags import flows
 
 
 @patch("dags.flows.monitoring.log_event")
-@patch("dags.flows.storage.write_df")
-@patch("dags.flows.garmin_client.get_activities")
-def test_sync_daily_flow(mock_get_activities, mock_write_df, mock_log_event):
+@patch("dags.flows.write_queue.write_df")
+@patch("dags.flows.garmin_client.fetch_all")
+@patch("dags.flows.storage.get_cursors")
+def test_sync_daily_flow(mock_get_cursors, mock_fetch_all, mock_write_df, mock_log_event):
     """Test the sync_daily flow."""
-    mock_get_activities.return_value = "activities"
+    mock_get_cursors.return_value = {
+        "activities": {"last_timestamp": pd.Timestamp("2024-05-01 07:00"), "last_activity_id": "9"}
+    }
+    mock_fetch_all.return_value = {"activities": "activities", "hrv": "hrv"}
 
     flows.sync_daily()
 
-    mock_get_activities.assert_called_once_with()
-    mock_write_df.assert_called_once_with("activities", "raw_activities")
+    mock_get_cursors.assert_called_once_with("default")
+    mock_fetch_all.assert_called_once_with(
+        None, max_concurrency=4, since={"activities": "2024-04-24T07:00:00"}, cli_command=["python", "garmindb_cli.py"]
+    )
+    mock_write_df.assert_any_call("activities", "raw_activities", cursor=("default", "activities"))
+    mock_write_df.assert_any_call("hrv", "raw_hrv", cursor=("default", "hrv"))
     mock_log_event.assert_called_once_with("sync_daily_ok")
 
 
-@patch("dags.flows.storage.write_df")
+@patch("dags.flows.monitoring.log_event")
+@patch("dags.flows.write_queue.write_df")
+@patch("dags.flows.garmin_client.fetch_all")
+@patch("dags.flows.storage.get_cursors", return_value={})
+def test_sync_daily_flow_skips_failed_streams(mock_get_cursors, mock_fetch_all, mock_write_df, mock_log_event):
+    """A failed data type is logged and the remaining streams are still written."""
+    mock_fetch_all.return_value = {"activities": "activities", "hrv": None}
+
+    flows.sync_daily()
+
+    mock_write_df.assert_called_once_with("activities", "raw_activities", cursor=("default", "activities"))
+    mock_log_event.assert_any_call("sync_daily_fetch_failed", {"data_type": "hrv"})
+    mock_log_event.assert_any_call("sync_daily_ok")
+
+
+@patch("dags.flows.monitoring.log_event")
+@patch("dags.flows.garmindb_sqlite.ingest")
+@patch("dags.flows.garmin_client.fetch_all")
+def test_sync_daily_flow_sqlite_backend(mock_fetch_all, mock_ingest, mock_log_event):
+    """The sqlite backend bulk-copies garmindb's databases instead of calling the CLI."""
+    mock_ingest.return_value = {"activities": 20, "hrv": 5}
+    with patch.object(flows.settings.garmin, "backend", "sqlite"):
+        flows.sync_daily()
+
+    mock_ingest.assert_called_once_with(flows.settings)
+    mock_fetch_all.assert_not_called()
+    mock_log_event.assert_called_once_with("sync_daily_ok")
+
+
+@patch("dags.flows.monitoring.log_event")
+@patch("dags.flows.garmindb_sqlite.ingest", return_value={"activities": None, "hrv": None})
+def test_sync_daily_flow_sqlite_backend_fails_when_every_source_fails(mock_ingest, mock_log_event):
+    """Failed sources are reported like failed CLI streams, and the run fails if none succeeded."""
+    with patch.object(flows.settings.garmin, "backend", "sqlite"), pytest.raises(RuntimeError):
+        flows.sync_daily()
+
+    mock_log_event.assert_any_call("sync_daily_fetch_failed", {"data_type": "activities"})
+    mock_log_event.assert_any_call("sync_daily_fetch_failed", {"data_type": "hrv"})
+    mock_log_event.assert_any_call("sync_daily_failed", {"data_types": ["activities", "hrv"]})
+    assert ("sync_daily_ok",) not in [c.args for c in mock_log_event.call_args_list]
+
+
+@patch("dags.flows.write_queue.write_df")
 @patch("dags.flows.garmin_client.get_activities")
-def test_sync_catchup_flow(mock_get_activities, mock_write_df):
+@patch("dags.flows.storage.get_cursors", return_value={})
+def test_sync_catchup_flow(mock_get_cursors, mock_get_activities, mock_write_df):
     """Test the sync_catchup flow."""
     mock_get_activities.return_value = "activities"
 
     flows.sync_catchup()
 
-    mock_get_activities.assert_called_once_with(delta_only=True)
-    mock_write_df.assert_called_once_with("activities", "raw_activities")
+    mock_get_activities.assert_called_once_with(delta_only=True, since=None, cli_command=["python", "garmindb_cli.py"])
+    mock_write_df.assert_called_once_with("activities", "raw_activities", cursor=("default", "activities"))
+
+
+@patch("dags.flows.monitoring.log_event")
+@patch("dags.flows.write_queue.write_df")
+@patch("dags.flows.garmin_client.get_activities", return_value=None)
+@patch("dags.flows.storage.get_cursors", return_value={})
+def test_sync_catchup_flow_skips_failed_fetch(mock_get_cursors, mock_get_activities, mock_write_df, mock_log_event):
+    """A failed fetch is logged and nothing is written."""
+    flows.sync_catchup()
+
+    mock_write_df.assert_not_called()
+    mock_log_event.assert_called_once_with("sync_catchup_fetch_failed", {"data_type": "activities"})
 
 
 @patch("dags.flows.monitoring.alert")
 @patch("dags.flows.planner_interface.patch_and_push")
 @patch("dags.flows.llm.propose_revision")
 @patch("dags.flows.analytics.evaluate_flags")
-@patch("dags.flows.analytics.compute_hrv_zscore")
-@patch("dags.flows.analytics.compute_ctl_atl")
-@patch("dags.flows.storage.read_df")
+@patch("dags.flows.baselines.update")
+@patch("dags.flows.training_load.update")
 def test_adapt_weekly_flow_with_flags(
-    mock_read_df,
-    mock_compute_ctl_atl,
-    mock_compute_hrv_zscore,
+    mock_update_load,
+    mock_update_baselines,
     mock_evaluate_flags,
     mock_propose_revision,
     mock_patch_and_push,
     mock_alert,
 ):
     """Test adapt_weekly flow when flags are returned."""
-    mock_read_df.return_value = "df"
-    mock_compute_ctl_atl.return_value = {"ctl": 1}
-    mock_compute_hrv_zscore.return_value = 0.5
+    mock_update_load.return_value = {"date": None, "ctl": 1, "atl": 2, "tsb": -1, "full_recompute": False}
+    mock_update_baselines.return_value = {"hrv": {"zscore": 0.5}, "resting_hr": {"zscore": None}}
     mock_evaluate_flags.return_value = ["flag"]
     mock_propose_revision.return_value = "diff"
 
     flows.adapt_weekly()
 
-    mock_read_df.assert_called_once_with("SELECT * FROM raw_activities")
-    mock_compute_ctl_atl.assert_called_once_with("df")
-    mock_compute_hrv_zscore.assert_called_once_with("df")
-    mock_evaluate_flags.assert_called_once_with({"ctl": 1, "hrv_zscore": 0.5})
+    mock_update_load.assert_called_once_with("default", end=datetime.date.today())
+    mock_update_baselines.assert_called_once_with("default", {"hrv": 30, "resting_hr": 30})
+    mock_evaluate_flags.assert_called_once_with({"ctl": 1, "atl": 2, "tsb": -1, "hrv_zscore": 0.5, "resting_hr_zscore": None})
     mock_propose_revision.assert_called_once()
     mock_patch_and_push.assert_called_once_with("diff")
-    mock_alert.assert_called_once_with({"ctl": 1, "hrv_zscore": 0.5}, ["flag"])
+    mock_alert.assert_called_once_with({"ctl": 1, "atl": 2, "tsb": -1, "hrv_zscore": 0.5, "resting_hr_zscore": None}, ["flag"])
 
 
 @patch("dags.flows.monitoring.alert")
 @patch("dags.flows.planner_interface.patch_and_push")
 @patch("dags.flows.llm.propose_revision")
 @patch("dags.flows.analytics.evaluate_flags")
-@patch("dags.flows.analytics.compute_hrv_zscore")
-@patch("dags.flows.analytics.compute_ctl_atl")
-@patch("dags.flows.storage.read_df")
+@patch("dags.flows.baselines.update")
+@patch("dags.flows.training_load.update")
 def test_adapt_weekly_flow_no_flags(
-    mock_read_df,
-    mock_compute_ctl_atl,
-    mock_compute_hrv_zscore,
+    mock_update_load,
+    mock_update_baselines,
     mock_evaluate_flags,
     mock_propose_revision,
     mock_patch_and_push,
     mock_alert,
 ):
     """Test adapt_weekly flow when no flags are returned."""
-    mock_read_df.return_value = "df"
-    mock_compute_ctl_atl.return_value = {"ctl": 1}
-    mock_compute_hrv_zscore.return_value = 0.5
+    mock_update_load.return_value = {"date": None, "ctl": 1, "atl": 2, "tsb": -1, "full_recompute": False}
+    mock_update_baselines.return_value = {"hrv": {"zscore": 0.5}, "resting_hr": {"zscore": None}}
     mock_evaluate_flags.return_value = []
 
     flows.adapt_weekly()
 
-    mock_read_df.assert_called_once_with("SELECT * FROM raw_activities")
-    mock_compute_ctl_atl.assert_called_once_with("df")
-    mock_compute_hrv_zscore.assert_called_once_with("df")
-    mock_evaluate_flags.assert_called_once_with({"ctl": 1, "hrv_zscore": 0.5})
+    mock_update_load.assert_called_once_with("default", end=datetime.date.today())
+    mock_update_baselines.assert_called_once_with("default", {"hrv": 30, "resting_hr": 30})
+    mock_evaluate_flags.assert_called_once_with({"ctl": 1, "atl": 2, "tsb": -1, "hrv_zscore": 0.5, "resting_hr_zscore": None})
     mock_propose_revision.assert_not_called()
     mock_patch_and_push.assert_not_called()
-    mock_alert.assert_called_once_with({"ctl": 1, "hrv_zscore": 0.5}, [])
+    mock_alert.assert_called_once_with({"ctl": 1, "atl": 2, "tsb": -1, "hrv_zscore": 0.5, "resting_hr_zscore": None}, [])
+
+
+@patch("dags.flows.monitoring.alert")
+@patch("dags.flows.analytics.evaluate_flags")
+@patch("dags.flows.baselines.update")
+@patch("dags.flows.training_load.update")
+@patch("dags.flows.sql_analytics.athlete_metrics")
+def test_adapt_weekly_flow_duckdb_backend(
+    mock_athlete_metrics, mock_update_load, mock_update_baselines, mock_evaluate_flags, mock_alert
+):
+    """Test adapt_weekly takes its metrics from SQL when the duckdb backend is selected."""
+    metrics = {"ctl": 1.0, "atl": 2.0, "tsb": -1.0, "hrv_zscore": 0.5}
+    mock_athlete_metrics.return_value = metrics
+    mock_evaluate_flags.return_value = []
+
+    with patch.object(flows.settings, "analytics_backend", "duckdb"):
+        flows.adapt_weekly()
+
+    mock_athlete_metrics.assert_called_once_with(flows.settings, "default", end=datetime.date.today())
+    mock_update_load.assert_not_called()
+    mock_update_baselines.assert_not_called()
+    mock_evaluate_flags.assert_called_once_with(metrics)
+    mock_alert.assert_called_once_with(metrics, [])
+
+
+@patch("dags.flows.monitoring.log_event")
+@patch("dags.flows.write_queue.write_df")
+@patch("dags.flows.garmin_client.stream_activities")
+def test_backfill_flow_writes_each_batch(mock_stream, mock_write_df, mock_log_event):
+    """Test the backfill flow writes every streamed batch."""
+    mock_stream.return_value = iter([[1, 2], [3]])
+
+    flows.backfill(batch_size=2)
+
+    mock_stream.assert_called_once_with(delta_only=False, batch_size=2, cli_command=["python", "garmindb_cli.py"])
+    assert mock_write_df.call_count == 2
+    mock_write_df.assert_any_call([3], "raw_activities", cursor=("default", "activities"))
+    mock_log_event.assert_called_once_with("backfill_ok", {"records": 3})
+
+
+@patch("dags.flows.monitoring.log_event")
+@patch("dags.flows.garmin_client.fetch_all")
+@patch("dags.flows.garmin_client.stream_activities")
+def test_backfill_then_sync_daily_share_the_athlete(mock_stream, mock_fetch_all, mock_log_event, db_path):
+    """Backfilled rows belong to the athlete, so a later sync upserts alongside them."""
+    mock_stream.return_value = iter([[
+        {"activity_id": str(i), "timestamp": f"2024-05-{i:02d} 07:00:00", "tss": 50.0} for i in range(1, 4)
+    ]])
+    mock_fetch_all.return_value = {
+        "activities": [{"activity_id": "3", "timestamp": "2024-05-03 07:00:00", "tss": 70.0},
+                       {"activity_id": "4", "timestamp": "2024-05-04 07:00:00", "tss": 60.0}],
+    }
+
+    flows.backfill()
+    flows.sync_daily()
+
+    assert mock_fetch_all.call_args.kwargs["since"] == {"activities": "2024-04-26T07:00:00"}
+    daily = flows.storage.read_daily_load("default")
+    assert daily["total_tss"].tolist() == [50.0, 50.0, 70.0, 60.0]
+    mock_log_event.assert_any_call("sync_daily_ok")
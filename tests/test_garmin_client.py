@@ -1,9 +1,36 @@
+import asyncio
+import io
+import json
 import os
+import signal
 import sys
+import time
+import types
 from unittest.mock import patch
 
+import pytest
+
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
-from src import garmin_client
+from src import garmin_client, retry
+
+# Retry policy matching the original fixed 3-tries / 5s-doubling behaviour.
+TEST_RETRY = types.SimpleNamespace(
+    max_attempts=3,
+    base=5,
+    jitter=False,
+    max_delay=60,
+    budget_seconds=600,
+    breaker_failure_threshold=5,
+    breaker_reset_seconds=60,
+)
+
+
+@pytest.fixture(autouse=True)
+def _retry_settings():
+    retry.reset_breakers()
+    with patch("src.retry._settings", TEST_RETRY):
+        yield
+    retry.reset_breakers()
 
 
 def _success(payload: str):
@@ -18,7 +45,7 @@ def _failure():
 def test_get_activities_success(mock_cli):
     mock_cli.return_value = _success('[{"id": 1}]')
     activities = garmin_client.get_activities()
-    mock_cli.assert_called_once_with(["fetch", "activities"])
+    mock_cli.assert_called_once_with(["fetch", "activities"], cli_command=None)
     assert activities == [{"id": 1}]
 
 
@@ -26,10 +53,10 @@ def test_get_activities_success(mock_cli):
 def test_get_activities_delta_only(mock_cli):
     mock_cli.return_value = _success("[]")
     garmin_client.get_activities(delta_only=True)
-    mock_cli.assert_called_once_with(["fetch", "activities", "--delta-only"])
+    mock_cli.assert_called_once_with(["fetch", "activities", "--delta-only"], cli_command=None)
 
 
-@patch("src.garmin_client.time.sleep", return_value=None)
+@patch("src.retry.time.sleep", return_value=None)
 def test_get_activities_retry(mock_sleep):
     with patch(
         "src.garmin_client._run_garmindb_cli",
@@ -40,7 +67,7 @@ def test_get_activities_retry(mock_sleep):
         assert activities == [{"id": 2}]
 
 
-@patch("src.garmin_client.time.sleep", return_value=None)
+@patch("src.retry.time.sleep", return_value=None)
 def test_get_hrv_retry(mock_sleep):
     with patch(
         "src.garmin_client._run_garmindb_cli",
@@ -52,7 +79,7 @@ def test_get_hrv_retry(mock_sleep):
 
 
 @patch("src.garmin_client._run_garmindb_cli", return_value=_failure())
-@patch("src.garmin_client.time.sleep", return_value=None)
+@patch("src.retry.time.sleep", return_value=None)
 def test_get_activities_failure(mock_sleep, mock_cli):
     result = garmin_client.get_activities()
     assert result is None
@@ -60,7 +87,7 @@ def test_get_activities_failure(mock_sleep, mock_cli):
 
 
 @patch("src.garmin_client._run_garmindb_cli", return_value=_failure())
-@patch("src.garmin_client.time.sleep", return_value=None)
+@patch("src.retry.time.sleep", return_value=None)
 def test_get_hrv_failure(mock_sleep, mock_cli):
     result = garmin_client.get_hrv()
     assert result is None
@@ -79,6 +106,190 @@ def test_garmin_client_class_wraps_functions():
         client.get_hrv()
         login_mock.assert_called_once()
         refresh_mock.assert_called_once()
-        activities_mock.assert_called_once_with(delta_only=False)
+        activities_mock.assert_called_once_with(delta_only=False, since=None, cli_command=None)
         hrv_mock.assert_called_once()
 
+
+
+def _write_cli(tmp_path):
+    script = tmp_path / "fake_cli.py"
+    script.write_text(
+        "import json, sys\n"
+        "if sys.argv[1:] == ['fail']:\n"
+        "    print('boom', file=sys.stderr)\n"
+        "    sys.exit(3)\n"
+        "print(json.dumps([{'args': sys.argv[1:]}]))\n"
+    )
+    return ["python", str(script)]
+
+
+def test_garmin_client_applies_garmin_settings_without_touching_the_default(tmp_path):
+    command = _write_cli(tmp_path)
+    settings = types.SimpleNamespace(
+        retry=TEST_RETRY,
+        garmin=types.SimpleNamespace(
+            cli_command=command, use_worker=True, worker_timeout=30, max_concurrency=2,
+            cache_mode="record", cache_dir=str(tmp_path / "cache"),
+        ),
+    )
+    default = list(garmin_client.CLI_COMMAND)
+    with garmin_client.GarminClient(settings) as client:
+        assert garmin_client._worker is not None and garmin_client._cache_mode == "record"
+        assert client.get_activities() == [{"args": ["fetch", "activities"]}]
+        assert client.fetch_all(["hrv"]) == {"hrv": [{"args": ["fetch", "hrv"]}]}
+    assert garmin_client.CLI_COMMAND == default
+    assert garmin_client._worker is None and garmin_client._cache_mode == "off"
+
+
+def test_worker_runs_commands_and_reports_exit_codes(tmp_path):
+    worker = garmin_client.start_worker(_write_cli(tmp_path), timeout=30)
+    try:
+        assert worker.ping()
+        activities = garmin_client.get_activities(delta_only=True)
+        assert activities == [{"args": ["fetch", "activities", "--delta-only"]}]
+        failed = garmin_client._run_garmindb_cli(["fail"])
+        assert failed["returncode"] == 3
+        assert "boom" in failed["stderr"]
+        assert worker.spawn_count == 1
+    finally:
+        garmin_client.stop_worker()
+
+
+def test_worker_respawns_after_crash(tmp_path):
+    worker = garmin_client.start_worker(_write_cli(tmp_path), timeout=30)
+    try:
+        worker._proc.kill()
+        worker._proc.wait()
+        assert not worker.ping()
+        assert garmin_client.get_hrv() == [{"args": ["fetch", "hrv"]}]
+        assert worker.spawn_count == 2
+    finally:
+        garmin_client.stop_worker()
+
+
+def test_worker_respawns_after_malformed_response(tmp_path):
+    worker = garmin_client.start_worker(_write_cli(tmp_path), timeout=30)
+    try:
+        # A stray non-JSON line on the protocol stream.
+        worker._lines.put("not json\n")
+        assert garmin_client.get_hrv() == [{"args": ["fetch", "hrv"]}]
+        assert worker.spawn_count == 2
+    finally:
+        garmin_client.stop_worker()
+
+
+def test_worker_replaces_hung_process_before_reuse(tmp_path):
+    worker = garmin_client.start_worker(_write_cli(tmp_path), timeout=30)
+    try:
+        worker.ping_timeout = 0.5
+        os.kill(worker._proc.pid, signal.SIGSTOP)
+        assert garmin_client.get_hrv() == [{"args": ["fetch", "hrv"]}]
+        assert worker.spawn_count == 2
+    finally:
+        garmin_client.stop_worker()
+
+
+def test_iter_json_records_handles_arrays_and_ndjson():
+    array = io.StringIO('[{"id": 1}, {"id": 2, "name": "a, [b]"},\n {"id": 3}]')
+    assert [r["id"] for r in garmin_client.iter_json_records(array, chunk_size=4)] == [1, 2, 3]
+    ndjson = io.StringIO('{"id": 1}\n{"id": 2}\n')
+    assert [r["id"] for r in garmin_client.iter_json_records(ndjson, chunk_size=3)] == [1, 2]
+
+
+def test_iter_json_records_fails_fast_on_malformed_output():
+    stream = io.StringIO('{"id": 1}\n{"id": oops}\n' + '{"id": 2}\n' * 10_000)
+    records = garmin_client.iter_json_records(stream, chunk_size=64, max_record_size=256)
+    assert next(records) == {"id": 1}
+    with pytest.raises(json.JSONDecodeError):
+        next(records)
+    # Gave up after about one record's worth of output instead of reading to EOF.
+    assert stream.tell() < 1024
+
+
+def test_stream_activities_yields_bounded_batches(tmp_path):
+    script = tmp_path / "stream_cli.py"
+    script.write_text(
+        "import json\n"
+        "print('[' + ','.join(json.dumps({'id': i}) for i in range(25)) + ']')\n"
+    )
+    with patch("src.garmin_client.CLI_COMMAND", ["python", str(script)]):
+        batches = list(garmin_client.stream_activities(batch_size=10))
+    assert [len(b) for b in batches] == [10, 10, 5]
+    assert batches[-1]["id"].tolist() == [20, 21, 22, 23, 24]
+
+
+def test_stream_activities_raises_on_malformed_output(tmp_path):
+    script = tmp_path / "bad_cli.py"
+    script.write_text("print('[{\"id\": 1}, {\"id\": ')\n")
+    with patch("src.garmin_client.CLI_COMMAND", ["python", str(script)]):
+        with pytest.raises(garmin_client.GarminStreamError):
+            list(garmin_client.stream_activities())
+
+
+def test_async_client_fetches_concurrently_without_blocking_on_retry(tmp_path):
+    script = tmp_path / "async_cli.py"
+    marker = tmp_path / "hrv_failed_once"
+    script.write_text(
+        "import json, os, sys, time\n"
+        f"marker = {str(marker)!r}\n"
+        "if sys.argv[2] == 'hrv' and not os.path.exists(marker):\n"
+        "    open(marker, 'w').close()\n"
+        "    sys.exit(1)\n"
+        "time.sleep(0.2)\n"
+        "print(json.dumps([{'type': sys.argv[2]}]))\n"
+    )
+    client = garmin_client.AsyncGarminClient(
+        max_concurrency=2, retry_settings=types.SimpleNamespace(**{**vars(TEST_RETRY), "base": 0.5})
+    )
+    with patch("src.garmin_client.CLI_COMMAND", ["python", str(script)]):
+        start = time.perf_counter()
+        results = asyncio.run(client.fetch_all())
+        elapsed = time.perf_counter() - start
+    assert results == {"activities": [{"type": "activities"}], "hrv": [{"type": "hrv"}]}
+    # activities completes while hrv backs off; total is far below serial retry time.
+    assert elapsed < 3
+
+
+def test_response_cache_records_then_replays_without_cli(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    garmin_client.enable_cache(cache_dir, mode="record")
+    try:
+        with patch("src.garmin_client._execute_garmindb_cli", return_value=_success('[{"id": 7}]')):
+            assert garmin_client.get_activities(since="2024-01-01") == [{"id": 7}]
+            assert garmin_client.get_hrv() == [{"id": 7}]
+
+        garmin_client.enable_cache(cache_dir, mode="replay")
+        with patch("src.garmin_client._execute_garmindb_cli") as mock_execute:
+            assert garmin_client.get_activities(since="2024-01-01") == [{"id": 7}]
+            assert [b.to_dict("records") for b in garmin_client.stream_hrv()] == [[{"id": 7}]]
+            # Cache miss: served as a failure, never falls through to the CLI.
+            assert garmin_client._run_garmindb_cli(["fetch", "activities"]) is None
+            mock_execute.assert_not_called()
+    finally:
+        garmin_client.disable_cache()
+
+    # Identical payloads are stored once.
+    objects = [f for _, _, files in os.walk(os.path.join(cache_dir, "objects")) for f in files]
+    assert len(objects) == 1
+
+
+STAND_IN = os.path.join(os.path.dirname(__file__), "..", "src", "synthetic_garmindb_cli.py")
+
+
+def test_synthetic_stand_in_plugs_into_cli_command():
+    command = ["python", STAND_IN, "--days", "10", "--end-date", "2024-01-10", "--activities-per-day", "2"]
+    with patch("src.garmin_client.CLI_COMMAND", command):
+        activities = garmin_client.get_activities()
+        newer = garmin_client.get_activities(since="2024-01-08T00:00:00")
+        hrv = garmin_client.get_hrv()
+    assert len(activities) == 20
+    assert {a["activity_id"] for a in newer} == {a["activity_id"] for a in activities if a["timestamp"] > "2024-01-08"}
+    assert len(hrv) == 10 and {"hrv", "resting_hr", "sleep_hours"} <= set(hrv[0])
+
+
+@patch("src.retry.time.sleep", return_value=None)
+def test_synthetic_stand_in_failures_are_retried(mock_sleep):
+    command = ["python", STAND_IN, "--days", "3", "--failure-rate", "1"]
+    with patch("src.garmin_client.CLI_COMMAND", command):
+        assert garmin_client.get_hrv() is None
+    assert mock_sleep.call_count == 2
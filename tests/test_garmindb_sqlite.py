@@ -0,0 +1,72 @@
+import os
+import sqlite3
+import sys
+import types
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import garmindb_sqlite, storage
+from src.settings import GarminSettings
+
+ACTIVITY_COLUMNS = GarminSettings().sqlite_sources["activities"].columns
+
+
+def _make_garmindb(db_dir, rows=20):
+    # Same column types as garmindb's activities table.
+    conn = sqlite3.connect(os.path.join(db_dir, "garmin_activities.db"))
+    conn.execute(
+        "CREATE TABLE activities (activity_id VARCHAR PRIMARY KEY, sport VARCHAR, start_time DATETIME,"
+        " elapsed_time TIME, distance FLOAT, training_load FLOAT)"
+    )
+    conn.executemany(
+        "INSERT INTO activities VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (str(i), "running", f"2024-01-{i + 1:02d} 07:00:00.000000", "01:00:00.000000", 10.0 + i, 50.0 + i)
+            for i in range(rows)
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _settings(db_dir):
+    sources = {
+        "activities": types.SimpleNamespace(database="garmin_activities.db", table="activities", columns=ACTIVITY_COLUMNS),
+        "sleep": types.SimpleNamespace(database="garmin.db", table="sleep", columns={}),
+    }
+    return types.SimpleNamespace(
+        athlete_id="athlete_1",
+        garmin=types.SimpleNamespace(sqlite_db_dir=str(db_dir), sqlite_sources=sources),
+    )
+
+
+def test_read_source_maps_columns_in_batches(tmp_path):
+    _make_garmindb(tmp_path)
+    batches = list(
+        garmindb_sqlite.read_source(
+            str(tmp_path / "garmin_activities.db"), "activities", ACTIVITY_COLUMNS, use_scanner=False, batch_size=7
+        )
+    )
+    assert len(batches) == 3
+    rows = [row for batch in batches for row in batch.to_pylist()]
+    assert len(rows) == 20
+    assert rows[0]["activity_id"] == "0"
+    assert str(rows[0]["timestamp"]) == "2024-01-01 07:00:00"
+    assert rows[0]["duration_s"] == 3600
+    assert rows[0]["distance_m"] == 10_000
+    assert rows[0]["tss"] == 50.0
+    # Unmapped garmindb columns are passed through.
+    assert rows[0]["sport"] == "running"
+
+
+def test_ingest_writes_through_the_write_path_and_reports_missing(tmp_path, db_path):
+    _make_garmindb(tmp_path)
+    counts = garmindb_sqlite.ingest(_settings(tmp_path))
+    assert counts == {"activities": 20, "sleep": None}
+    daily = storage.read_daily_load("athlete_1")
+    assert len(daily) == 20
+    assert daily["total_tss"].sum() == sum(50.0 + i for i in range(20))
+    assert storage.get_cursor("athlete_1", "activities")["last_activity_id"] == "19"
+
+    # Re-ingesting reads only the cursor window and upserts it on activity_id instead of appending.
+    assert garmindb_sqlite.ingest(_settings(tmp_path), data_types=["activities"]) == {"activities": 8}
+    assert storage.read_df("SELECT count(*) AS n FROM raw_activities")["n"].iloc[0] == 20
@@ -0,0 +1,89 @@
+import datetime
+import os
+import sys
+import time
+import types
+from unittest.mock import patch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import maintenance, storage, write_queue
+
+
+def _settings(**overrides):
+    cfg = {"retention_days": {}, "rewrite_after_retention": True, "compact_database": True, **overrides}
+    return types.SimpleNamespace(maintenance=types.SimpleNamespace(**cfg))
+
+
+def _activities(start: datetime.date, days: int):
+    return [
+        {"activity_id": f"{start + datetime.timedelta(days=n)}", "timestamp": f"{start + datetime.timedelta(days=n)} 07:00:00",
+         "tss": 50.0, "notes": f"{n}" * 1000}
+        for n in range(days)
+    ]
+
+
+def test_maintenance_enforces_retention_and_reclaims_space(db_path):
+    storage.write_df(_activities(datetime.date(2023, 1, 1), 3000), "raw_activities", cursor=("a", "activities"))
+    storage.write_df([{"timestamp": "2023-01-01 06:00:00", "hrv": 60.0}], "raw_hrv", cursor=("a", "hrv"))
+    with storage.get_db_connection() as conn:
+        conn.execute("CHECKPOINT")
+
+    report = maintenance.run(_settings(retention_days={"raw_activities": 90, "raw_hrv": 10000}), today=datetime.date(2031, 3, 20))
+
+    assert report["tables"]["raw_activities"]["rows_deleted"] == 3000 - 90
+    assert report["tables"]["raw_activities"]["rewritten"] is True
+    assert report["tables"]["raw_hrv"]["rows_deleted"] == 0
+    assert report["bytes_reclaimed"] > 0
+    assert set(report["seconds"]) == {"retention", "rewrite", "checkpoint", "compact", "analyze"}
+    # The compacted file is live and derived tables keep their history.
+    assert len(storage.read_df("SELECT * FROM raw_activities")) == 90
+    assert len(storage.read_daily_load("a")) == 3000
+    assert storage.get_cursor("a", "activities") is not None
+
+
+def test_maintenance_keeps_rows_of_tables_without_retention(db_path):
+    storage.write_df(_activities(datetime.date(2020, 1, 1), 5), "raw_activities")
+    report = maintenance.run(_settings(compact_database=False), today=datetime.date(2031, 3, 20))
+    # The raw partition default applies to the parquet layout only; DuckDB rows stay.
+    assert report["tables"] == {}
+    assert len(storage.read_df("SELECT * FROM raw_activities")) == 5
+
+
+def test_compaction_holds_queued_writes_until_the_swap(db_path):
+    storage.write_df(_activities(datetime.date(2020, 1, 1), 5), "raw_activities")
+    queue = write_queue.get_write_queue()
+    futures = []
+
+    def replace(src, dst):
+        # A producer writes between the copy and the swap; it must not land in the old file.
+        futures.append(queue.submit(_activities(datetime.date(2021, 1, 1), 1), "raw_activities"))
+        time.sleep(0.2)
+        assert not futures[0].done()
+        os.rename(src, dst)
+
+    with patch("src.maintenance.os.replace", side_effect=replace):
+        maintenance.compact_database()
+    assert futures[0].result(timeout=5) == 1
+    assert len(storage.read_df("SELECT * FROM raw_activities")) == 6
+
+
+def test_maintenance_cli_skips_steps(db_path):
+    storage.write_df(_activities(datetime.date(2020, 1, 1), 5), "raw_activities")
+    settings = _settings()
+    settings.storage = types.SimpleNamespace(
+        database_path=db_path, read_only=False, layout="duckdb", parquet_dir="data/parquet",
+        raw_retention_days=90, query_cache_max_bytes=0,
+    )
+    settings.retry = types.SimpleNamespace()
+    settings.logging = types.SimpleNamespace(
+        payload_max_bytes=4096, spill_path=None, spill_max_bytes=1024, spill_backup_count=1
+    )
+    with patch("src.maintenance.load_settings", return_value=settings), patch("src.storage.configure"), \
+        patch("src.retry.configure") as configure_retry, patch("src.write_queue.configure") as configure_queue, \
+        patch("src.maintenance.configure_payload_logging") as configure_logging:
+        assert maintenance.main(["--no-retention", "--no-compact"]) == 0
+    assert len(storage.read_df("SELECT * FROM raw_activities")) == 5
+    # Configured like the storage_maintenance flow.
+    configure_retry.assert_called_once_with(settings.retry)
+    configure_queue.assert_called_once_with(settings.storage)
+    configure_logging.assert_called_once_with(4096, None, 1024, 1)
@@ -0,0 +1,65 @@
+import hashlib
+import json
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import monitoring
+
+
+@pytest.fixture
+def payload_logging():
+    def configure(**kwargs):
+        monitoring.configure_payload_logging(**kwargs)
+
+    yield configure
+    monitoring.configure_payload_logging()
+
+
+def _logged(mock_info):
+    return json.loads(mock_info.call_args[0][0])
+
+
+@patch("src.monitoring.logger.info")
+def test_large_fields_are_truncated_with_length_and_hash(mock_info, payload_logging):
+    payload_logging(max_bytes=16)
+    stdout = "x" * 1000
+    monitoring.log_event("cli_done", {"stdout": stdout, "returncode": 0, "result": {"stderr": "short"}})
+
+    logged = _logged(mock_info)
+    assert logged["stdout"] == "x" * 16 + "...[truncated]"
+    assert logged["stdout_bytes"] == 1000
+    assert logged["stdout_sha256"] == hashlib.sha256(stdout.encode()).hexdigest()
+    assert logged["returncode"] == 0
+    assert logged["result"] == {"stderr": "short"}
+
+
+@patch("src.monitoring.logger.info")
+def test_truncation_can_be_disabled(mock_info, payload_logging):
+    payload_logging(max_bytes=0)
+    monitoring.log_event("cli_done", {"stdout": "y" * 10000})
+    assert _logged(mock_info)["stdout"] == "y" * 10000
+
+
+@patch("src.monitoring.logger.info")
+def test_full_payload_spills_to_rotating_file(mock_info, payload_logging, tmp_path):
+    spill = tmp_path / "payloads.jsonl"
+    payload_logging(max_bytes=8, spill_path=str(spill))
+    monitoring.log_event("cli_done", {"stdout": "é" * 100})
+    monitoring.configure_payload_logging()  # flush and close the spill handler
+
+    spilled = json.loads(spill.read_text().splitlines()[0])
+    assert spilled["payload"] == "é" * 100
+    assert spilled["sha256"] == _logged(mock_info)["stdout_sha256"]
+
+
+def test_prometheus_text_renders_counters_and_gauges():
+    monitoring.inc_counter("test_events_total", 2)
+    monitoring.inc_counter("test_events_total")
+    monitoring.set_gauge("test_queue_depth", 4)
+    text = monitoring.prometheus_text()
+    assert "# TYPE test_events_total counter\ntest_events_total 3\n" in text
+    assert "# TYPE test_queue_depth gauge\ntest_queue_depth 4\n" in text
@@ -0,0 +1,118 @@
+import os
+import sys
+import types
+from unittest.mock import patch
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import retry
+
+
+def _settings(**overrides):
+    values = dict(
+        max_attempts=4,
+        base=2,
+        jitter=True,
+        max_delay=5,
+        budget_seconds=600,
+        breaker_failure_threshold=3,
+        breaker_reset_seconds=60,
+    )
+    values.update(overrides)
+    return types.SimpleNamespace(**values)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_breakers():
+    retry.reset_breakers()
+    yield
+    retry.reset_breakers()
+
+
+def test_backoff_delay_uses_full_jitter_and_cap():
+    settings = _settings()
+    with patch("src.retry.random.uniform", side_effect=lambda lo, hi: hi) as uniform:
+        delays = [retry.backoff_delay(n, settings) for n in range(1, 5)]
+    assert delays == [2, 4, 5, 5]
+    assert all(call.args[0] == 0 for call in uniform.call_args_list)
+    assert retry.backoff_delay(2, _settings(jitter=False)) == 4
+
+
+@patch("src.retry.time.sleep", return_value=None)
+def test_call_with_retry_retries_exceptions_then_succeeds(mock_sleep):
+    calls = iter([ValueError("a"), ValueError("b"), "ok"])
+
+    def flaky():
+        value = next(calls)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    assert retry.call_with_retry(flaky, upstream="test", retry_settings=_settings()) == "ok"
+    assert mock_sleep.call_count == 2
+
+
+@patch("src.retry.time.sleep", return_value=None)
+def test_non_retryable_exception_propagates_immediately(mock_sleep):
+    def boom():
+        raise KeyError("x")
+
+    with pytest.raises(KeyError):
+        retry.call_with_retry(boom, upstream="test", retry_on=(ValueError,), retry_settings=_settings())
+    mock_sleep.assert_not_called()
+
+
+@patch("src.retry.time.sleep", return_value=None)
+def test_retry_budget_stops_retrying(mock_sleep):
+    attempts = []
+    with retry.retry_budget(0.5):
+        result = retry.call_with_retry(
+            lambda: attempts.append(1) or None,
+            upstream="test",
+            is_success=bool,
+            retry_settings=_settings(jitter=False),
+        )
+    assert result is None
+    # The first back-off (2s) already exceeds the 0.5s budget.
+    assert len(attempts) == 1
+    mock_sleep.assert_not_called()
+
+
+@patch("src.retry.time.sleep", return_value=None)
+def test_circuit_opens_after_repeated_failures_and_recovers(mock_sleep):
+    settings = _settings(max_attempts=3, breaker_failure_threshold=3, breaker_reset_seconds=10)
+    failing = []
+    with patch("src.retry._settings", settings):
+        retry.call_with_retry(lambda: failing.append(1), upstream="garmin", is_success=bool)
+        assert len(failing) == 3
+        assert retry.get_breaker("garmin").state == "open"
+
+        with pytest.raises(retry.CircuitOpenError):
+            retry.call_with_retry(lambda: failing.append(1), upstream="garmin", is_success=bool)
+        assert len(failing) == 3  # short-circuited, upstream not called
+
+        breaker = retry.get_breaker("garmin")
+        breaker.opened_at -= 10  # reset timeout elapsed: half-open trial call allowed
+        assert retry.call_with_retry(lambda: "ok", upstream="garmin") == "ok"
+        assert breaker.state == "closed"
+
+
+@patch("src.retry.time.sleep", return_value=None)
+def test_non_retryable_error_during_half_open_trial_reopens_circuit(mock_sleep):
+    settings = _settings(max_attempts=1, breaker_failure_threshold=1, breaker_reset_seconds=10)
+    with patch("src.retry._settings", settings):
+        retry.call_with_retry(lambda: None, upstream="garmin", is_success=bool)
+        breaker = retry.get_breaker("garmin")
+        breaker.opened_at -= 10
+
+        def boom():
+            raise KeyError("x")
+
+        with pytest.raises(KeyError):
+            retry.call_with_retry(boom, upstream="garmin", retry_on=(ValueError,))
+        # The failed trial reopened the circuit instead of leaving it stuck half-open.
+        assert breaker.state == "open"
+        breaker.opened_at -= 10
+        assert retry.call_with_retry(lambda: "ok", upstream="garmin") == "ok"
+        assert breaker.state == "closed"
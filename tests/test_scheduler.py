@@ -0,0 +1,81 @@
+import os
+import sys
+import types
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import scheduler, storage
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket_refills_at_rate():
+    clock = FakeClock()
+    bucket = scheduler.TokenBucket(rate=2.0, capacity=2, clock=clock)
+    bucket.take()
+    bucket.take()
+    assert bucket.wait_time() == pytest.approx(0.5)
+    clock.now = 0.5
+    assert bucket.wait_time() == 0
+    clock.now = 100
+    bucket.take()
+    assert bucket.tokens == pytest.approx(1)  # capped at capacity before taking
+
+
+def _settings(cli_command):
+    retry_settings = types.SimpleNamespace(
+        max_attempts=1, base=0, jitter=False, max_delay=0,
+        budget_seconds=60, breaker_failure_threshold=100, breaker_reset_seconds=60,
+    )
+    return types.SimpleNamespace(
+        athletes=[
+            types.SimpleNamespace(athlete_id="alice", cli_args=["--account", "alice"]),
+            types.SimpleNamespace(athlete_id="bob", cli_args=["--account", "bob"]),
+        ],
+        scheduler=types.SimpleNamespace(
+            max_workers=2, global_rate_per_second=100.0, global_burst=4,
+            account_rate_per_second=100.0, account_burst=1,
+        ),
+        garmin=types.SimpleNamespace(cli_command=cli_command),
+        retry=retry_settings,
+    )
+
+
+def test_run_prioritises_stale_accounts_and_reports_throughput(tmp_path):
+    script = tmp_path / "multi_cli.py"
+    script.write_text(
+        "import json, sys\n"
+        "account, data_type = sys.argv[2], sys.argv[4]\n"
+        "if account == 'bob' and data_type == 'hrv':\n"
+        "    sys.exit(1)\n"
+        "print(json.dumps([{'activity_id': account + str(i), 'timestamp': '2024-02-0%d 06:00:00' % i, 'value': i} for i in range(1, 4)]))\n"
+    )
+    settings = _settings(["python", str(script)])
+    # Jobs run on threads here, so keep their process-global configuration out of other tests.
+    with patch("src.storage.DATABASE_PATH", str(tmp_path / "garmin.duckdb")), \
+        patch("src.retry._settings", settings.retry):
+        storage.write_df([{"activity_id": "bob0", "timestamp": "2024-01-01 06:00:00", "value": 0}], "raw_activities", cursor=("bob", "activities"))
+        jobs = scheduler.plan_jobs(settings)
+        # alice has never been ingested; bob's activities cursor puts him last.
+        assert [(j["athlete_id"], j["data_type"]) for j in jobs][-1] == ("bob", "activities")
+        assert jobs[-1]["command_args"][-2:] == ["--since", "2023-12-25T06:00:00"]
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            report = {r["athlete_id"]: r for r in scheduler.run(settings, executor=pool)}
+        counts = storage.read_df(
+            "SELECT athlete_id, count(*) AS n FROM raw_activities GROUP BY athlete_id ORDER BY athlete_id"
+        )
+
+    assert report["alice"]["records"] == 6 and report["alice"]["failures"] == 0
+    assert report["bob"]["records"] == 3 and report["bob"]["failures"] == 1
+    assert report["alice"]["records_per_second"] > 0
+    assert counts.to_dict("records") == [{"athlete_id": "alice", "n": 3}, {"athlete_id": "bob", "n": 4}]
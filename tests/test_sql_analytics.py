@@ -0,0 +1,89 @@
+import datetime
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import analytics, baselines, sql_analytics, storage
+
+SETTINGS = SimpleNamespace(
+    ctl_atl_ratio_max=1.3, ramp_percentage_max=0.10, baselines=SimpleNamespace(windows={"hrv": 7, "resting_hr": 5})
+)
+
+
+def _activities(rng):
+    rows = []
+    for athlete, (start, days) in {"a": ("2024-01-01", 120), "b": ("2024-03-01", 40), "c": ("2024-04-27", 3)}.items():
+        for day in pd.date_range(start, periods=days):
+            for session in range(rng.choice([0, 1, 1, 2])):
+                rows.append({
+                    "activity_id": f"{athlete}-{day.date()}-{session}",
+                    "athlete_id": athlete,
+                    "timestamp": f"{day.date()} {7 + 6 * session:02d}:00:00",
+                    "tss": float(rng.uniform(20, 200)),
+                })
+    return rows
+
+
+def test_training_load_matches_matrix_engine(db_path):
+    storage.write_df(_activities(np.random.default_rng(7)), "raw_activities")
+    daily_load = storage.read_daily_load(columns=["athlete_id", "date", "total_tss"])
+
+    for end in (None, datetime.date(2024, 5, 10)):
+        expected = analytics.team_metrics(daily_load, SETTINGS, end=end).set_index("athlete_id")
+        result = sql_analytics.training_load(SETTINGS, end=end).set_index("athlete_id")
+        assert list(result.index) == list(expected.index)
+        assert (pd.to_datetime(result["date"]) == pd.to_datetime(expected["date"])).all()
+        for column in ("ctl", "atl", "tsb", "ramp_rate", "atl_ctl_ratio"):
+            np.testing.assert_allclose(result[column], expected[column], rtol=1e-9, atol=1e-9, err_msg=column)
+        for column in ("high_atl_ctl_ratio", "high_ramp", "low_tsb"):
+            assert result[column].tolist() == expected[column].tolist(), column
+
+    only_b = sql_analytics.training_load(SETTINGS, ["b"])
+    assert only_b["athlete_id"].tolist() == ["b"]
+
+
+def test_baselines_match_rolling_windows(db_path):
+    rng = np.random.default_rng(8)
+    for athlete in ("a", "b"):
+        storage.write_df(
+            [
+                {
+                    "athlete_id": athlete,
+                    "timestamp": f"{datetime.date(2024, 1, 1) + datetime.timedelta(days=d)} 06:00:00",
+                    "hrv": float(rng.normal(62, 8)) if d % 9 else float("nan"),
+                    "resting_hr": float(rng.normal(50, 3)),
+                }
+                for d in range(40 if athlete == "a" else 4)
+            ],
+            "raw_hrv",
+        )
+    windows = SETTINGS.baselines.windows
+    result = sql_analytics.baselines(windows).set_index(["athlete_id", "metric"])
+    for athlete in ("a", "b"):
+        expected = baselines.update(athlete, windows)
+        for metric in windows:
+            row = result.loc[(athlete, metric)]
+            assert row["count"] == expected[metric]["count"]
+            assert row["value"] == pytest.approx(expected[metric]["value"])
+            assert row["mean"] == pytest.approx(expected[metric]["mean"], rel=1e-9)
+            if expected[metric]["zscore"] is None:
+                assert pd.isna(row["zscore"])
+            else:
+                assert row["zscore"] == pytest.approx(expected[metric]["zscore"], rel=1e-9)
+
+
+def test_athlete_metrics(db_path):
+    storage.write_df(_activities(np.random.default_rng(9)), "raw_activities")
+    metrics = sql_analytics.athlete_metrics(SETTINGS, "a")
+    load = analytics.compute_ctl_atl_from_daily_load(storage.read_daily_load("a", columns=["date", "total_tss"]))
+    assert metrics["ctl"] == pytest.approx(load["ctl"], rel=1e-9)
+    assert metrics["tsb"] == pytest.approx(load["tsb"], rel=1e-9)
+    # No raw_hrv table yet: no z-scores.
+    assert metrics["hrv_zscore"] is None and metrics["resting_hr_zscore"] is None
+
+    assert sql_analytics.athlete_metrics(SETTINGS, "nobody")["ctl"] == 0
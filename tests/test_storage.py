@@ -0,0 +1,283 @@
+import datetime
+import os
+import sys
+import threading
+from unittest.mock import patch
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import parquet_store, storage
+
+
+def _activities(ids):
+    return [{"activity_id": str(i), "timestamp": f"2024-01-{i:02d} 07:00:00", "tss": float(i)} for i in ids]
+
+
+def test_write_df_with_cursor_upserts_overlap_and_advances(db_path):
+    cursor = ("athlete-1", "activities")
+    assert storage.get_cursor(*cursor) is None
+
+    storage.write_df(_activities([1, 2, 3]), "raw_activities", cursor=cursor)
+    # Overlapping window: 2 and 3 were already ingested and are replaced, not duplicated.
+    storage.write_df(_activities([2, 3, 4, 5]), "raw_activities", cursor=cursor)
+
+    ids = storage.read_df("SELECT activity_id FROM raw_activities ORDER BY activity_id")["activity_id"].tolist()
+    assert ids == ["1", "2", "3", "4", "5"]
+    assert storage.get_cursor(*cursor) == {
+        "last_timestamp": pd.Timestamp("2024-01-05 07:00:00"),
+        "last_activity_id": "5",
+    }
+    assert storage.get_cursors("athlete-2") == {}
+
+
+def test_write_df_with_cursor_keeps_backdated_and_edited_rows(db_path):
+    cursor = ("athlete-1", "activities")
+    storage.write_df(_activities([1, 2, 3]), "raw_activities", cursor=cursor)
+    # Behind the cursor: a newly synced old activity and an edit of activity 2.
+    backdated = {"activity_id": "0", "timestamp": "2023-12-31 07:00:00", "tss": 5.0}
+    edited = {"activity_id": "2", "timestamp": "2024-01-02 07:00:00", "tss": 99.0}
+    storage.write_df([backdated, edited], "raw_activities", cursor=cursor)
+
+    df = storage.read_df("SELECT activity_id, tss FROM raw_activities ORDER BY activity_id")
+    assert df["activity_id"].tolist() == ["0", "1", "2", "3"]
+    assert df["tss"].tolist() == [5.0, 1.0, 99.0, 3.0]
+    assert storage.get_cursor(*cursor)["last_activity_id"] == "3"
+    assert storage.fetch_since(storage.get_cursor(*cursor)) == pd.Timestamp("2024-01-03 07:00:00") - storage.CURSOR_OVERLAP
+
+
+def test_cursor_not_advanced_when_write_fails(db_path):
+    cursor = ("athlete-1", "activities")
+    assert storage.write_df(_activities([1]), "raw_activities", cursor=cursor) == 1
+    # Mismatched schema makes the insert fail; the error reaches the caller and the cursor stays put.
+    with pytest.raises(duckdb.Error):
+        storage.write_df([{"activity_id": "2", "timestamp": "2024-01-02", "tss": 1.0, "extra": 1}], "raw_activities", cursor=cursor)
+    assert storage.get_cursor(*cursor)["last_activity_id"] == "1"
+
+
+def test_connection_manager_reuses_thread_cursor(db_path):
+    with storage.get_db_connection() as first, storage.get_db_connection(read_only=True) as second:
+        assert first is second
+    cursors = []
+    thread = threading.Thread(target=lambda: cursors.append(storage.get_connection_manager().cursor()))
+    thread.start()
+    thread.join()
+    assert cursors[0] is not first
+    # Both cursors share one database: a table created on one is visible on the other.
+    first.execute("CREATE TABLE t AS SELECT 1 AS x")
+    assert cursors[0].execute("SELECT x FROM t").fetchall() == [(1,)]
+
+
+def test_connection_manager_close_reopens(db_path):
+    storage.write_df(_activities([1]), "raw_activities")
+    manager = storage.get_connection_manager()
+    manager.close()
+    assert len(storage.read_df("SELECT * FROM raw_activities")) == 1
+
+
+def test_read_only_manager_rejects_writes(db_path):
+    storage.write_df(_activities([1]), "raw_activities")
+    storage.close_all()
+    manager = storage.ConnectionManager(db_path, read_only=True)
+    with pytest.raises(storage.ReadOnlyDatabaseError):
+        manager.cursor()
+    assert manager.cursor(read_only=True).execute("SELECT count(*) FROM raw_activities").fetchone() == (1,)
+    manager.close()
+
+
+def test_write_df_upserts_on_natural_key(db_path):
+    storage.write_df(_activities([1, 2]), "raw_activities")
+    # Re-ingesting an overlapping window (e.g. a backfill) updates instead of appending.
+    revised = _activities([2, 3])
+    revised[0]["tss"] = 99.0
+    storage.write_df(revised + _activities([3]), "raw_activities")
+
+    df = storage.read_df("SELECT activity_id, tss FROM raw_activities ORDER BY activity_id")
+    assert df["activity_id"].tolist() == ["1", "2", "3"]
+    assert df["tss"].tolist() == [1.0, 99.0, 3.0]
+
+
+def test_write_df_without_key_appends(db_path):
+    storage.write_df(_activities([1]), "events")
+    storage.write_df(_activities([1]), "events")
+    assert len(storage.read_df("SELECT * FROM events")) == 2
+    storage.write_df(_activities([1]), "events_keyed", key=["activity_id"])
+    storage.write_df(_activities([1]), "events_keyed", key=["activity_id"])
+    assert len(storage.read_df("SELECT * FROM events_keyed")) == 1
+
+
+def test_write_df_accepts_arrow_batches_and_iterators(db_path):
+    cursor = ("athlete-1", "activities")
+    storage.write_df(pa.RecordBatch.from_pylist(_activities([1, 2])), "raw_activities", cursor=cursor)
+    # Iterator of mixed chunk types, written in one transaction; 2 is written again.
+    chunks = (chunk for chunk in [pa.Table.from_pylist(_activities([2, 3])), pd.DataFrame(_activities([4])), _activities([5])])
+    storage.write_df(chunks, "raw_activities", cursor=cursor)
+
+    df = storage.read_df("SELECT activity_id, athlete_id FROM raw_activities ORDER BY activity_id")
+    assert df["activity_id"].tolist() == ["1", "2", "3", "4", "5"]
+    assert set(df["athlete_id"]) == {"athlete-1"}
+    assert storage.get_cursor(*cursor)["last_activity_id"] == "5"
+
+
+@pytest.fixture
+def parquet_layout(db_path, tmp_path):
+    root = str(tmp_path / "parquet")
+    with patch("src.storage.STORAGE_LAYOUT", "parquet"), patch("src.storage.PARQUET_DIR", root):
+        yield root
+
+
+def _dated_activities(days):
+    return [{"activity_id": day, "timestamp": f"{day} 07:00:00", "tss": 50.0} for day in days]
+
+
+def test_parquet_layout_partitions_upserts_and_prunes(parquet_layout):
+    cursor = ("athlete-1", "activities")
+    storage.write_df(_dated_activities(["2024-01-05", "2024-02-10", "2024-03-15"]), "raw_activities", cursor=cursor)
+    # Re-ingesting a partition (here past a fresh cursor) replaces rows by key rather than appending.
+    storage.write_df(_dated_activities(["2024-03-15", "2024-03-20"]), "raw_activities", cursor=("athlete-1", "rescan"))
+
+    assert sorted(parquet_store.partitions(parquet_layout, "raw_activities")) == [
+        ("athlete-1", "2024-01"), ("athlete-1", "2024-02"), ("athlete-1", "2024-03"),
+    ]
+    # Queries go through a DuckDB view over the partitions.
+    assert len(storage.read_df("SELECT * FROM raw_activities")) == 4
+    assert storage.get_cursor(*cursor)["last_activity_id"] == "2024-03-15"
+
+    files = parquet_store.partition_files(parquet_layout, "raw_activities", "athlete-1", "2024-02-01", "2024-02-28")
+    assert len(files) == 1 and "month=2024-02" in files[0]
+    df = storage.read_range("raw_activities", "2024-02-01", "2024-03-16", athlete_id="athlete-1")
+    assert sorted(df["activity_id"]) == ["2024-02-10", "2024-03-15"]
+
+
+def test_apply_retention_drops_whole_old_months(parquet_layout):
+    storage.write_df(_dated_activities(["2024-01-05", "2024-03-01", "2024-04-20"]), "raw_activities", cursor=("a", "activities"))
+
+    dropped = storage.apply_retention(retention_days=90, today=datetime.date(2024, 5, 15))
+
+    # Cutoff is 2024-02-15: January is wholly older and dropped; March onwards is kept.
+    assert dropped == {"raw_activities": [("a", "2024-01")]}
+    assert sorted(storage.read_df("SELECT activity_id FROM raw_activities")["activity_id"]) == ["2024-03-01", "2024-04-20"]
+
+
+def test_daily_load_tracks_touched_days(db_path):
+    activities = [
+        {"activity_id": "1", "timestamp": "2024-01-01 07:00:00", "tss": 50.0, "duration_s": 3600, "distance_m": 10000.0},
+        {"activity_id": "2", "timestamp": "2024-01-01 18:00:00", "tss": 30.0, "duration_s": 1800, "distance_m": 5000.0},
+        {"activity_id": "3", "timestamp": "2024-01-02 07:00:00", "tss": 70.0, "duration_s": 4000, "distance_m": 12000.0},
+    ]
+    storage.write_df(activities, "raw_activities", cursor=("a", "activities"))
+    # A revised activity only recomputes its own day.
+    storage.write_df([{**activities[1], "tss": 40.0}], "raw_activities", key=["activity_id"])
+
+    load = storage.read_daily_load("a")
+    assert load["date"].astype(str).tolist() == ["2024-01-01", "2024-01-02"]
+    assert load["total_tss"].tolist() == [90.0, 70.0]
+    assert load["activity_count"].tolist() == [2, 1]
+    assert load["duration_s"].tolist() == [5400.0, 4000.0]
+
+
+def test_daily_load_recomputes_the_day_an_activity_moved_from(db_path):
+    activity = {"activity_id": "1", "timestamp": "2024-05-01 07:00:00", "tss": 50.0}
+    storage.write_df([activity], "raw_activities", cursor=("a", "activities"))
+    storage.write_df([{**activity, "timestamp": "2024-05-02 07:00:00"}], "raw_activities", cursor=("a", "activities"))
+
+    load = storage.read_daily_load("a")
+    assert load["date"].astype(str).tolist() == ["2024-05-02"]
+    assert load["total_tss"].tolist() == [50.0]
+
+
+def test_query_cache_hits_until_table_written(db_path):
+    storage.enable_query_cache(1 << 20)
+    try:
+        storage.write_df(_activities([1]), "raw_activities")
+        query = "SELECT activity_id FROM raw_activities"
+        assert len(storage.read_df(query)) == 1
+        # Whitespace differences normalize to the same entry.
+        with patch("src.storage.duckdb.DuckDBPyConnection.execute") as execute:
+            assert len(storage.read_df("SELECT  activity_id\n FROM raw_activities;")) == 1
+        execute.assert_not_called()
+        storage.write_df(_activities([2]), "raw_activities")
+        assert len(storage.read_df(query)) == 2
+        assert storage.query_cache_stats()["hits"] == 1
+        assert storage.query_cache_stats()["misses"] == 2
+    finally:
+        storage.disable_query_cache()
+
+
+def test_query_cache_results_are_independent_copies(db_path):
+    storage.enable_query_cache(1 << 20)
+    try:
+        storage.write_df(_activities([1]), "raw_activities")
+        query = "SELECT tss FROM raw_activities"
+        first = storage.read_df(query)
+        first.loc[0, "tss"] = 999.0
+        cached = storage.read_df(query)
+        cached.loc[0, "tss"] = 999.0
+        assert storage.read_df(query)["tss"].tolist() == [1.0]
+    finally:
+        storage.disable_query_cache()
+
+
+def test_query_tables_are_bounded(db_path):
+    storage.enable_query_cache(1 << 20)
+    try:
+        storage.write_df(_activities([1]), "raw_activities")
+        with patch("src.storage.QUERY_TABLES_MAX_ENTRIES", 3), patch.dict(storage._query_tables, clear=True):
+            for i in range(5):
+                storage.read_df(f"SELECT tss + {i} FROM raw_activities")
+            assert list(storage._query_tables) == [f"SELECT tss + {i} FROM raw_activities" for i in (2, 3, 4)]
+    finally:
+        storage.disable_query_cache()
+
+
+def test_query_cache_evicts_least_recently_used():
+    cache = storage.QueryCache(max_bytes=3000)
+    frames = {name: pd.DataFrame({"x": range(100)}) for name in "abc"}  # ~1 kB each
+    for name, df in frames.items():
+        cache.put((name,), df)
+    cache.get(("a",))
+    cache.put(("d",), pd.DataFrame({"x": range(100)}))
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_read_batches_streams_in_bounded_batches(db_path, tmp_path):
+    storage.write_df(_activities(range(1, 26)), "raw_activities")
+    batches = storage.read_batches("SELECT * FROM raw_activities ORDER BY activity_id", batch_size=10)
+    first = next(batches)
+    # Other queries on this thread do not cancel the open stream.
+    assert len(storage.read_df("SELECT * FROM raw_activities")) == 25
+    assert [first.num_rows] + [b.num_rows for b in batches] == [10, 10, 5]
+
+    frames = list(storage.read_batches("SELECT tss FROM raw_activities", batch_size=20, as_pandas=True))
+    assert [len(f) for f in frames] == [20, 5]
+    with pytest.raises(Exception):
+        list(storage.read_batches("SELECT * FROM missing_table"))
+
+    path = str(tmp_path / "export.parquet")
+    assert storage.export_parquet("SELECT * FROM raw_activities", path, batch_size=7) == 25
+    assert pq.read_table(path).num_rows == 25
+
+
+def test_read_table_projects_and_filters_with_parameters(db_path):
+    rows = _activities([1, 2, 3, 4])
+    storage.write_df(rows[:2], "raw_activities", cursor=("a", "activities"))
+    storage.write_df(rows[2:], "raw_activities", cursor=("b", "activities"))
+
+    df = storage.read_table(
+        "raw_activities",
+        columns=["activity_id", "tss"],
+        where={"athlete_id": ["a", "b"], "timestamp": (datetime.date(2024, 1, 2), datetime.datetime(2024, 1, 3, 12))},
+        order_by=["activity_id"],
+    )
+    assert df.columns.tolist() == ["activity_id", "tss"]
+    assert df["activity_id"].tolist() == ["2", "3"]
+    # Values are bound as parameters, never spliced into the SQL.
+    assert storage.read_table("raw_activities", where={"athlete_id": "a' OR '1'='1"}).empty
+    assert len(storage.read_table("raw_activities", where={"athlete_id": "b"}, limit=1)) == 1
+    assert storage.read_daily_load("a", columns=["date", "total_tss"]).columns.tolist() == ["date", "total_tss"]
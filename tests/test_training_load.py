@@ -0,0 +1,130 @@
+import datetime
+import os
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import analytics, sql_analytics, storage, training_load
+
+
+def _activities(rng, start: datetime.date, days: int, first_id: int):
+    """Random activities over ``days`` days: rest days, and up to three sessions on a day."""
+    rows = []
+    for offset in range(days):
+        day = start + datetime.timedelta(days=offset)
+        for session in range(rng.choice([0, 0, 1, 1, 1, 2, 3])):
+            rows.append({
+                "activity_id": str(first_id + len(rows)),
+                "athlete_id": "a1",
+                "timestamp": f"{day.isoformat()} {6 + 5 * session:02d}:00:00",
+                "tss": float(rng.uniform(10, 250)),
+            })
+    return rows
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_updates_match_full_recompute(db_path, seed):
+    rng = np.random.default_rng(seed)
+    day = datetime.date(2023, 1, 1)
+    written = []
+    full_recomputes = 0
+    for step in range(int(rng.integers(4, 9))):
+        days = int(rng.integers(1, 60))
+        batch = _activities(rng, day, days, first_id=len(written))
+        day += datetime.timedelta(days=days + int(rng.integers(0, 10)))
+        if not batch:
+            continue
+        storage.write_df(batch, "raw_activities")
+        written += batch
+        result = training_load.update("a1")
+        full_recomputes += result["full_recompute"]
+
+        full = analytics.compute_training_load(pd.DataFrame(written))
+        assert result["date"] == full["date"]
+        assert result["ctl"] == pytest.approx(full["ctl"], rel=1e-9, abs=1e-9)
+        assert result["atl"] == pytest.approx(full["atl"], rel=1e-9, abs=1e-9)
+        assert result["tsb"] == pytest.approx(full["tsb"], rel=1e-9, abs=1e-7)
+    # Only the first update starts without a stored state.
+    assert full_recomputes == 1
+
+
+def test_backdated_activity_forces_full_recompute(db_path):
+    storage.write_df(
+        [{"activity_id": str(i), "athlete_id": "a1", "timestamp": f"2024-03-{i:02d} 07:00:00", "tss": 80.0}
+         for i in range(1, 21)],
+        "raw_activities",
+    )
+    first = training_load.update("a1")
+    assert first["full_recompute"] and first["date"] == datetime.date(2024, 3, 20)
+    # The last day may still get activities, so the state stops the day before.
+    assert storage.get_training_load_state("a1")["date"] == datetime.date(2024, 3, 19)
+
+    # A second session on the last day and a later day fold into the stored state.
+    storage.write_df([{"activity_id": "21", "athlete_id": "a1", "timestamp": "2024-03-20 18:00:00", "tss": 40.0}],
+                     "raw_activities")
+    storage.write_df([{"activity_id": "23", "athlete_id": "a1", "timestamp": "2024-03-22 07:00:00", "tss": 120.0}],
+                     "raw_activities")
+    assert storage.get_training_load_state("a1") is not None
+    assert not training_load.update("a1")["full_recompute"]
+
+    # A day before the state date invalidates it.
+    storage.write_df([{"activity_id": "22", "athlete_id": "a1", "timestamp": "2024-03-05 18:00:00", "tss": 50.0}],
+                     "raw_activities")
+    assert storage.get_training_load_state("a1") is None
+    result = training_load.update("a1")
+    assert result["full_recompute"]
+
+    full = analytics.compute_training_load(storage.read_table("raw_activities", columns=["timestamp", "tss"]))
+    assert result["ctl"] == pytest.approx(full["ctl"])
+    assert result["atl"] == pytest.approx(full["atl"])
+
+
+def test_other_athletes_writes_leave_the_state(db_path):
+    storage.write_df(
+        [{"activity_id": f"a{i}", "athlete_id": "a1", "timestamp": f"2024-03-{i:02d} 07:00:00", "tss": 80.0}
+         for i in range(1, 21)],
+        "raw_activities",
+    )
+    training_load.update("a1")
+    state = storage.get_training_load_state("a1")
+
+    # Athlete b1 trains on days a1's state already covers.
+    storage.write_df(
+        [{"activity_id": f"b{i}", "athlete_id": "b1", "timestamp": f"2024-03-{i:02d} 07:00:00", "tss": 60.0}
+         for i in range(1, 11)],
+        "raw_activities",
+    )
+    assert storage.get_training_load_state("a1") == state
+    assert not training_load.update("a1")["full_recompute"]
+
+
+def test_update_reports_decay_to_end_without_storing_it(db_path):
+    storage.write_df([{"activity_id": "1", "athlete_id": "a1", "timestamp": "2024-03-01 07:00:00", "tss": 100.0}],
+                     "raw_activities")
+    result = training_load.update("a1", end=datetime.date(2024, 3, 11))
+    assert result["date"] == datetime.date(2024, 3, 11)
+    assert result["atl"] == pytest.approx(100.0 * analytics.ewma_alpha(7) * (1 - analytics.ewma_alpha(7)) ** 10)
+    assert storage.get_training_load_state("a1") == {"date": datetime.date(2024, 2, 29), "ctl": 0.0, "atl": 0.0}
+
+
+def test_update_to_end_matches_the_sql_backend(db_path):
+    storage.write_df(
+        [{"activity_id": str(i), "athlete_id": "a1", "timestamp": f"2024-03-{i:02d} 07:00:00", "tss": 60.0 + i}
+         for i in range(1, 15, 3)],
+        "raw_activities",
+    )
+    end = datetime.date(2024, 3, 30)
+    result = training_load.update("a1", end=end)
+    thresholds = types.SimpleNamespace(ctl_atl_ratio_max=1.3, ramp_percentage_max=0.10)
+    sql = sql_analytics.training_load(thresholds, ["a1"], end=end).iloc[0]
+    assert result["date"] == sql["date"].date() == end
+    assert result["ctl"] == pytest.approx(sql["ctl"])
+    assert result["atl"] == pytest.approx(sql["atl"])
+
+
+def test_update_without_data(db_path):
+    assert training_load.update("nobody") == {"date": None, "ctl": 0, "atl": 0, "tsb": 0, "full_recompute": True}
@@ -0,0 +1,70 @@
+import os
+import sys
+import threading
+from unittest.mock import patch
+
+import duckdb
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src import monitoring, storage, write_queue
+
+
+def _activities(ids):
+    return [{"activity_id": str(i), "timestamp": f"2024-01-{i:02d} 07:00:00", "tss": float(i)} for i in ids]
+
+
+def test_queued_writes_coalesce_into_one_transaction(db_path):
+    queue = write_queue.WriteQueue()
+    # Hold the writer inside its first transaction so the next writes pile up.
+    entered, release = threading.Event(), threading.Event()
+    original = storage.write_in_transaction
+    calls = []
+
+    def blocking_write(conn, *args):
+        calls.append(args[1])
+        if len(calls) == 1:
+            entered.set()
+            release.wait(5)
+        return original(conn, *args)
+
+    before = monitoring.get_metrics().get("write_queue_transactions_total", 0)
+    with patch("src.storage.write_in_transaction", side_effect=blocking_write):
+        with queue:
+            first = queue.submit(_activities([1]), "raw_activities")
+            assert entered.wait(5)
+            rest = [queue.submit(_activities([i]), "raw_activities") for i in (2, 3, 4)]
+            release.set()
+            assert [f.result(5) for f in [first] + rest] == [1, 1, 1, 1]
+
+    assert monitoring.get_metrics()["write_queue_transactions_total"] - before == 2
+    assert len(storage.read_df("SELECT * FROM raw_activities")) == 4
+
+
+def test_failed_write_does_not_fail_its_batch(db_path):
+    with write_queue.WriteQueue() as queue:
+        queue.submit(_activities([1]), "raw_activities").result(5)
+        good = queue.submit(_activities([2]), "raw_activities")
+        bad = queue.submit([{"timestamp": "2024-01-03"}], "raw_activities")  # no activity_id key
+        assert good.result(5) == 1
+        with pytest.raises(ValueError):
+            bad.result(5)
+    assert len(storage.read_df("SELECT * FROM raw_activities")) == 2
+
+
+def test_writer_waits_for_database_lock(db_path):
+    manager = storage.get_connection_manager()
+    attempts = []
+    original = manager.cursor
+
+    def locked_once(*args, **kwargs):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise duckdb.IOException("Could not set lock on file")
+        return original(*args, **kwargs)
+
+    before = monitoring.get_metrics().get("db_lock_seconds", 0)
+    with patch.object(manager, "cursor", side_effect=locked_once), patch("src.write_queue.LOCK_RETRY_SECONDS", 0.05):
+        with write_queue.WriteQueue() as queue:
+            assert queue.submit(_activities([1]), "raw_activities").result(5) == 1
+    assert monitoring.get_metrics()["db_lock_seconds"] - before >= 0.05